@@ -40,6 +40,7 @@ class Config():
 
   #loop interval
   G_SENSOR_INTERVAL = 1.0 #[s] for sensor_core
+  G_SENSOR_MIN_INTERVAL = 0.25 #[s] for sensor_core (minimum interval when waked by sensor updates)
   G_ANT_INTERVAL = 1.0 #[s] for ANT+. 0.25, 0.5, 1.0 only.
   G_I2C_INTERVAL = 0.5 #[s] for I2C (altitude, accelerometer, etc)
   G_GPS_INTERVAL = 1.0 #[s] for GPS
@@ -51,6 +52,23 @@ class Config():
   #log format switch
   G_LOG_WRITE_CSV = True
   G_LOG_WRITE_FIT = True
+  G_LOG_WRITE_NPZ = True
+
+  #smart recording: write a row of the log only when the position, heading or sensor values change
+  #  (at least every G_LOG_SMART_RECORDING_INTERVAL). lap and session statistics are kept exact.
+  G_LOG_SMART_RECORDING = False
+  G_LOG_SMART_RECORDING_INTERVAL = 10 #[s]
+  #  skipped rows are also written as a placeholder row (replaced, deleted when the next row is written),
+  #  so a crash or a power loss loses at most this interval of the log
+  G_LOG_SMART_RECORDING_PLACEHOLDER_INTERVAL = 3 #[s]
+  G_LOG_SMART_RECORDING_DISTANCE = 20 #[m] moved from the last row
+  G_LOG_SMART_RECORDING_HEADING = 15 #[deg] change of gps track from the last row
+  G_LOG_SMART_RECORDING_THRESHOLD = {
+    'heart_rate':5, #[bpm]
+    'cadence':5, #[rpm]
+    'power':30, #[W]
+    'speed':2.0*1000/3600, #[m/s]
+  }
 
   #average including ZERO when logging
   G_AVERAGE_INCLUDING_ZERO = {
@@ -92,10 +110,14 @@ class Config():
   #G_CUESHEET_FILE = "course/cue_sheet.csv"
   G_CUESHEET_DISPLAY_NUM = 5 #max: 5
   G_CUESHEET_SCROLL = False
+  #previous ride as a ghost rider on the course (log/log.db-<start date> or FIT, "": disabled)
+  G_GHOST_FILE = ""
 
   #log setting
   G_LOG_DIR = "log/"
   G_LOG_DB = G_LOG_DIR + "log.db"
+  #summaries of all rides (one row per log.db-<start date>)
+  G_LOG_CATALOG_DB = G_LOG_DIR + "catalog.db"
   G_LOG_START_DATE = None
   
   #map setting
@@ -156,10 +178,16 @@ class Config():
   config_file = "setting.conf"
   config_parser = None
   #config file (store temporary values. unreadable and uneditable.)
+  #written behind by config_pickle_worker. setting.pickle is read only as a fallback
   config_pickle_file = "setting.pickle"
+  config_state_file = "setting.json"
   config_pickle = {}
-  config_pickle_write_time = datetime.datetime.utcnow()
+  config_pickle_dirty = set()
   config_pickle_interval = 10 #[s]
+  config_pickle_lock = None
+  config_pickle_write_lock = None
+  config_pickle_event = None
+  config_pickle_thread = None
 
   #screenshot dir
   G_SCREENSHOT_DIR = 'screenshot/'
@@ -193,6 +221,15 @@ class Config():
   #700x23c: 2.096, 700x25c: 2.105, 700x28c: 2.136
   G_WHEEL_CIRCUMFERENCE = 2.105
 
+  #power analytics (overwritten with setting.conf)
+  G_POWER_FTP = 200 #[W] for IF and TSS
+  G_POWER_CP = 200 #[W] critical power for W'bal
+  G_POWER_W_PRIME = 20000 #[J]
+  #zones (lower limits of zone 1, 2, ...) for time in zones (overwritten with setting.conf)
+  G_ZONE_HR = [0, 115, 135, 155, 175] #[bpm]
+  G_ZONE_POWER = [] #[W] (empty: G_ZONE_POWER_RATIO * G_POWER_FTP)
+  G_ZONE_POWER_RATIO = [0, 0.55, 0.75, 0.90, 1.05, 1.20, 1.50]
+
   #ANT Null value
   G_ANT_NULLVALUE = np.nan
   #ANT+ setting (overwritten with setting.conf)
@@ -302,6 +339,14 @@ class Config():
 
   #Graph color by slope
   G_SLOPE_WINDOW_DISTANCE = 500 #m
+  #Climb detection of course
+  G_CLIMB_MIN_DISTANCE = 500 #m
+  G_CLIMB_MIN_GRADE = 3 #%
+  G_CLIMB_MERGE_DESCENT = 10 #m (ignore descents below this in a climb)
+  G_CLIMB_GRADE_WINDOW = 100 #m (for max grade)
+  #climb score (distance[m] * grade[%]) of category 4, 3, 2, 1, HC
+  G_CLIMB_CATEGORY_SCORE = (8000,16000,32000,64000,80000)
+  G_CLIMB_CATEGORY_NAME = ("-","4","3","2","1","HC")
   G_SLOPE_CUTOFF = (1,3,5,7,9,11,float("inf")) #by grade
   G_SLOPE_COLOR = (
    #(128,128,128,160),  #gray(base)
@@ -543,18 +588,31 @@ class Config():
     if os.path.exists(self.config_file):
       self.read_config()
 
-    if os.path.exists(self.config_pickle_file):
-      self.read_config_pickle()
+    self.config_pickle_lock = threading.Lock()
+    self.config_pickle_write_lock = threading.Lock()
+    self.config_pickle_event = threading.Event()
+    self.read_config_pickle()
 
     #set dir(for using from pitft desktop)
     if self.G_IS_RASPI:
       self.G_SCREENSHOT_DIR = self.G_INSTALL_PATH + self.G_SCREENSHOT_DIR 
       self.G_LOG_DIR = self.G_INSTALL_PATH + self.G_LOG_DIR
       self.G_LOG_DB = self.G_INSTALL_PATH + self.G_LOG_DB
+      self.G_LOG_CATALOG_DB = self.G_INSTALL_PATH + self.G_LOG_CATALOG_DB
       self.config_file = self.G_INSTALL_PATH + self.config_file
       self.G_LAYOUT_FILE = self.G_INSTALL_PATH + self.G_LAYOUT_FILE
       self.G_COURSE_FILE = self.G_INSTALL_PATH + self.G_COURSE_FILE
+      if self.G_GHOST_FILE != "":
+        self.G_GHOST_FILE = os.path.join(self.G_INSTALL_PATH, self.G_GHOST_FILE)
     
+    #course file (tcx, gpx or fit)
+    if not os.path.exists(self.G_COURSE_FILE):
+      for ext in ['.gpx', '.fit']:
+        course_file = os.path.splitext(self.G_COURSE_FILE)[0] + ext
+        if os.path.exists(course_file):
+          self.G_COURSE_FILE = course_file
+          break
+
     #layout file
     if not os.path.exists(self.G_LAYOUT_FILE):
       if self.G_IS_RASPI:
@@ -617,6 +675,11 @@ class Config():
     self.download_thread.setDaemon(True)
     self.download_thread.start()
 
+    #thread for writing config_pickle behind
+    self.config_pickle_thread = threading.Thread(target=self.config_pickle_worker, name="config_pickle_worker", args=())
+    self.config_pickle_thread.setDaemon(True)
+    self.config_pickle_thread.start()
+
     self.keyboard_control_thread = None
     if self.G_HEADLESS:
       self.keyboard_control_thread = threading.Thread(target=self.keyboard_check, name="keyboard_check", args=())
@@ -829,9 +892,13 @@ class Config():
     #self.download_thread.join(timeout=0.5)
 
     #time.sleep(self.G_LOGGING_INTERVAL)
-    self.logger.quit()
+    logger_closed = self.logger.quit()
     self.write_config()
-    self.delete_config_pickle()
+    self.config_pickle_event.set()
+    self.config_pickle_thread.join(timeout=1.0)
+    #keep the pickle if reset_count is still running
+    if logger_closed:
+      self.delete_config_pickle()
 
   def poweroff(self):
     if self.G_IS_RASPI:
@@ -1000,6 +1067,26 @@ class Config():
         self.G_FONT_FILE = self.config_parser['GENERAL']['FONT_FILE']
       if 'MAP' in self.config_parser['GENERAL']:
         self.G_MAP = self.config_parser['GENERAL']['MAP'].lower()
+      if 'GHOST_FILE' in self.config_parser['GENERAL']:
+        self.G_GHOST_FILE = self.config_parser['GENERAL']['GHOST_FILE']
+      if 'SMART_RECORDING' in self.config_parser['GENERAL']:
+        self.G_LOG_SMART_RECORDING = self.config_parser['GENERAL'].getboolean('SMART_RECORDING')
+
+    if 'POWER' in self.config_parser:
+      if 'FTP' in self.config_parser['POWER']:
+        self.G_POWER_FTP = int(self.config_parser['POWER']['FTP'])
+      if 'CP' in self.config_parser['POWER']:
+        self.G_POWER_CP = int(self.config_parser['POWER']['CP'])
+      if 'W_PRIME' in self.config_parser['POWER']:
+        self.G_POWER_W_PRIME = int(self.config_parser['POWER']['W_PRIME'])
+
+    if 'ZONE' in self.config_parser:
+      for k, z in [['HR', 'G_ZONE_HR'], ['POWER', 'G_ZONE_POWER']]:
+        if k.lower() in self.config_parser['ZONE']:
+          zone = json.loads(self.config_parser['ZONE'][k])
+          #lower limits must be ascending
+          if zone == sorted(zone):
+            setattr(self, z, zone)
 
     if 'ANT' in self.config_parser:
       for key in self.config_parser['ANT']:
@@ -1091,6 +1178,17 @@ class Config():
     self.config_parser['GENERAL']['LANG'] = self.G_LANG
     self.config_parser['GENERAL']['FONT_FILE'] = self.G_FONT_FILE
     self.config_parser['GENERAL']['MAP'] = self.G_MAP
+    self.config_parser['GENERAL']['GHOST_FILE'] = self.G_GHOST_FILE
+    self.config_parser['GENERAL']['SMART_RECORDING'] = str(self.G_LOG_SMART_RECORDING)
+
+    self.config_parser['POWER'] = {}
+    self.config_parser['POWER']['FTP'] = str(int(self.G_POWER_FTP))
+    self.config_parser['POWER']['CP'] = str(int(self.G_POWER_CP))
+    self.config_parser['POWER']['W_PRIME'] = str(int(self.G_POWER_W_PRIME))
+
+    self.config_parser['ZONE'] = {}
+    self.config_parser['ZONE']['HR'] = json.dumps(self.G_ZONE_HR)
+    self.config_parser['ZONE']['POWER'] = json.dumps(self.G_ZONE_POWER)
 
     if not self.G_DUMMY_OUTPUT:
       self.config_parser['ANT'] = {}
@@ -1130,18 +1228,26 @@ class Config():
       self.config_parser.write(file)
   
   def read_config_pickle(self):
-    with open(self.config_pickle_file, 'rb') as f:
-      self.config_pickle = pickle.load(f)
+    if os.path.exists(self.config_state_file):
+      try:
+        with open(self.config_state_file, 'r') as f:
+          self.config_pickle = json.load(f, object_hook=self.config_state_decoder)
+        return
+      except (OSError, ValueError):
+        traceback.print_exc()
+    #fallback to old format
+    if os.path.exists(self.config_pickle_file):
+      with open(self.config_pickle_file, 'rb') as f:
+        self.config_pickle = pickle.load(f)
+      self.config_pickle_dirty.update(self.config_pickle.keys())
 
   def set_config_pickle(self, key, value, quick_apply=False):
-    self.config_pickle[key] = value
-    #write with config_pickle_interval
-    t = (datetime.datetime.utcnow()-self.config_pickle_write_time).total_seconds()
-    if not quick_apply and t < self.config_pickle_interval:
-      return
-    with open(self.config_pickle_file, 'wb') as f:
-      pickle.dump(self.config_pickle, f)
-    self.config_pickle_write_time = datetime.datetime.utcnow()
+    with self.config_pickle_lock:
+      self.config_pickle[key] = value
+      self.config_pickle_dirty.add(key)
+    #written by config_pickle_worker with config_pickle_interval, or at once with quick_apply
+    if quick_apply:
+      self.config_pickle_event.set()
   
   def get_config_pickle(self, key, default_value):
     if key in self.config_pickle:
@@ -1150,16 +1256,59 @@ class Config():
       return default_value
   
   def reset_config_pickle(self):
-    self.config_pickle = {}
-    with open(self.config_pickle_file, 'wb') as f:
-      pickle.dump(self.config_pickle, f)
+    with self.config_pickle_lock:
+      self.config_pickle = {}
+    self.flush_config_pickle(force=True)
 
   def delete_config_pickle(self):
-    for k, v in list(self.config_pickle.items()):
-      if "ant+" in k:
-        del(self.config_pickle[k])
-    with open(self.config_pickle_file, 'wb') as f:
-      pickle.dump(self.config_pickle, f)
+    with self.config_pickle_lock:
+      for k in list(self.config_pickle.keys()):
+        if "ant+" in k:
+          del(self.config_pickle[k])
+    self.flush_config_pickle(force=True)
+
+  def config_pickle_worker(self):
+    while(not self.G_QUIT):
+      self.config_pickle_event.wait(self.config_pickle_interval)
+      self.config_pickle_event.clear()
+      self.flush_config_pickle()
+  
+  def flush_config_pickle(self, force=False):
+    with self.config_pickle_write_lock:
+      #dirty keys set many times between flushes are written only once
+      with self.config_pickle_lock:
+        if not force and len(self.config_pickle_dirty) == 0:
+          return
+        dirty = set(self.config_pickle_dirty)
+        self.config_pickle_dirty.clear()
+        data = json.dumps(self.config_pickle, default=self.config_state_encoder)
+      #atomic rename. the old file remains on power failure while writing
+      tmp_file = self.config_state_file + ".tmp"
+      try:
+        with open(tmp_file, 'w') as f:
+          f.write(data)
+          f.flush()
+          os.fsync(f.fileno())
+        os.replace(tmp_file, self.config_state_file)
+      except OSError:
+        traceback.print_exc()
+        #retry at the next flush (and at quit)
+        with self.config_pickle_lock:
+          self.config_pickle_dirty.update(dirty)
+
+  @staticmethod
+  def config_state_encoder(obj):
+    if isinstance(obj, np.ndarray):
+      return {'__ndarray__': obj.tolist()}
+    elif isinstance(obj, np.generic):
+      return obj.item()
+    raise TypeError(repr(obj) + " is not JSON serializable")
+
+  @staticmethod
+  def config_state_decoder(obj):
+    if '__ndarray__' in obj:
+      return np.array(obj['__ndarray__'])
+    return obj
 
   def read_map_list(self):
     text = None
@@ -36,29 +36,64 @@ class GUI_Config():
 
   G_ITEM_DEF = {
     #integrated
-    "Power":(G_UNIT["Power"],"self.sensor.values['integrated']['power']"),
-    "Speed":(G_UNIT["Speed"],"self.sensor.values['integrated']['speed']"),
-    "Dist.":(G_UNIT["Distance"],"self.sensor.values['integrated']['distance']"),
-    "Cad.":(G_UNIT["Cadence"],"self.sensor.values['integrated']['cadence']"),
-    "HR":(G_UNIT["HeartRate"],"self.sensor.values['integrated']['hr']"),
-    "Work":(G_UNIT["Work"],"self.sensor.values['integrated']['accumulated_power']"),
-    "Grade":(G_UNIT["Grade"],"self.sensor.values['integrated']['grade']"),
-    "Grade(spd)":(G_UNIT["Grade"],"self.sensor.values['integrated']['grade_spd']"),
-    "GlideRatio":("{0:.0f}m","self.sensor.values['integrated']['glide_ratio']"),
+    "Power":(G_UNIT["Power"],"self.snapshot['integrated']['power']"),
+    "Speed":(G_UNIT["Speed"],"self.snapshot['integrated']['speed']"),
+    "Dist.":(G_UNIT["Distance"],"self.snapshot['integrated']['distance']"),
+    "Cad.":(G_UNIT["Cadence"],"self.snapshot['integrated']['cadence']"),
+    "HR":(G_UNIT["HeartRate"],"self.snapshot['integrated']['hr']"),
+    "Work":(G_UNIT["Work"],"self.snapshot['integrated']['accumulated_power']"),
+    "Grade":(G_UNIT["Grade"],"self.snapshot['integrated']['grade']"),
+    "Grade(spd)":(G_UNIT["Grade"],"self.snapshot['integrated']['grade_spd']"),
+    "GlideRatio":("{0:.0f}m","self.snapshot['integrated']['glide_ratio']"),
     #GPS raw
-    "Latitude":(G_UNIT["Position"],"self.sensor.values['GPS']['lat']"),
-    "Longitude":(G_UNIT["Position"],"self.sensor.values['GPS']['lon']"),
-    "Alt.(GPS)":(G_UNIT["Altitude"],"self.sensor.values['GPS']['alt']"),
-    "Speed(GPS)":(G_UNIT["Speed"],"self.sensor.values['GPS']['speed']"),
-    "Dist.(GPS)":(G_UNIT["Distance"],"self.sensor.values['GPS']['distance']"),
-    "Heading(GPS)":("{0:^s}","self.sensor.values['GPS']['track_str']"),
-    "Satellites":("{0:^s}","self.sensor.values['GPS']['used_sats_str']"),
-    "Error":(G_UNIT["GPS_error"],"self.sensor.values['GPS']['error']"),
-    "Error(x)":(G_UNIT["GPS_error"],"self.sensor.values['GPS']['epx']"),
-    "Error(y)":(G_UNIT["GPS_error"],"self.sensor.values['GPS']['epy']"),
-    "GPSTime":("{0:^s}","self.sensor.values['GPS']['utctime']"),
-    "GPS Fix":("{0:^d}","self.sensor.values['GPS']['mode']"),
-    "Course Dist.":(G_UNIT["Distance"],"self.sensor.values['GPS']['course_distance']"),
+    "Latitude":(G_UNIT["Position"],"self.snapshot['GPS']['lat']"),
+    "Longitude":(G_UNIT["Position"],"self.snapshot['GPS']['lon']"),
+    "Alt.(GPS)":(G_UNIT["Altitude"],"self.snapshot['GPS']['alt']"),
+    "Speed(GPS)":(G_UNIT["Speed"],"self.snapshot['GPS']['speed']"),
+    "Dist.(GPS)":(G_UNIT["Distance"],"self.snapshot['GPS']['distance']"),
+    "Heading(GPS)":("{0:^s}","self.snapshot['GPS']['track_str']"),
+    "Satellites":("{0:^s}","self.snapshot['GPS']['used_sats_str']"),
+    "Error":(G_UNIT["GPS_error"],"self.snapshot['GPS']['error']"),
+    "Error(x)":(G_UNIT["GPS_error"],"self.snapshot['GPS']['epx']"),
+    "Error(y)":(G_UNIT["GPS_error"],"self.snapshot['GPS']['epy']"),
+    "GPSTime":("{0:^s}","self.snapshot['GPS']['utctime']"),
+    "GPS Fix":("{0:^d}","self.snapshot['GPS']['mode']"),
+    "Course Dist.":(G_UNIT["Distance"],"self.snapshot['GPS']['course_distance']"),
+    #Course (prefix sums of course, O(1) per update)
+    "Dist. to End":(G_UNIT["Distance"],\
+      "self.logger.course.get_remaining_distance(self.snapshot['GPS']['course_distance'])"),
+    "Asc. to End":(G_UNIT["Altitude"],\
+      "self.logger.course.get_remaining_ascent(self.snapshot['GPS']['course_index'], self.snapshot['GPS']['course_distance'])"),
+    "Dsc. to End":(G_UNIT["Altitude"],\
+      "self.logger.course.get_remaining_ascent(self.snapshot['GPS']['course_index'], self.snapshot['GPS']['course_distance'], descent=True)"),
+    "ETA":("{0:^s}",\
+      "self.logger.course.get_eta(self.snapshot['GPS']['course_distance'], self.logger.record_stats['entire_avg']['speed'])"),
+    "ETA(SPD)":("{0:^s}",\
+      "self.logger.course.get_eta(self.snapshot['GPS']['course_distance'], self.snapshot['integrated']['speed'])"),
+    "Dist. to CP":(G_UNIT["Distance"],\
+      "self.logger.course.get_point_distance(self.snapshot['GPS']['course_point_index'], self.snapshot['GPS']['course_distance'])"),
+    "Asc. to CP":(G_UNIT["Altitude"],\
+      "self.logger.course.get_point_ascent(self.snapshot['GPS']['course_point_index'], self.snapshot['GPS']['course_index'], self.snapshot['GPS']['course_distance'])"),
+    "Time to CP":("timer",\
+      "self.logger.course.get_time(self.logger.course.get_point_distance(self.snapshot['GPS']['course_point_index'], self.snapshot['GPS']['course_distance']), self.logger.record_stats['entire_avg']['speed'])"),
+    #Climb (current or next climb of course)
+    "Dist. to Climb":(G_UNIT["Distance"],\
+      "self.logger.course.get_climb_value(self.snapshot['GPS']['course_index'], self.snapshot['GPS']['course_distance'], 'to_start')"),
+    "Climb Dist.":(G_UNIT["Distance"],\
+      "self.logger.course.get_climb_value(self.snapshot['GPS']['course_index'], self.snapshot['GPS']['course_distance'], 'remaining_distance')"),
+    "Climb Asc.":(G_UNIT["Altitude"],\
+      "self.logger.course.get_climb_value(self.snapshot['GPS']['course_index'], self.snapshot['GPS']['course_distance'], 'remaining_ascent')"),
+    "Climb Slope":(G_UNIT["Grade"],\
+      "self.logger.course.get_climb_value(self.snapshot['GPS']['course_index'], self.snapshot['GPS']['course_distance'], 'remaining_grade')"),
+    "Climb Max Slope":(G_UNIT["Grade"],\
+      "self.logger.course.get_climb_value(self.snapshot['GPS']['course_index'], self.snapshot['GPS']['course_distance'], 'max_grade')"),
+    "Climb Cat.":("{0:^s}",\
+      "self.logger.course.get_climb_value(self.snapshot['GPS']['course_index'], self.snapshot['GPS']['course_distance'], 'category')"),
+    #Ghost (previous ride on the course)
+    "Ghost Gap":("{0:^s}",\
+      "self.logger.ghost.get_time_diff_str(self.snapshot['GPS']['ghost_time_diff'])"),
+    "Ghost Dist.":(G_UNIT["Distance"],\
+      "self.snapshot['GPS']['ghost_distance'] - self.snapshot['GPS']['course_distance']"),
     #ANT+ raw
     "HR(ANT+)":(G_UNIT["HeartRate"],\
       "self.sensor.values['ANT+'][self.config.G_ANT['ID_TYPE']['HR']]['hr']"),
@@ -112,22 +147,22 @@ class GUI_Config():
     "HR2":(G_UNIT["HeartRate"],"None"),
     "HR3":(G_UNIT["HeartRate"],"None"),
     #Sensor raw
-    "Temp":("{0:^3.0f}C","self.sensor.values['I2C']['temperature']"),
-    "Pressure":("{0:^4.0f}hPa","self.sensor.values['I2C']['pressure']"),
-    "Altitude":(G_UNIT["Altitude"],"self.sensor.values['I2C']['altitude']"),
-    "Accum.Alt.":(G_UNIT["Altitude"],"self.sensor.values['I2C']['accumulated_altitude']"),
-    "Vert.Spd":("{0:^3.1f}m/s","self.sensor.values['I2C']['vertical_speed']"),
-    "Ascent":(G_UNIT["Altitude"],"self.sensor.values['I2C']['total_ascent']"),
-    "Descent":(G_UNIT["Altitude"],"self.sensor.values['I2C']['total_descent']"),
-    "Light":("{0:^5.0f}","self.sensor.values['I2C']['light']"),
-    "Motion":("{0:^1.1f}","self.sensor.values['I2C']['motion']"),
-    "M_Stat":("{0:^1.1f}","self.sensor.values['I2C']['m_stat']"),
-    "ACC_X":("{0:^1.1f}","self.sensor.values['I2C']['acc'][0]"),
-    "ACC_Y":("{0:^1.1f}","self.sensor.values['I2C']['acc'][1]"),
-    "ACC_Z":("{0:^1.1f}","self.sensor.values['I2C']['acc'][2]"),
-    "Battery":("{0:^1.0f}%","self.sensor.values['I2C']['battery_percentage']"),
-    "Heading":("{0:^s}","self.sensor.values['I2C']['heading_str']"),
-    "Pitch":("{0:^1.0f}","self.sensor.values['I2C']['modified_pitch']"),
+    "Temp":("{0:^3.0f}C","self.snapshot['I2C']['temperature']"),
+    "Pressure":("{0:^4.0f}hPa","self.snapshot['I2C']['pressure']"),
+    "Altitude":(G_UNIT["Altitude"],"self.snapshot['I2C']['altitude']"),
+    "Accum.Alt.":(G_UNIT["Altitude"],"self.snapshot['I2C']['accumulated_altitude']"),
+    "Vert.Spd":("{0:^3.1f}m/s","self.snapshot['I2C']['vertical_speed']"),
+    "Ascent":(G_UNIT["Altitude"],"self.snapshot['I2C']['total_ascent']"),
+    "Descent":(G_UNIT["Altitude"],"self.snapshot['I2C']['total_descent']"),
+    "Light":("{0:^5.0f}","self.snapshot['I2C']['light']"),
+    "Motion":("{0:^1.1f}","self.snapshot['I2C']['motion']"),
+    "M_Stat":("{0:^1.1f}","self.snapshot['I2C']['m_stat']"),
+    "ACC_X":("{0:^1.1f}","self.snapshot['I2C']['acc'][0]"),
+    "ACC_Y":("{0:^1.1f}","self.snapshot['I2C']['acc'][1]"),
+    "ACC_Z":("{0:^1.1f}","self.snapshot['I2C']['acc'][2]"),
+    "Battery":("{0:^1.0f}%","self.snapshot['I2C']['battery_percentage']"),
+    "Heading":("{0:^s}","self.snapshot['I2C']['heading_str']"),
+    "Pitch":("{0:^1.0f}","self.snapshot['I2C']['modified_pitch']"),
     #General
     "Timer":("timer","self.logger.values['count']"),
     "LapTime":("timer","self.logger.values['count_lap']"),
@@ -137,6 +172,27 @@ class GUI_Config():
     "GrossAveSPD":(G_UNIT["Speed"],"self.logger.values['gross_ave_spd']"),
     "GrossDiffTime":("{0:^s}","self.logger.values['gross_diff_time']"),
     "CPU_MEM":("{0:^s}","self.sensor.values['CPU_MEM']"),
+    #Ride catalog (year to date totals of past rides)
+    "Rides(YTD)":("{0:^d}","self.logger.logger_catalog.values['rides']"),
+    "Dist.(YTD)":(G_UNIT["Distance"],"self.logger.logger_catalog.values['distance']"),
+    "Asc.(YTD)":(G_UNIT["Altitude"],"self.logger.logger_catalog.values['total_ascent']"),
+    "Hours(YTD)":("{0:^3.1f}h","self.logger.logger_catalog.values['total_timer_time']/3600"),
+    #Power analytics
+    "Power(3s)":(G_UNIT["Power"],"self.logger.power_analytics.values['power_3s']"),
+    "Power(10s)":(G_UNIT["Power"],"self.logger.power_analytics.values['power_10s']"),
+    "Power(30s)":(G_UNIT["Power"],"self.logger.power_analytics.values['power_30s']"),
+    "NP":(G_UNIT["Power"],"self.logger.power_analytics.values['normalized_power']"),
+    "IF":("{0:^1.2f}","self.logger.power_analytics.values['intensity_factor']"),
+    "TSS":("{0:^3.0f}","self.logger.power_analytics.values['training_stress_score']"),
+    "W'bal":("{0:^3.1f}kJ","self.logger.power_analytics.values['w_prime_balance']"),
+    "MMP 5s":(G_UNIT["Power"],"self.logger.power_analytics.mmp.values[5]"),
+    "MMP 1m":(G_UNIT["Power"],"self.logger.power_analytics.mmp.values[60]"),
+    "MMP 5m":(G_UNIT["Power"],"self.logger.power_analytics.mmp.values[300]"),
+    "MMP 20m":(G_UNIT["Power"],"self.logger.power_analytics.mmp.values[1200]"),
+    "MMP 60m":(G_UNIT["Power"],"self.logger.power_analytics.mmp.values[3600]"),
+    #Time in zones
+    "HR Zone":("{0:^1.0f}","self.logger.zone_time.zone['heart_rate']"),
+    "PWR Zone":("{0:^1.0f}","self.logger.zone_time.zone['power']"),
     #Statistics
     #Pre Lap Average or total
     "PLap HR":(G_UNIT["HeartRate"],"self.logger.record_stats['pre_lap_avg']['heart_rate']"),
@@ -192,11 +248,25 @@ class GUI_Config():
 
   def __init__(self, config):
     self.config = config
+    self.add_zone_items()
     
     #read layout
     if os.path.exists(self.config.G_LAYOUT_FILE):
       self.read_layout()
 
+  def add_zone_items(self):
+    #time in zones items (HR Z1, Lap HR Z1, PWR Z1, ...) for the number of zones in setting.conf
+    self.G_ITEM_DEF = dict(self.G_ITEM_DEF)
+    zone_num = {
+      "HR":("heart_rate", len(self.config.G_ZONE_HR)),
+      "PWR":("power", len(self.config.G_ZONE_POWER) or len(self.config.G_ZONE_POWER_RATIO)),
+      }
+    for name, (key, n) in zone_num.items():
+      for l_e, prefix in [['entire', ""], ['lap', "Lap "]]:
+        for z in range(1, n + 1):
+          self.G_ITEM_DEF["{}{} Z{}".format(prefix, name, z)] = \
+            ("timer", "self.logger.zone_time.values['{}']['{}'][{}]".format(l_e, key, z))
+
   def read_layout(self):
     text = None
     with open(self.config.G_LAYOUT_FILE) as file:
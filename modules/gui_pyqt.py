@@ -226,13 +226,22 @@ class GUI_PyQt(QtCore.QObject):
         elif k == "PERFORMANCE_GRAPH":
           self.performance_graph_widget = pyqt_graph.PerformanceGraphWidget(self.main_page, self.config)
           self.main_page.addWidget(self.performance_graph_widget)
+        elif k == "POWER_DURATION_GRAPH":
+          self.power_duration_graph_widget = pyqt_graph.PowerDurationGraphWidget(self.main_page, self.config)
+          self.main_page.addWidget(self.power_duration_graph_widget)
+        elif k == "ZONE_BAR":
+          self.zone_bar_widget = pyqt_graph.ZoneBarWidget(self.main_page, self.config)
+          self.main_page.addWidget(self.zone_bar_widget)
+        elif k == "CLIMB_PROFILE_GRAPH" and os.path.exists(self.config.G_COURSE_FILE) and self.config.G_COURSE_INDEXING:
+          self.climb_profile_graph_widget = pyqt_graph.ClimbProfileWidget(self.main_page, self.config)
+          self.main_page.addWidget(self.climb_profile_graph_widget)
         elif k == "COURSE_PROFILE_GRAPH" and os.path.exists(self.config.G_COURSE_FILE) and self.config.G_COURSE_INDEXING:
           self.course_profile_graph_widget = pyqt_graph.CourseProfileGraphWidget(self.main_page, self.config)
           self.main_page.addWidget(self.course_profile_graph_widget)
         elif k == "SIMPLE_MAP":
           self.simple_map_widget = pyqt_graph.SimpleMapWidget(self.main_page, self.config)
           self.main_page.addWidget(self.simple_map_widget)
-        elif k == "CUESHEET" and len(self.config.logger.course.point_name) > 0 and self.config.G_COURSE_INDEXING and \
+        elif k == "CUESHEET" and os.path.exists(self.config.G_COURSE_FILE) and self.config.G_COURSE_INDEXING and \
           self.config.G_CUESHEET_DISPLAY_NUM > 0:
           self.cuesheet_widget = pyqt_graph.CueSheetWidget(self.main_page, self.config)
           self.main_page.addWidget(self.cuesheet_widget)
@@ -281,6 +290,8 @@ class GUI_PyQt(QtCore.QObject):
       if i == 0: continue
       t = "{0:.4f}".format((time_profile[i]-time_profile[i-1]).total_seconds())
       print("   ",'{:<13}'.format(diff_label[i-1]), ":", t)
+    #course is loaded in parallel with gui setup
+    print("   ",'{:<13}'.format("course"), ":", "ready" if self.config.logger.course_ready.is_set() else "loading")
 
     self.app.exec()  
     #exit this line
@@ -430,8 +441,7 @@ class GUI_PyQt(QtCore.QObject):
         print('lap button pressing : ', self.lap_button_count)
         if self.lap_button_count == self.config.G_BUTTON_LONG_PRESS:
           print('reset')
-          self.logger.reset_count()
-          self.simple_map_widget.reset_track()
+          self.logger.reset_count(callback=self.simple_map_widget.reset_track)
           self.lap_button_count = 0
     elif self.button_box_widget.lap_button._state == 1:
       self.button_box_widget.lap_button._state = 0
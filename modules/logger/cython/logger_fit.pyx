@@ -1,5 +1,5 @@
 cdef extern from "logger_fit_c.hpp":
-  cdef bint write_log_c(const char* db_file) except +
+  cdef bint write_log_c(const char* db_file) nogil except +
   #cdef bint write_log_c(const char* db_file)
   cdef cppclass config:
     int G_UNIT_ID_HEX
@@ -13,7 +13,11 @@ cdef extern from "logger_fit_c.hpp":
 def write_log_cython(str db_file):
   py_byte_string = db_file.encode('UTF-8')
   cdef char* c_db_file = py_byte_string
-  return write_log_c(c_db_file)
+  cdef bint result
+  #the writer uses no python objects (other threads run meanwhile)
+  with nogil:
+    result = write_log_c(c_db_file)
+  return result
 
 def set_config(G_CONFIG):
   cdef config cfg
@@ -21,17 +21,17 @@ void reset() {
 
   profile_indexes = {
     {0,  {0,1,2,3,4,5,7,8}}, //file_id
-    {18, {253,2,5,7,8,9,14,15,16,17,18,19,20,21,22,23,26,48}}, //session
+    {18, {253,2,5,7,8,9,14,15,16,17,18,19,20,21,22,23,26,48,34,35,36,45}}, //session
     {19, {253,2,7,8,9,13,14,15,16,17,18,19,20,21,22,42}}, //lap
     {20, {253,0,1,2,3,4,5,6,7,13,29}}, //record
     {21, {0,1,2,3,4,5,6,253}}, //activity
     {49, {0,1}}, //file_creator
   };
 
-  sql_indexes = {
+  summary_indexes = {
     {18, 
       {
-        {253,8,9,14,16,18,20,22,23,26,48},
+        {253,8,9,14,16,18,20,22,23,26,48,34,35,36,45},
         {2,15,17,19,21}
       }
     },
@@ -72,6 +72,10 @@ void reset() {
         {23, {"total_descent","uint16"}},
         {26, {"num_laps","uint16"}},
         {48, {"total_work","uint32"}},
+        {34, {"normalized_power","uint16"}},
+        {35, {"training_stress_score","uint16"}},
+        {36, {"intensity_factor","uint16"}},
+        {45, {"threshold_power","uint16"}},
       }
     },
     {19, 
@@ -129,44 +133,38 @@ void reset() {
     },
   };
 
-  sql_items = {
+  column_items = {
     {18,
       {
-        {"timestamp,total_timer_time,distance,avg_speed,avg_heart_rate,avg_cadence,avg_power,total_ascent,total_descent,lap,accumulated_power"},
-        {"MIN(timestamp),MAX(speed),MAX(heart_rate),MAX(cadence),MAX(power)"},
+        {"timestamp","total_timer_time","distance","avg_speed","avg_heart_rate","avg_cadence","avg_power","total_ascent","total_descent","lap","accumulated_power","normalized_power","training_stress_score","intensity_factor","threshold_power"},
+        {"timestamp","speed","heart_rate","cadence","power"},
       }
     },
     {19,
       {
-        {"timestamp,timer,lap_distance,lap_speed,lap_heart_rate,lap_cadence,lap_power,lap_total_ascent,lap_total_descent,lap_accumulated_power"},
-        {"MIN(timestamp),MAX(speed),MAX(heart_rate),MAX(cadence),MAX(power)"},
+        {"timestamp","timer","lap_distance","lap_speed","lap_heart_rate","lap_cadence","lap_power","lap_total_ascent","lap_total_descent","lap_accumulated_power"},
+        {"timestamp","speed","heart_rate","cadence","power"},
       }
     },
     {20,
       {
-        {"timestamp,position_lat,position_long,altitude,heart_rate,cadence,distance,speed,power,temperature,accumulated_power"} 
+        {"timestamp","position_lat","position_long","altitude","heart_rate","cadence","distance","speed","power","temperature","accumulated_power"}
       }
     },
   };
-  base_sql = {
-    {18,
-      { 
-        {"SELECT %s FROM BIKECOMPUTER_LOG WHERE total_timer_time = (SELECT MAX(total_timer_time) FROM BIKECOMPUTER_LOG)"},
-        {"SELECT %s FROM BIKECOMPUTER_LOG"}
-      }
-    },
-    {19,
-      { 
-        {"SELECT %s FROM BIKECOMPUTER_LOG WHERE LAP = %d AND TIMER = (SELECT MAX(TIMER) FROM BIKECOMPUTER_LOG WHERE LAP = %d)"},
-        {"SELECT %s FROM BIKECOMPUTER_LOG WHERE LAP = %d"}
+  columns = {"lap"};
+  column_indexes.clear();
+  for(auto& item: column_items) {
+    for(auto& names: item.second) {
+      std::vector<int> indexes;
+      for(auto& name: names) {
+        indexes.push_back(add_column(name));
       }
-    },
-    {20,
-      {
-        {"SELECT %s FROM BIKECOMPUTER_LOG WHERE lap = %d"} 
-      }
-    },
-  };
+      column_indexes[item.first].push_back(indexes);
+    }
+  }
+  summary_key_column[18] = add_column("total_timer_time");
+  summary_key_column[19] = add_column("timer");
 
   local_num[0] = 0;
   local_num_field[0] = {3,4,1,0};
@@ -178,6 +176,8 @@ void reset() {
   data_scale[18][9] = 100;
   data_scale[18][14] = 1000;
   data_scale[18][15] = 1000;
+  data_scale[18][35] = 10;
+  data_scale[18][36] = 1000;
   data_scale[19][7] = 1000;
   data_scale[19][8] = 1000;
   data_scale[19][9] = 100;
@@ -205,9 +205,15 @@ void reset() {
     {"byte", 0x0d},
   };
   base_type_size = {1,1,1,2,2,4,4,1,4,8,1,2,4,1};
+}
 
-  struct tm epoch_datetime = {0,0,0,31,11,1989-1900}; //"1989-12-31 00:00:00"
-  epoch_datetime_sec = mktime(&epoch_datetime);
+int add_column(const std::string& name) {
+  auto res = std::find(columns.begin(), columns.end(), name);
+  if(res != columns.end()) {
+    return res - columns.begin();
+  }
+  columns.push_back(name);
+  return columns.size() - 1;
 }
 
 bool exit_with_error(const char* message, sqlite3* db) {
@@ -242,61 +248,25 @@ unsigned int crc16(std::vector<uint8_t>& data) {
   return crc;
 }
 
-int convert_value(const char* value_str, const int data_type) {
-  int value = 0;
+int convert_value(double value, const int data_type) {
   //latitude(0) longitude(1)
   if(message_num == 20 and (data_type == 0 or data_type == 1)) {
-    value = int(atof(value_str) * LAT_LON_CONST); //int(atof(value_str) / 180 * pow(2,31));
-  }
-  //timestamp(253), local_timestamp, start_time
-  else if (
-    (message_num == 0 and data_type == 4) or 
-    ((message_num == 18 or message_num == 19) and (data_type == 253 or data_type == 2)) or 
-    (message_num == 20 and data_type == 253)
-  ) {
-    std::string s(value_str);
-    struct tm t = {
-      atoi(s.substr(17,2).c_str()),
-      atoi(s.substr(14,2).c_str()),
-      atoi(s.substr(11,2).c_str()),
-      atoi(s.substr(8,2).c_str()),
-      atoi(s.substr(5,2).c_str())-1,
-      atoi(s.substr(0,4).c_str())-1900,
-    };
-    value = int(difftime(mktime(&t), epoch_datetime_sec));
+    return int(value * LAT_LON_CONST); //int(value / 180 * pow(2,31));
   }
   //altitude(2): with scale and offset
   else if (message_num == 20 and data_type == 2) {
-    value = int(data_scale[message_num][data_type] * (atof(value_str) + 500));
+    return int(data_scale[message_num][data_type] * (value + 500));
   }
   //distance(5), speed(6): with scale
   else if (
-    (message_num == 18 and (data_type == 8 or data_type == 9 or data_type == 14 or data_type == 15)) or 
+    (message_num == 18 and (data_type == 8 or data_type == 9 or data_type == 14 or data_type == 15 or data_type == 35 or data_type == 36)) or 
     (message_num == 19 and (data_type == 8 or data_type == 9 or data_type == 13 or data_type == 14)) or 
     (message_num == 20 and (data_type == 5 or data_type == 6))
   ) {
-    value = data_scale[message_num][data_type] * atof(value_str);
-  }
-  else {
-    value = int(atof(value_str));
-  }
-  return value;
-}
-
-static int parse_single_str(void *user_data, int argc, char **argv, char **azColName) {
-  char *data_str = (char*)user_data;
-  for(int i = 0; i < argc; ++i) {
-    strcpy(data_str, argv[i]);
+    return int(data_scale[message_num][data_type] * value);
   }
-  return 0;
-}
-
-static int parse_single_num(void *user_data, int argc, char **argv, char **azColName) {
-  int *num = (int*)user_data;
-  for(int i = 0; i < argc; ++i) {
-    (*num) = int(atof(argv[i]));
-  }
-  return 0;
+  //timestamp(253), start_time(2) are selected as seconds from the FIT epoch
+  return int(value);
 }
 
 void add_fit_data(std::vector<uint8_t>& _bytes, std::vector<int>& _data, std::vector<int>& _size) {
@@ -355,36 +325,8 @@ void write_definition() {
 
 }
 
-static int parse_records_message_num_18_19(void *user_data, int argc, char **argv, char **azColName) {
-  std::vector<lap_summary_data> *_data = (std::vector<lap_summary_data>*)user_data;
-  for(int i = 0; i < argc; ++i) {
-    lap_summary_data d;
-    if(argv[i] == NULL) {
-      d.is_null = true;
-      d.data = "";
-    }
-    else {
-      d.data = std::string(argv[i]);
-    }
-    (*_data).push_back(d);
-  }
-  return 0;
-}
-
-static int parse_records_message_num_20(void *user_data, int argc, char **argv, char **azColName) {
-  //int *counter = (int*)user_data;
-  std::vector<int> available_fields, available_data, _size;
-  available_fields.reserve(argc*sizeof(int));
-  available_data.reserve(argc*sizeof(int));
-
-  int index;
-  for(int i = 0; i < argc; ++i) {
-    if(argv[i] == NULL) continue;
-    index = profile_indexes[message_num][i];
-    available_fields.push_back(index);
-    available_data.push_back(convert_value(argv[i], index));
-  }
-
+void write_message(std::vector<int>& available_fields, std::vector<int>& available_data) {
+  std::vector<int> _size;
   int l_num = get_local_message_num(available_fields);
   bool l_num_used = true;
   if(l_num == -1) {
@@ -400,33 +342,63 @@ static int parse_records_message_num_20(void *user_data, int argc, char **argv,
 
   //write data
   add_fit_data(fit_data, available_data, _size);
+}
 
-  return 0;
+void read_row(sqlite3_stmt *stmt, std::vector<column_data>& row) {
+  for(int i = 0, n = row.size(); i < n; ++i) {
+    row[i].is_null = (sqlite3_column_type(stmt, i) == SQLITE_NULL);
+    row[i].data = row[i].is_null ? 0 : sqlite3_column_double(stmt, i);
+  }
 }
 
-bool get_summary(int lap_num, sqlite3 *db) {
-  int rc;
-  char *zErrMsg = 0;
-  std::unordered_map<int, std::vector<lap_summary_data> > _ret_data;
-  std::vector<int> available_fields, available_data, _size;
-  _ret_data[0].reserve(profile_indexes[message_num].size());
-  _ret_data[1].reserve(profile_indexes[message_num].size());
-  
-  char _sql_ave[strlen(base_sql[message_num][0].c_str())+strlen(sql_items[message_num][0].c_str())+10];
-  char _sql_MAX_MIN[strlen(base_sql[message_num][1].c_str())+strlen(sql_items[message_num][1].c_str())+10];
-  if(message_num == 19) {
-    sprintf(_sql_ave, base_sql[message_num][0].c_str(), sql_items[message_num][0].c_str(), lap_num, lap_num);
-    sprintf(_sql_MAX_MIN, base_sql[message_num][1].c_str(), sql_items[message_num][1].c_str(), lap_num);
+void write_record(std::vector<column_data>& row) {
+  std::vector<int>& indexes = column_indexes[message_num][0];
+  std::vector<int> available_fields, available_data;
+  available_fields.reserve(indexes.size());
+  available_data.reserve(indexes.size());
+
+  for(int i = 0, n = indexes.size(); i < n; ++i) {
+    if(row[indexes[i]].is_null) continue;
+    int index = profile_indexes[message_num][i];
+    available_fields.push_back(index);
+    available_data.push_back(convert_value(row[indexes[i]].data, index));
+  }
+  write_message(available_fields, available_data);
+}
+
+void reset_summary(summary_data& summary, int m_num) {
+  summary.key = column_data();
+  summary.last.assign(column_indexes[m_num][0].size(), column_data());
+  summary.min_max.assign(column_indexes[m_num][1].size(), column_data());
+}
+
+void update_summary(summary_data& summary, int m_num, std::vector<column_data>& row) {
+  std::vector<std::vector<int> >& indexes = column_indexes[m_num];
+
+  //values of the first row with the max timer
+  column_data& key = row[summary_key_column[m_num]];
+  if(!key.is_null and (summary.key.is_null or key.data > summary.key.data)) {
+    summary.key = key;
+    for(int i = 0, n = indexes[0].size(); i < n; ++i) {
+      summary.last[i] = row[indexes[0][i]];
+    }
   }
-  else if (message_num == 18) {
-    sprintf(_sql_ave, base_sql[message_num][0].c_str(), sql_items[message_num][0].c_str());
-    sprintf(_sql_MAX_MIN, base_sql[message_num][1].c_str(), sql_items[message_num][1].c_str());
+
+  //MIN(timestamp), MAX(speed), MAX(heart_rate), MAX(cadence), MAX(power)
+  for(int i = 0, n = indexes[1].size(); i < n; ++i) {
+    column_data& d = row[indexes[1][i]];
+    column_data& s = summary.min_max[i];
+    if(d.is_null) continue;
+    if(s.is_null or (i == 0 and d.data < s.data) or (i > 0 and d.data > s.data)) {
+      s = d;
+    }
   }
+}
 
-  rc = sqlite3_exec(db, _sql_ave, parse_records_message_num_18_19, &_ret_data[0], &zErrMsg);
-  if(rc) { return exit_with_error("SQL error(lap_session_ave)", db); }
-  rc = sqlite3_exec(db, _sql_MAX_MIN, parse_records_message_num_18_19, &_ret_data[1], &zErrMsg);
-  if(rc) { return exit_with_error("SQL error(lap_session_MAX_MIN)", db); }
+void write_summary(summary_data& summary) {
+  std::vector<int> available_fields, available_data;
+  available_fields.reserve(profile_indexes[message_num].size());
+  available_data.reserve(profile_indexes[message_num].size());
 
   for(int i: profile_indexes[message_num]){
     //sport = 2(cycling) in session(message_num = 18)
@@ -439,23 +411,22 @@ bool get_summary(int lap_num, sqlite3 *db) {
       continue;
     }
 
-    int ave_or_MAX_MIN = -1;
-    int index = -1;
+    column_data *d = NULL;
 
     //get data
     for(int j = 0; j < 2; ++j) {
-      auto res = std::find(sql_indexes[message_num][j].begin(), sql_indexes[message_num][j].end(), i);
-      if(res != sql_indexes[message_num][j].end()) {
-        ave_or_MAX_MIN = j;
-        index = res - sql_indexes[message_num][j].begin();
+      auto res = std::find(summary_indexes[message_num][j].begin(), summary_indexes[message_num][j].end(), i);
+      if(res != summary_indexes[message_num][j].end()) {
+        int index = res - summary_indexes[message_num][j].begin();
+        d = (j == 0) ? &summary.last[index] : &summary.min_max[index];
         break;
       }
     }
     
-    if(_ret_data[ave_or_MAX_MIN][index].is_null) continue;
+    if(d == NULL or d->is_null) continue;
     
     available_fields.push_back(i);
-    available_data.push_back(convert_value(_ret_data[ave_or_MAX_MIN][index].data.c_str(), i));
+    available_data.push_back(convert_value(d->data, i));
   }
 
   if(message_num == 18) {
@@ -463,30 +434,13 @@ bool get_summary(int lap_num, sqlite3 *db) {
     available_data.push_back(2);
   }
 
-  int l_num = get_local_message_num(available_fields);
-  bool l_num_used = true;
-  if(l_num == -1) {
-    l_num_used = false;
-    //write header if need
-    local_message_num = (local_message_num + 1)%16;
-    local_num[local_message_num] = message_num;
-    local_num_field[local_message_num] = available_fields;
-    write_definition();
-    l_num = local_message_num;
-  }
-  get_struct_def(_size, l_num, l_num_used);
-
-  //write data
-  add_fit_data(fit_data, available_data, _size);
-
-  return true;
+  write_message(available_fields, available_data);
 }
 
 bool write_log_c(const char* db_file) {
   sqlite3 *db;
-  char *zErrMsg = 0;
-  int rc, max_lap, rows;
-  char start_date[30], end_date[30];
+  sqlite3_stmt *stmt;
+  int rc, rows = 0, laps = 0;
   std::vector<int> _size;
   std::vector<int> _data;
   reset();
@@ -496,26 +450,20 @@ bool write_log_c(const char* db_file) {
     fprintf(stderr, "db file doesn't exist\n");
     return false;
   }
+  fclose(fp_db);
   rc = sqlite3_open(db_file, &db);
   if(rc) { return exit_with_error("Can't open database", db); }
 
-  //get start_date and end_date
-  message_num = 0;
-  rc = sqlite3_exec(db, "SELECT MIN(timestamp) FROM BIKECOMPUTER_LOG", parse_single_str, &start_date, &zErrMsg);
-  if(rc) { return exit_with_error("SQL error(start_date)", db); }
-  time_t start_date_epoch = convert_value(start_date, 4);
-  rc = sqlite3_exec(db, "SELECT MAX(timestamp) FROM BIKECOMPUTER_LOG", parse_single_str, &end_date, &zErrMsg);
-  if(rc) { return exit_with_error("SQL error(end_date)", db); }
-  time_t end_date_epoch = convert_value(end_date, 4);
-
   //file_id (message_num:0)
   message_num = 0;
   local_message_num = 0;
   write_definition(); //need message_num, local_message_num
   get_struct_def(_size, local_message_num, true);
+  //time_created is set after the records are read
+  size_t time_created_pos = fit_data.size() + _size[0];
   _data = {
     cfg.G_UNIT_ID_HEX,     // serial_number: XXXXXXXXXX
-    (int)start_date_epoch, //timestamp()
+    0,                     //timestamp()
     255,                   //manufacturer (255: development)
     4                      //type
   };
@@ -533,40 +481,83 @@ bool write_log_c(const char* db_file) {
   add_fit_data(fit_data, _data, _size);
   //printf("header: %d\n", (int)crc16(fit_data));
 
-  //get records
-  message_num = 20;
-  rc = sqlite3_exec(db, "SELECT COUNT(*) FROM BIKECOMPUTER_LOG", parse_single_num, &rows, &zErrMsg);
-  if(rc) { return exit_with_error("SQL error(rows)", db); }
-  printf("rows: %d, size: %d\n", rows, int(rows * profile_indexes[message_num].size() * sizeof(int)));
-  fit_data.reserve(rows * profile_indexes[message_num].size() * sizeof(int));
-
-  //get Max Lap
-  rc = sqlite3_exec(db, "SELECT MAX(lap) FROM BIKECOMPUTER_LOG", parse_single_num, &max_lap, &zErrMsg);
-  if(rc) { return exit_with_error("SQL error(max_lap)", db); }
-  ++max_lap;
-  printf("max_lap: %d\n", max_lap);
-
-  //get log records by laps
-  for(int lap_num = 0; lap_num < max_lap; ++lap_num) {
-    //get log records
-    message_num = 20;
-    char _sql[strlen(base_sql[message_num][0].c_str())+strlen(sql_items[message_num][0].c_str())+10];
-    sprintf(_sql, base_sql[message_num][0].c_str(), sql_items[message_num][0].c_str(), lap_num);
-    message_num = 20;
-    rc = sqlite3_exec(db, _sql, parse_records_message_num_20, NULL, &zErrMsg);
-    if(rc) { return exit_with_error("SQL error(record)", db); }
-    //printf("records: %d\n", (int)crc16(fit_data));
+  //estimate of rows (MAX(rowid) doesn't scan the table)
+  rc = sqlite3_prepare_v2(db, "SELECT MAX(rowid) FROM BIKECOMPUTER_LOG", -1, &stmt, NULL);
+  if(rc != SQLITE_OK) { return exit_with_error("SQL error(rows)", db); }
+  if(sqlite3_step(stmt) == SQLITE_ROW) {
+    rows = sqlite3_column_int(stmt, 0);
+  }
+  sqlite3_finalize(stmt);
+  printf("rows: %d, size: %d\n", rows, int(rows * profile_indexes[20].size() * sizeof(int)));
+  fit_data.reserve(rows * profile_indexes[20].size() * sizeof(int));
+
+  //records, lap and session summaries in one ordered pass
+  std::string sql = "SELECT ";
+  for(int i = 0, n = columns.size(); i < n; ++i) {
+    if(i > 0) sql += ",";
+    if(columns[i] == "timestamp") {
+      //utc epoch to seconds from the FIT epoch
+      sql += "timestamp-" + std::to_string(FIT_EPOCH_SEC);
+    }
+    else {
+      sql += columns[i];
+    }
+  }
+  sql += " FROM BIKECOMPUTER_LOG WHERE lap >= 0 ORDER BY lap, rowid";
+  rc = sqlite3_prepare_v2(db, sql.c_str(), -1, &stmt, NULL);
+  if(rc != SQLITE_OK) { return exit_with_error("SQL error(record)", db); }
+
+  std::vector<column_data> row(columns.size());
+  summary_data lap_summary, session_summary;
+  reset_summary(session_summary, 18);
+  int timestamp_column = add_column("timestamp");
+  time_t start_date_epoch = 0, end_date_epoch = 0;
+  int current_lap = -1;
+
+  while((rc = sqlite3_step(stmt)) == SQLITE_ROW) {
+    int lap_num = sqlite3_column_int(stmt, 0);
+    read_row(stmt, row);
 
     //make lap summary
-    message_num = 19;
-    if(!get_summary(lap_num, db)) return false;
-    //printf("lap: %d\n", (int)crc16(fit_data));
+    if(lap_num != current_lap) {
+      if(current_lap != -1) {
+        message_num = 19;
+        write_summary(lap_summary);
+      }
+      reset_summary(lap_summary, 19);
+      current_lap = lap_num;
+      ++laps;
+    }
+
+    //write log record
+    message_num = 20;
+    write_record(row);
+
+    update_summary(lap_summary, 19, row);
+    update_summary(session_summary, 18, row);
+    if(!row[timestamp_column].is_null) {
+      time_t t = (time_t)row[timestamp_column].data;
+      if(start_date_epoch == 0 or t < start_date_epoch) start_date_epoch = t;
+      if(t > end_date_epoch) end_date_epoch = t;
+    }
   }
-  
+  sqlite3_finalize(stmt);
+  if(rc != SQLITE_DONE) { return exit_with_error("SQL error(record)", db); }
+  if(current_lap == -1) { return exit_with_error("no records", db); }
+  printf("laps: %d\n", laps);
+
+  //make last lap summary
+  message_num = 19;
+  write_summary(lap_summary);
+  //printf("lap: %d\n", (int)crc16(fit_data));
+
   //make sesson summary
   message_num = 18;
-  if(!get_summary(0, db)) return false;
+  write_summary(session_summary);
   //printf("session: %d\n", (int)crc16(fit_data));
+
+  int time_created = (int)start_date_epoch;
+  memcpy(&fit_data[time_created_pos], &time_created, sizeof(time_created));
   
   //make activity
   message_num = 34;
@@ -596,7 +587,7 @@ bool write_log_c(const char* db_file) {
   sqlite3_close(db);
 
   //write fit file
-  time_t startdate_local_epoch = start_date_epoch+epoch_datetime_sec+lt.tm_gmtoff;
+  time_t startdate_local_epoch = start_date_epoch+FIT_EPOCH_SEC;
   char startdate_local[15], filename[100], startdate_str[20];
   strftime(startdate_local, sizeof(startdate_local), "%Y%m%d%H%M%S", localtime(&startdate_local_epoch));
   strftime(startdate_str, sizeof(startdate_str), "%Y%m%d%H%M%S.fit", localtime(&startdate_local_epoch));
@@ -20,7 +20,8 @@ static  int message_num, local_message_num;
 
 static  std::unordered_map<int, std::vector<int> > profile_indexes;
 //for lap and session, divide profile_indexes into 2 group
-static std::unordered_map<int, std::vector<std::vector<int> > > sql_indexes;
+//  [0]: values of the row with the max timer, [1]: MIN(timestamp) and MAX(speed, heart_rate, cadence, power)
+static std::unordered_map<int, std::vector<std::vector<int> > > summary_indexes;
 static std::unordered_map<int, std::unordered_map<int, std::vector<std::string> > > profile_name_type;
 static std::unordered_map<int, std::unordered_map<int, int> > data_scale;
 
@@ -30,15 +31,28 @@ static std::unordered_map<int, std::vector<int> > local_num_field;
 static std::unordered_map<std::string, uint8_t> base_type_id;
 static std::vector<int> base_type_size;
 
-static std::unordered_map<int, std::unordered_map<int, std::string> > sql;
-static std::unordered_map<int, std::vector<std::string> > sql_items;
-static std::unordered_map<int, std::vector<std::string> > base_sql;
-
-static time_t epoch_datetime_sec;
+//columns of the single pass over BIKECOMPUTER_LOG (index 0 is lap)
+static std::vector<std::string> columns;
+//record(20): column names in the order of profile_indexes
+//lap(19), session(18): column names in the order of summary_indexes
+static std::unordered_map<int, std::vector<std::vector<std::string> > > column_items;
+static std::unordered_map<int, std::vector<std::vector<int> > > column_indexes;
+//lap(19): timer, session(18): total_timer_time
+static std::unordered_map<int, int> summary_key_column;
+
+//1989-12-31 00:00:00 UTC
+constexpr time_t FIT_EPOCH_SEC = 631065600;
+
+struct column_data {
+  bool is_null = true;
+  double data = 0;
+};
 
-struct lap_summary_data{
-  bool is_null = false;
-  std::string data;
+struct summary_data {
+  //the first row with the max timer
+  column_data key;
+  std::vector<column_data> last;
+  std::vector<column_data> min_max;
 };
 
 struct config {
@@ -67,20 +81,21 @@ inline uint8_t base_type_size_from_id(uint8_t base_type_id) {
 bool exit_with_error(const char* message, sqlite3* db);
 unsigned int crc16(std::vector<uint8_t>& data);
 
-int convert_value(const char* value_str, const int data_type);
-
-static int parse_single_str(void *user_data, int argc, char **argv, char **azColName);
-static int parse_single_num(void *user_data, int argc, char **argv, char **azColName);
+int convert_value(double value, const int data_type);
+int add_column(const std::string& name);
 
 void add_fit_data(std::vector<uint8_t>& _bytes, std::vector<int>& _data, std::vector<int>& _size);
 void get_struct_def(std::vector<int>& _size, int l_num, bool l_num_used);
 int get_local_message_num(std::vector<int>& available_fields);
 void write_definition();
+void write_message(std::vector<int>& available_fields, std::vector<int>& available_data);
 
-static int parse_records_message_num_18_19(void *user_data, int argc, char **argv, char **azColName);
-static int parse_records_message_num_20(void *user_data, int argc, char **argv, char **azColName);
+void read_row(sqlite3_stmt *stmt, std::vector<column_data>& row);
+void write_record(std::vector<column_data>& row);
 
-bool get_summary(int lap_num, sqlite3 *db);
+void reset_summary(summary_data& summary, int m_num);
+void update_summary(summary_data& summary, int m_num, std::vector<column_data>& row);
+void write_summary(summary_data& summary);
 
 bool write_log_c(const char* db_file);
 
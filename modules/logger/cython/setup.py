@@ -0,0 +1,28 @@
+#!/usr/bin/python3
+
+#build the cython FIT writer (logger_fit.pyx and logger_fit_c.cpp) ahead of time
+#usage: python3 modules/logger/cython/setup.py build_ext --inplace
+#  logger_fit.py imports the built extension only (never compiles at runtime),
+#  and uses the python writer if the extension is missing
+
+import os
+
+from setuptools import setup, Extension
+from Cython.Build import cythonize
+
+#sources and the built extension are in this directory
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+ext = Extension(
+  name = "logger_fit",
+  sources = ["logger_fit.pyx", "logger_fit_c.cpp"],
+  extra_compile_args = ["-std=c++17"],
+  language = "c++",
+  include_dirs = ["."],
+  extra_link_args = ["-lsqlite3"],
+  )
+
+setup(
+  name = "logger_fit",
+  ext_modules = cythonize([ext], language_level=3),
+  )
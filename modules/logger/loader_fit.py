@@ -0,0 +1,302 @@
+import os
+import mmap
+import datetime
+
+import numpy as np
+
+from .logger_fit import LoggerFit
+
+
+class LoaderFit():
+  #FIT file reader
+  #  the file is memory-mapped and the headers are walked once to collect the offsets
+  #  of data messages by definition, then the messages of each definition are decoded
+  #  at once into a numpy structured array
+  #  (a gather of the offsets, no unpack per message, also for interleaved messages)
+
+  #base type: numpy type, invalid value
+  base_types = {
+    0x00:('u1', 0xFF), 0x01:('i1', 0x7F), 0x02:('u1', 0xFF), 0x83:('i2', 0x7FFF), 0x84:('u2', 0xFFFF),
+    0x85:('i4', 0x7FFFFFFF), 0x86:('u4', 0xFFFFFFFF), 0x07:('S', None), 0x88:('f4', None), 0x89:('f8', None),
+    0x0A:('u1', 0), 0x8B:('u2', 0), 0x8C:('u4', 0), 0x0D:('u1', 0xFF),
+    0x8E:('i8', 0x7FFFFFFFFFFFFFFF), 0x8F:('u8', 0xFFFFFFFFFFFFFFFF), 0x90:('u8', 0),
+    }
+  #global message number: {field number: (name, type, scale, offset)}
+  #  session, lap and record of LoggerFit, and fields of other devices and courses
+  profile = {
+    18:dict(LoggerFit.profile[18]['field']),
+    19:dict(LoggerFit.profile[19]['field']),
+    20:{
+      **LoggerFit.profile[20]['field'],
+      73:("enhanced_speed","uint32",1000),
+      78:("enhanced_altitude","uint32",5,500),
+      },
+    31:{
+      5:("name","string"),
+      },
+    32:{
+      253:("timestamp","uint32"),
+      2:("position_lat","sint32"),
+      3:("position_long","sint32"),
+      4:("distance","uint32",100),
+      5:("type","enum"),
+      6:("name","string"),
+      },
+    }
+  message_names = {'session':18, 'lap':19, 'record':20, 'course':31, 'course_point':32}
+  semicircles_to_degrees = 180 / 2**31
+  #messages of the same header to walk one by one before finding the end of the run at once
+  run_length = 16
+  #first block of headers to find the end of a run (doubles while the run continues)
+  run_block = 64
+
+  def __init__(self):
+    self.reset()
+
+  def reset(self):
+    #global message number: list of (structured array, invalid values, timestamps, message index)
+    self.messages = {}
+    self.error = None
+
+  def read(self, filename):
+    self.reset()
+    if os.path.getsize(filename) < 12:
+      self.error = "not FIT file"
+      return False
+    with open(filename, 'rb') as f:
+      mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+      return self.read_messages(mm)
+    finally:
+      #decoded arrays are copies, no view of the map is left
+      mm.close()
+
+  def read_messages(self, data):
+    if data[8:12] != b'.FIT':
+      self.error = "not FIT file"
+      return False
+    pos = data[0]
+    end = min(pos + int.from_bytes(data[4:8], 'little'), len(data))
+    #definition: (global message number, dtype, invalid values)
+    definitions = []
+    #local message number: (index of definitions, size)
+    local_definitions = {}
+    #data messages in the file order
+    message_definition = []
+    message_offset = []
+    message_header = []
+    buf = np.frombuffer(data, dtype=np.uint8)
+    #consecutive messages with the same local message (and header type)
+    run = 0
+    run_header = None
+    try:
+      while pos < end:
+        header = data[pos]
+        #definition message
+        if header & 0xC0 == 0x40:
+          pos = self.read_definition(data, pos, definitions, local_definitions)
+          run_header = None
+          continue
+
+        if header & 0x80:
+          local_num = (header >> 5) & 0x03
+          h = header & 0xE0
+        else:
+          local_num = header & 0x0F
+          h = header
+        d, size = local_definitions[local_num]
+        if pos + size > end:
+          #truncated
+          break
+        if h == run_header:
+          run += 1
+        else:
+          run = 0
+          run_header = h
+        if run < self.run_length:
+          message_definition.append(d)
+          message_offset.append(pos)
+          message_header.append(header)
+          pos += size
+          continue
+        #long run: the rest of it at once
+        n = self.get_run_length(buf, pos, end, size, header)
+        message_definition.extend([d]*n)
+        message_offset.extend(range(pos, pos+n*size, size))
+        message_header.extend(buf[pos:pos+n*size:size].tolist())
+        pos += n*size
+        run = 0
+    except (IndexError, KeyError, ValueError) as e:
+      #use the messages until the error
+      self.error = "{}: {}".format(type(e).__name__, e)
+      print("ERROR parse fit:", self.error)
+
+    message_definition = np.array(message_definition, dtype=np.int64)
+    message_offset = np.array(message_offset, dtype=np.int64)
+    message_header = np.array(message_header, dtype=np.int64)
+    n = len(message_definition)
+    #timestamp fields (nan: no field or invalid)
+    timestamp = np.full(n, np.nan)
+    decoded = []
+
+    #messages of each definition (in the file order)
+    order = np.argsort(message_definition, kind='stable')
+    counts = np.bincount(message_definition, minlength=len(definitions))
+    for d, index in zip(range(len(definitions)), np.split(order, np.cumsum(counts)[:-1])):
+      global_num, dtype, invalid = definitions[d]
+      if len(index) == 0 or (global_num not in self.profile and 'f253' not in dtype.names):
+        continue
+      values = self.decode(buf, message_offset[index], dtype)
+      if 'f253' in dtype.names:
+        t = values['f253']
+        valid = (t != invalid['f253']) & (message_header[index] & 0x80 == 0)
+        timestamp[index[valid]] = t[valid]
+      if global_num in self.profile:
+        decoded.append((global_num, values, invalid, index))
+
+    timestamp = self.get_compressed_timestamp(timestamp, message_header)
+    for global_num, values, invalid, index in decoded:
+      self.messages.setdefault(global_num, []).append((values, invalid, timestamp[index], index))
+    return True
+
+  def decode(self, buf, offsets, dtype):
+    #messages at offsets into a structured array (copy, then the file can be released)
+    size = dtype.itemsize
+    if offsets[-1] - offsets[0] == (len(offsets)-1)*size:
+      #consecutive messages
+      return np.frombuffer(buf, dtype=dtype, count=len(offsets), offset=int(offsets[0])).copy()
+    return buf[offsets[:,None] + np.arange(size)].reshape(-1).view(dtype)
+
+  def get_compressed_timestamp(self, timestamp, header):
+    #timestamps of compressed headers from the last timestamp (field or compressed header)
+    #  timestamp + rollover of 5 bit offsets
+    compressed = (header & 0x80) != 0
+    target = np.flatnonzero(~np.isnan(timestamp) | compressed)
+    if not np.any(compressed[target]):
+      return timestamp
+    t = timestamp[target]
+    c = compressed[target]
+    offsets = header[target] & 0x1F
+    #lower 5 bits of each timestamp are the offset of compressed headers
+    low = np.where(c, offsets, np.nan_to_num(t).astype(np.int64) & 0x1F)
+    deltas = np.where(c, (offsets - np.concatenate(([0], low[:-1]))) & 0x1F, 0)
+    cumsum = np.cumsum(deltas)
+    #the last timestamp field (nan before the first one)
+    base = np.maximum.accumulate(np.where(c, -1, np.arange(len(t))))
+    has_base = base >= 0
+    base = np.maximum(base, 0)
+    t[c] = np.where(has_base, t[base] + cumsum - cumsum[base], np.nan)[c]
+    timestamp[target] = t
+    return timestamp
+
+  def get_run_length(self, buf, pos, end, stride, header):
+    #number of following messages with the same local message (and header type)
+    n_max = (end - pos) // stride
+    if header & 0x80:
+      mask = 0xE0
+    else:
+      mask = 0xFF
+    n = 0
+    block = self.run_block
+    while n < n_max:
+      m = min(block, n_max - n)
+      headers = buf[pos+n*stride:pos+(n+m)*stride:stride]
+      same = (headers & mask) == (header & mask)
+      if not same.all():
+        return n + int(np.argmin(same))
+      n += m
+      block *= 2
+    return n
+
+  def read_definition(self, data, pos, definitions, local_definitions):
+    header = data[pos]
+    endian = '>' if data[pos+2] else '<'
+    global_num = int.from_bytes(data[pos+3:pos+5], 'big' if endian == '>' else 'little')
+    field_n = data[pos+5]
+    pos += 6
+    names = ['header']
+    formats = ['u1']
+    offsets = [0]
+    invalid = {}
+    size = 1
+    for i in range(field_n):
+      num, field_size, base_type = data[pos], data[pos+1], data[pos+2]
+      pos += 3
+      fmt, inv = self.base_types.get(base_type, (None, None))
+      if fmt == 'S':
+        fmt = 'S{}'.format(field_size)
+      elif fmt != None and field_size == np.dtype(fmt).itemsize:
+        fmt = endian + fmt
+      else:
+        #arrays and unknown types are not decoded
+        fmt = None
+      if fmt != None and 'f{}'.format(num) not in names:
+        names.append('f{}'.format(num))
+        formats.append(fmt)
+        offsets.append(size)
+        invalid['f{}'.format(num)] = inv
+      size += field_size
+    #developer fields
+    if header & 0x20:
+      dev_field_n = data[pos]
+      pos += 1
+      for i in range(dev_field_n):
+        size += data[pos+1]
+        pos += 3
+    dtype = np.dtype({'names':names, 'formats':formats, 'offsets':offsets, 'itemsize':size})
+    local_definitions[header & 0x0F] = (len(definitions), size)
+    definitions.append((global_num, dtype, invalid))
+    return pos
+
+  def get_message(self, message):
+    #columns of a message by name with scales in the file order (invalid values are nan, strings are str)
+    global_num = self.message_names.get(message, message)
+    messages = self.messages.get(global_num, [])
+    indexes = np.sort(np.concatenate([m[3] for m in messages] + [np.array([], dtype=np.int64)]))
+    n = len(indexes)
+    #positions of the messages of each definition in the columns
+    positions = [np.searchsorted(indexes, m[3]) for m in messages]
+    columns = {}
+    for num, field in self.profile[global_num].items():
+      name, base_type = field[0], field[1]
+      key = 'f{}'.format(num)
+      if base_type == 'string':
+        column = np.full(n, '', dtype=object)
+      else:
+        column = np.full(n, np.nan)
+      for (values, invalid, timestamp, index), i in zip(messages, positions):
+        if num == 253:
+          #timestamp fields and compressed headers
+          column[i] = timestamp
+        elif key in values.dtype.names:
+          v = values[key]
+          if base_type == 'string':
+            column[i] = [s.split(b'\0')[0].decode('utf-8', errors='ignore') for s in v]
+          elif invalid[key] != None:
+            column[i] = np.where(v == invalid[key], np.nan, v)
+          else:
+            column[i] = v
+      if base_type != 'string':
+        if len(field) > 2:
+          column /= field[2]
+        if len(field) > 3:
+          column -= field[3]
+        if name.startswith('position_'):
+          column *= self.semicircles_to_degrees
+      columns[name] = column
+    return columns
+
+  def get_datetime(self, timestamp):
+    #FIT timestamp [s] to datetime (utc)
+    return LoggerFit.epoch_datetime + datetime.timedelta(seconds=float(timestamp))
+
+
+if __name__=="__main__":
+  import sys
+  t = datetime.datetime.now()
+  f = LoaderFit()
+  f.read(sys.argv[1])
+  print("read:", (datetime.datetime.now()-t).total_seconds(), "sec")
+  for m in ['session', 'lap', 'record']:
+    columns = f.get_message(m)
+    print(m, len(next(iter(columns.values()))))
@@ -0,0 +1,168 @@
+import os
+import sqlite3
+import datetime
+
+import numpy as np
+
+from .loader_fit import LoaderFit
+from .loader_npz import LoaderNpz
+
+
+class LoaderGhost():
+  #previous ride (log.db-*, npz or FIT) on the current course as a ghost rider
+  #  the ride is resampled onto the distance axis of the course once at loading,
+  #  so a lookup by course_index or timer is O(1) or searchsorted
+
+  config = None
+
+  #course arrays which the ghost is resampled onto
+  course_distance = np.array([]) #[km] (the same object as course.distance)
+  distance = np.array([]) #[m]
+  latitude = np.array([])
+  longitude = np.array([])
+  #time [s] of the ghost at each course point (nan: out of the ghost ride)
+  time = np.array([])
+  #valid range of time
+  start = 0
+  end = -1
+
+  #gaps of FIT timestamps longer than this [s] are pauses (log.db has the timer)
+  pause_threshold = 30
+
+  def __init__(self, config):
+    self.config = config
+
+  def reset(self):
+    self.course_distance = np.array([])
+    self.distance = np.array([])
+    self.latitude = np.array([])
+    self.longitude = np.array([])
+    self.time = np.array([])
+    self.start = 0
+    self.end = -1
+
+  def load(self, course):
+    self.reset()
+    filename = self.config.G_GHOST_FILE
+    if filename == "" or not os.path.exists(filename) or len(course.distance) < 2:
+      return
+    print("loading ghost", filename)
+
+    t = datetime.datetime.utcnow()
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.fit':
+      lat, lon, timer = self.read_fit(filename)
+    elif ext == '.npz':
+      lat, lon, timer = self.read_npz(filename)
+    else:
+      lat, lon, timer = self.read_log_db(filename)
+    valid = ~(np.isnan(lat) | np.isnan(lon) | np.isnan(timer))
+    lat, lon, timer = lat[valid], lon[valid], timer[valid]
+    if len(lat) < 2:
+      return
+    self.resample(course, lat, lon, timer)
+    print("\tlogger_core : load_ghost : ", len(lat), "points, ", (datetime.datetime.utcnow()-t).total_seconds(), "sec")
+
+  def read_log_db(self, filename):
+    con = sqlite3.connect(filename)
+    rows = con.execute(
+      "SELECT position_lat, position_long, total_timer_time FROM BIKECOMPUTER_LOG ORDER BY timestamp"
+      ).fetchall()
+    con.close()
+    #NULL is nan
+    data = np.array(rows, dtype=float).reshape(-1, 3)
+    return data[:,0], data[:,1], data[:,2]
+
+  def read_fit(self, filename):
+    fit = LoaderFit()
+    fit.read(filename)
+    record = fit.get_message('record')
+    lat, lon, timestamp = record['position_lat'], record['position_long'], record['timestamp']
+    #timer without pauses
+    dt = np.diff(timestamp, prepend=timestamp[0:1])
+    dt[(dt > self.pause_threshold) | (dt < 0)] = 0
+    return lat, lon, np.cumsum(dt)
+
+  def read_npz(self, filename):
+    data = LoaderNpz().load(filename, ['position_lat', 'position_long', 'total_timer_time'])
+    return (
+      data['position_lat'].astype(np.float64),
+      data['position_long'].astype(np.float64),
+      data['total_timer_time'].astype(np.float64),
+      )
+
+  def resample(self, course, lat, lon, timer):
+    #position of the ghost on the course [m] (never goes back)
+    index = course.project_points(lat, lon)
+    course_distance = course.distance*1000
+    next_index = np.minimum(index+1, len(course_distance)-1)
+    with np.errstate(invalid='ignore'):
+      dist_diff = self.config.get_dist_on_earth_array(
+        course.longitude[index], course.latitude[index], lon, lat
+        )
+    #nan is 0 like get_dist_on_earth (the same points)
+    dist = course_distance[index] + np.nan_to_num(dist_diff)
+    dist = np.maximum.accumulate(np.minimum(dist, course_distance[next_index]))
+    timer = np.maximum.accumulate(timer)
+
+    #time when the ghost reached each course point first
+    k = np.searchsorted(dist, course_distance, side='left')
+    time = np.full(len(course_distance), np.nan)
+    inside = (0 < k) & (k < len(dist))
+    k1 = k[inside]
+    k0 = k1 - 1
+    time[inside] = timer[k0] + (timer[k1]-timer[k0]) * (course_distance[inside]-dist[k0])/(dist[k1]-dist[k0])
+    time[course_distance == dist[0]] = timer[0]
+
+    valid = np.flatnonzero(~np.isnan(time))
+    if len(valid) < 2:
+      return
+    self.course_distance = course.distance
+    self.distance = course_distance
+    self.latitude = course.latitude
+    self.longitude = course.longitude
+    self.time = time
+    self.start = valid[0]
+    self.end = valid[-1]
+
+  def is_loaded(self, course):
+    #resampled onto this course (search_route replaces the arrays of the course)
+    return len(self.time) > 0 and self.course_distance is course.distance
+
+  def get_time_diff(self, course_index, course_distance, timer):
+    #[s] plus: behind the ghost, minus: ahead of the ghost
+    i = course_index
+    if not (self.start <= i < self.end):
+      return np.nan
+    d0, d1 = self.distance[i], self.distance[i+1]
+    r = 0.0
+    if d1 > d0:
+      r = min(max((course_distance - d0)/(d1 - d0), 0.0), 1.0)
+    return timer - (self.time[i] + (self.time[i+1]-self.time[i])*r)
+
+  def get_position(self, timer):
+    #distance [m], latitude and longitude of the ghost at the timer
+    i = self.start + np.searchsorted(self.time[self.start:self.end+1], timer, side='right') - 1
+    if i < self.start:
+      i, r = self.start, 0.0
+    elif i >= self.end:
+      i, r = self.end - 1, 1.0
+    else:
+      t0, t1 = self.time[i], self.time[i+1]
+      r = (timer - t0)/(t1 - t0) if t1 > t0 else 0.0
+    return (
+      self.distance[i] + (self.distance[i+1]-self.distance[i])*r,
+      self.latitude[i] + (self.latitude[i+1]-self.latitude[i])*r,
+      self.longitude[i] + (self.longitude[i+1]-self.longitude[i])*r,
+      )
+
+  def get_time_diff_str(self, time_diff):
+    #"+mm:ss" or "+h:mm:ss"
+    if np.isnan(time_diff):
+      return None
+    sign = "+" if time_diff >= 0 else "-"
+    m, s = divmod(int(abs(time_diff)), 60)
+    h, m = divmod(m, 60)
+    if h > 0:
+      return "{}{}:{:02d}:{:02d}".format(sign, h, m, s)
+    return "{}{:02d}:{:02d}".format(sign, m, s)
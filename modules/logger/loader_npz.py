@@ -0,0 +1,22 @@
+import numpy as np
+
+
+class LoaderNpz():
+  #ride exported by LoggerNpz as {column: array}
+  #  only the requested columns are decompressed
+
+  def load(self, filename, columns=None):
+    with np.load(filename) as npz:
+      if columns == None:
+        columns = npz.files
+      return {c: npz[c] for c in columns if c in npz.files}
+
+
+if __name__=="__main__":
+  import sys
+  import datetime
+  t = datetime.datetime.now()
+  data = LoaderNpz().load(sys.argv[1])
+  print("load:", (datetime.datetime.now()-t).total_seconds(), "sec")
+  for k, v in data.items():
+    print(k, v.dtype, len(v))
@@ -3,11 +3,13 @@ import sqlite3
 import datetime
 import shutil
 import re
-import xml.etree.ElementTree as ET
+import xml.parsers.expat
 from math import factorial
 
 import numpy as np
 
+from .loader_fit import LoaderFit
+
 import importlib
 EXTLIB_POLYLINE_DECODER = None
 try:
@@ -16,6 +18,263 @@ except:
   pass
 
 
+class CourseParser():
+  #base of streaming course parsers
+  #  trackpoints go directly into a growable numpy array, so memory doesn't depend on the file size
+
+  #columns of track
+  track_columns = 4
+  #initial size of track [bytes of file per trackpoint]
+  bytes_per_trackpoint = 200
+
+  def __init__(self):
+    self.info = {}
+    self.track = np.empty((0, self.track_columns))
+    self.track_n = 0
+    self.point_name = []
+    self.point_latitude = []
+    self.point_longitude = []
+    self.point_type = []
+    self.point_notes = []
+
+    #parser state
+    self.local_names = {}
+    self.parents = []
+    self.text = []
+    self.capture = False
+    self.trackpoint = None
+    self.course_point = None
+
+  def init_track(self, filename):
+    size = max(1024, int(os.path.getsize(filename) / self.bytes_per_trackpoint))
+    self.track = np.empty((size, self.track_columns))
+    self.track_n = 0
+
+  def add_trackpoint(self, values):
+    if self.track_n == len(self.track):
+      track = np.empty((2*len(self.track), self.track_columns))
+      track[0:self.track_n] = self.track
+      self.track = track
+    self.track[self.track_n] = values
+    self.track_n += 1
+
+  def get_track(self):
+    track = self.track[0:self.track_n]
+    return [track[:,i].copy() for i in range(self.track_columns)]
+
+  def add_course_point(self, name, latitude, longitude, point_type, notes):
+    self.point_name.append(name)
+    self.point_latitude.append(latitude)
+    self.point_longitude.append(longitude)
+    self.point_type.append(point_type)
+    self.point_notes.append(notes)
+
+  #for xml (tcx, gpx)
+  def parse(self, filename):
+    self.init_track(filename)
+    parser = xml.parsers.expat.ParserCreate(namespace_separator='}')
+    parser.buffer_text = True
+    parser.ordered_attributes = True
+    parser.StartElementHandler = self.start_element
+    parser.EndElementHandler = self.end_element
+    parser.CharacterDataHandler = self.character_data
+    with open(filename, 'rb') as f:
+      try:
+        parser.ParseFile(f)
+      except xml.parsers.expat.ExpatError as e:
+        #use the values until the error
+        print("ERROR parse course:", e)
+
+  def get_local_name(self, name):
+    local_name = name[name.rfind('}')+1:]
+    self.local_names[name] = local_name
+    return local_name
+
+  def start_element(self, name, attrs):
+    pass
+
+  def character_data(self, data):
+    if self.capture:
+      self.text.append(data)
+
+  def end_element(self, name):
+    pass
+
+
+class TcxParser(CourseParser):
+
+  #columns of track
+  track_tags = {'LatitudeDegrees':0, 'LongitudeDegrees':1, 'AltitudeMeters':2, 'DistanceMeters':3}
+  course_point_tags = ['Name', 'LatitudeDegrees', 'LongitudeDegrees', 'PointType', 'Notes']
+
+  def start_element(self, name, attrs):
+    tag = self.local_names.get(name) or self.get_local_name(name)
+    self.parents.append(tag)
+    self.text = []
+    if self.trackpoint is not None:
+      self.capture = tag in self.track_tags
+    elif self.course_point is not None:
+      self.capture = tag in self.course_point_tags
+    elif tag == 'Trackpoint':
+      self.trackpoint = [None]*self.track_columns
+    elif tag == 'CoursePoint':
+      self.course_point = {}
+    elif tag in ['Name', 'DistanceMeters'] and tag not in self.info:
+      parent = self.parents[-2] if len(self.parents) > 1 else None
+      self.capture = (tag == 'Name' and parent == 'Course') or (tag == 'DistanceMeters' and parent == 'Lap')
+
+  def end_element(self, name):
+    tag = self.parents.pop()
+    if self.capture:
+      self.capture = False
+      text = ''.join(self.text).strip()
+      try:
+        if self.trackpoint is not None:
+          self.trackpoint[self.track_tags[tag]] = float(text)
+        elif self.course_point is not None:
+          self.course_point[tag] = text
+        elif tag == 'Name':
+          self.info['Name'] = text
+        elif tag == 'DistanceMeters':
+          self.info['DistanceMeters'] = round(float(text)/1000,1)
+      except ValueError:
+        pass
+    elif tag == 'Trackpoint':
+      #skip trackpoints without any values
+      if None not in self.trackpoint:
+        self.add_trackpoint(self.trackpoint)
+      self.trackpoint = None
+    elif tag == 'CoursePoint':
+      cp = self.course_point
+      self.course_point = None
+      try:
+        latitude = float(cp['LatitudeDegrees'])
+        longitude = float(cp['LongitudeDegrees'])
+      except (KeyError, ValueError):
+        return
+      self.add_course_point(
+        cp.get('Name', ''), latitude, longitude, cp.get('PointType', ''), cp.get('Notes', '')
+        )
+
+
+class GpxParser(CourseParser):
+  #track: trkpt (or rtept if no trkpt), course points: wpt
+  #  no distance in gpx, altitude is nan if ele is missing
+
+  track_columns = 3
+  bytes_per_trackpoint = 100
+  course_point_tags = ['name', 'type', 'sym', 'desc', 'cmt']
+
+  def __init__(self):
+    super().__init__()
+    self.route = []
+
+  def get_track(self):
+    if self.track_n == 0 and len(self.route) > 0:
+      route = np.array(self.route)
+      return [route[:,i].copy() for i in range(self.track_columns)]
+    return super().get_track()
+
+  def start_element(self, name, attrs):
+    tag = self.local_names.get(name) or self.get_local_name(name)
+    self.parents.append(tag)
+    self.text = []
+    if self.trackpoint is not None:
+      self.capture = (tag == 'ele')
+    elif self.course_point is not None:
+      self.capture = tag in self.course_point_tags
+    elif tag in ['trkpt', 'rtept', 'wpt']:
+      attrs = dict(zip(attrs[0::2], attrs[1::2]))
+      try:
+        position = [float(attrs['lat']), float(attrs['lon'])]
+      except (KeyError, ValueError):
+        position = None
+      if tag == 'wpt':
+        self.course_point = {'position':position}
+      else:
+        self.trackpoint = position
+    elif tag == 'name' and 'Name' not in self.info:
+      parent = self.parents[-2] if len(self.parents) > 1 else None
+      self.capture = parent in ['metadata', 'trk', 'rte']
+
+  def end_element(self, name):
+    tag = self.parents.pop()
+    if self.capture:
+      self.capture = False
+      text = ''.join(self.text).strip()
+      if self.trackpoint is not None:
+        try:
+          self.trackpoint.append(float(text))
+        except ValueError:
+          pass
+      elif self.course_point is not None:
+        self.course_point[tag] = text
+      elif tag == 'name':
+        self.info['Name'] = text
+    elif tag in ['trkpt', 'rtept']:
+      if self.trackpoint is not None:
+        if len(self.trackpoint) < self.track_columns:
+          self.trackpoint.append(np.nan)
+        if tag == 'trkpt':
+          self.add_trackpoint(self.trackpoint)
+        else:
+          self.route.append(self.trackpoint)
+      self.trackpoint = None
+    elif tag == 'wpt':
+      cp = self.course_point
+      self.course_point = None
+      if cp['position'] is None:
+        return
+      self.add_course_point(
+        cp.get('name', ''), cp['position'][0], cp['position'][1],
+        cp.get('type', cp.get('sym', '')), cp.get('desc', cp.get('cmt', ''))
+        )
+
+
+class FitCourseParser(CourseParser):
+  #FIT course (record, course_point, course and lap messages) decoded by LoaderFit
+
+  course_point_type = [
+    'Generic', 'Summit', 'Valley', 'Water', 'Food', 'Danger', 'Left', 'Right', 'Straight', 'First Aid',
+    '4th Category', '3rd Category', '2nd Category', '1st Category', 'Hors Category', 'Sprint',
+    'Left Fork', 'Right Fork', 'Middle Fork', 'Slight Left', 'Sharp Left', 'Slight Right', 'Sharp Right',
+    'U-Turn', 'Segment Start', 'Segment End',
+    ]
+
+  def parse(self, filename):
+    fit = LoaderFit()
+    if not fit.read(filename):
+      print("ERROR parse course:", fit.error)
+      return
+
+    record = fit.get_message('record')
+    altitude = record['enhanced_altitude']
+    altitude = np.where(np.isnan(altitude), record['altitude'], altitude)
+    valid = ~np.isnan(record['position_lat']) & ~np.isnan(record['position_long'])
+    self.track = np.column_stack((
+      record['position_lat'], record['position_long'], altitude, record['distance'],
+      ))[valid]
+    self.track_n = len(self.track)
+
+    course_point = fit.get_message('course_point')
+    for lat, lon, p_type, name in zip(
+      course_point['position_lat'], course_point['position_long'], course_point['type'], course_point['name']
+      ):
+      if np.isnan(lat) or np.isnan(lon):
+        continue
+      if np.isnan(p_type) or p_type >= len(self.course_point_type):
+        p_type = 0
+      self.add_course_point(name, lat, lon, self.course_point_type[int(p_type)], '')
+
+    name = [n for n in fit.get_message('course')['name'] if n != '']
+    if len(name) > 0:
+      self.info['Name'] = name[0]
+    distance = fit.get_message('lap')['total_distance']
+    distance = distance[~np.isnan(distance)]
+    if len(distance) > 0:
+      self.info['DistanceMeters'] = round(float(distance[0])/1000,1)
+
+
 class LoaderTcx():
   
   config = None
@@ -33,6 +292,17 @@ class LoaderTcx():
   slope = np.array([])
   slope_smoothing = np.array([])
   colored_altitude = np.array([])
+  #cumulative ascent/descent from start [m] (prefix sums of altitude)
+  cum_ascent = np.array([])
+  cum_descent = np.array([])
+  #climbs (start/end index, distance[m], ascent[m], grade[%], max_grade[%], category)
+  climb_dtype = [
+    ('start', 'i4'), ('end', 'i4'), ('distance', 'f8'), ('ascent', 'f8'),
+    ('grade', 'f8'), ('max_grade', 'f8'), ('category', 'i4'),
+    ]
+  climbs = np.array([], dtype=climb_dtype)
+  #index of current or next climb by course_index (-1: no climb)
+  climb_index = np.array([], dtype=int)
 
   #for course points
   point_name = np.array([])
@@ -41,6 +311,15 @@ class LoaderTcx():
   point_type = np.array([])
   point_notes = np.array([])
   point_distance = np.array([])
+  point_index = np.array([]) #index of course
+  course_parsers = {
+    '.tcx': TcxParser,
+    '.gpx': GpxParser,
+    '.fit': FitCourseParser,
+    }
+  #number of segments from min_index and (course points * segments) in a chunk of projection
+  projection_window = 1000
+  projection_chunk_size = 2**14
 
   def __init__(self, config, sensor):
     print("\tlogger_core : init...")
@@ -63,6 +342,10 @@ class LoaderTcx():
     self.slope_smoothing = np.array([])
     self.colored_altitude = np.array([])
     self.points_diff = np.array([])
+    self.cum_ascent = np.array([])
+    self.cum_descent = np.array([])
+    self.climbs = np.array([], dtype=self.climb_dtype)
+    self.climb_index = np.array([], dtype=int)
 
     #for course points
     self.point_name = np.array([])
@@ -72,16 +355,19 @@ class LoaderTcx():
     self.point_notes = np.array([])
     self.point_distance = np.array([])
     self.point_altitude = np.array([])
+    self.point_index = np.array([])
 
     #for external modules
     self.sensor.sensor_gps.reset_course_index()
 
   def load(self):
     self.reset()
-    self.read_tcx()
+    self.read_course()
     self.downsample()
     self.calc_slope_smoothing()
     self.modify_course_points()
+    self.calc_cumulative_values()
+    self.calc_climbs()
   
   def search_route(self, x1, y1, x2, y2):
     if np.any(np.isnan([x1, y1, x2, y2])):
@@ -91,69 +377,34 @@ class LoaderTcx():
     self.downsample()
     self.calc_slope_smoothing()
     self.modify_course_points()
+    self.calc_cumulative_values()
+    self.calc_climbs()
 
-  def read_tcx(self):
+  def read_course(self):
     if not os.path.exists(self.config.G_COURSE_FILE):
       return
     print("loading", self.config.G_COURSE_FILE)
     
     t = datetime.datetime.utcnow()
 
-    #read with regex
-    pattern = {
-      "name": re.compile(r'<Name>(?P<text>[\s\S]*?)</Name>'),
-      "distance_meters": re.compile(r'<DistanceMeters>(?P<text>[\s\S]*?)</DistanceMeters>'),
-      "track": re.compile(r'<Track>(?P<text>[\s\S]*?)</Track>'),
-      "latitude": re.compile(r'<LatitudeDegrees>(?P<text>[^<]*)</LatitudeDegrees>'),
-      "longitude": re.compile(r'<LongitudeDegrees>(?P<text>[^<]*)</LongitudeDegrees>'),
-      "altitude": re.compile(r'<AltitudeMeters>(?P<text>[^<]*)</AltitudeMeters>'),
-      "distance": re.compile(r'<DistanceMeters>(?P<text>[^<]*)</DistanceMeters>'),
-      "course_point": re.compile(r'<CoursePoint>(?P<text>[\s\S]+)</CoursePoint>'),
-      "course_name": re.compile(r'<Name>(?P<text>[^<]*)</Name>'),
-      "course_point_type": re.compile(r'<PointType>(?P<text>[^<]*)</PointType>'),
-      "course_notes": re.compile(r'<Notes>(?P<text>[^<]*)</Notes>'),
-    }
-
-    with open(self.config.G_COURSE_FILE, 'r', encoding="utf-8_sig") as f:
-      tcx = f.read()
-
-      match_name = pattern["name"].search(tcx)
-      if match_name:
-        self.info['Name'] = match_name.group('text').strip()
-      
-      match_distance_meter = pattern["distance_meters"].search(tcx)
-      if match_distance_meter:
-        self.info['DistanceMeters'] = round(float(match_distance_meter.group('text').strip())/1000,1)
-
-      match_track = pattern["track"].search(tcx)
-      if match_track:
-        track = match_track.group('text')
-        self.latitude = np.array([float(m.group('text').strip()) for m in pattern["latitude"].finditer(track)])
-        self.longitude = np.array([float(m.group('text').strip()) for m in pattern["longitude"].finditer(track)])
-        self.altitude = np.array([float(m.group('text').strip()) for m in pattern["altitude"].finditer(track)])
-        self.distance = np.array([float(m.group('text').strip()) for m in pattern["distance"].finditer(track)])
-      
-      match_course = pattern["course_point"].search(tcx)
-      if match_course:
-        course_point = match_course.group('text')
-        self.point_name = [m.group('text').strip() for m in pattern["course_name"].finditer(course_point)]
-        self.point_latitude = np.array([float(m.group('text').strip()) for m in pattern["latitude"].finditer(course_point)])
-        self.point_longitude = np.array([float(m.group('text').strip()) for m in pattern["longitude"].finditer(course_point)])
-        self.point_type = [m.group('text').strip() for m in pattern["course_point_type"].finditer(course_point)]
-        self.point_notes = [m.group('text').strip() for m in pattern["course_notes"].finditer(course_point)]
-    
-    print("\tlogger_core : load_course : read tcx(regex): ", (datetime.datetime.utcnow()-t).total_seconds(), "sec")
-
-    check_course = False
-    if not (len(self.latitude) == len(self.longitude) == len(self.altitude) == len(self.distance)):
-      print("ERROR parse course")
-      check_course = True
-    if not (len(self.point_name) == len(self.point_latitude) == len(self.point_longitude) == len(self.point_type)):
-      print("ERROR parse course point")
-      check_course = True
-    if check_course:
-      self.read_from_xml()
+    #read with streaming parser chosen by extension (one pass, no copy of the whole text)
+    ext = os.path.splitext(self.config.G_COURSE_FILE)[1].lower()
+    parser = self.course_parsers.get(ext, TcxParser)()
+    parser.parse(self.config.G_COURSE_FILE)
+    self.info.update(parser.info)
+    track = parser.get_track()
+    self.latitude, self.longitude, self.altitude = track[0:3]
+    if len(track) > 3:
+      self.distance = track[3]
+    self.fill_track()
+    self.point_name = parser.point_name
+    self.point_latitude = np.array(parser.point_latitude)
+    self.point_longitude = np.array(parser.point_longitude)
+    self.point_type = parser.point_type
+    self.point_notes = parser.point_notes
     
+    print("\tlogger_core : load_course : read course({}): ".format(ext), (datetime.datetime.utcnow()-t).total_seconds(), "sec")
+
     #delete 'Straight' of course points
     if len(self.point_type) > 0:
       ptype = np.array(self.point_type)
@@ -168,6 +419,34 @@ class LoaderTcx():
       if len(self.point_notes) > 0:
         self.point_notes = list(np.array(self.point_notes)[not_straight_cond])
   
+  #fill missing altitude and distance of gpx and fit
+  def fill_track(self):
+    if len(self.latitude) == 0:
+      return
+    index = np.arange(len(self.latitude))
+    if len(self.altitude) > 0:
+      valid = ~np.isnan(self.altitude)
+      if not np.any(valid):
+        self.altitude = np.array([])
+      elif not np.all(valid):
+        self.altitude = np.interp(index, index[valid], self.altitude[valid])
+    valid = ~np.isnan(self.distance) if len(self.distance) > 0 else np.array([], dtype=bool)
+    if not np.any(valid):
+      #[m] like tcx
+      #  the same points can be nan (cos_d rounds above 1), 0 like get_dist_on_earth
+      with np.errstate(invalid='ignore'):
+        dist_diff = self.config.get_dist_on_earth_array(
+          self.longitude[0:-1],
+          self.latitude[0:-1],
+          self.longitude[1:], 
+          self.latitude[1:],
+          )
+      self.distance = np.insert(np.cumsum(np.nan_to_num(dist_diff)), 0, 0)
+    elif not np.all(valid):
+      self.distance = np.interp(index, index[valid], self.distance[valid])
+    if 'DistanceMeters' not in self.info:
+      self.info['DistanceMeters'] = round(float(self.distance[-1])/1000,1)
+
   def get_google_route(self, x1, y1, x2, y2):
     json_routes = self.config.get_google_routes(x1, y1, x2, y2)
     if EXTLIB_POLYLINE_DECODER == None or json_routes == None or json_routes["status"] != "OK":
@@ -334,24 +613,30 @@ class LoaderTcx():
     alt_d1 = np.insert(alt_d1,0,0)
     alt_d1_sign = np.where((alt_d1 > 0), alt_d1, 0)
     alt_d1_plus_to_minus_index = np.where((alt_d1_sign[0:-1] > 0) & (alt_d1_sign[1:] == 0))[0] + 1
-    alt_d1_cumsum = np.cumsum(alt_d1_sign)
-    for i in alt_d1_plus_to_minus_index:
-      alt_d1_cumsum[i+1:] = np.cumsum(alt_d1_sign[i+1:])
+    #cumsum which restarts after each plus_to_minus index
+    #  subtract the cumsum at the last restart (found by np.maximum.accumulate)
+    alt_d1_cumsum_all = np.cumsum(alt_d1_sign)
+    restart = np.zeros(course_n, dtype=int)
+    restart_index = alt_d1_plus_to_minus_index[alt_d1_plus_to_minus_index+1 < course_n]
+    restart[restart_index+1] = restart_index+1
+    restart = np.maximum.accumulate(restart)
+    alt_d1_cumsum = alt_d1_cumsum_all - np.where(restart > 0, alt_d1_cumsum_all[restart-1], 0)
     peak = np.where(alt_d1_cumsum > 100, 1, 0)
 
     peak_end_index = np.where((peak[0:-1] > 0) & (peak[1:] == 0))[0]+1
     cumsum_zero_to_plus_index = np.where((alt_d1_cumsum[0:-1] == 0) & (alt_d1_cumsum[1:] > 0))[0]+1
-    peak_start_index = np.zeros(len(peak_end_index)).astype("uint16")
+    #the last zero_to_plus index before each peak end
+    k = np.searchsorted(cumsum_zero_to_plus_index, peak_end_index, side='right') - 1
+    peak_start_index = cumsum_zero_to_plus_index[np.maximum(k, 0)]
 
-    j = 0
     self.slope_smoothing = np.zeros(course_n)
-    for i in peak_end_index:
-      k = np.argmin(np.where(i-cumsum_zero_to_plus_index < 0, np.inf, i-cumsum_zero_to_plus_index))
-      peak_start_index[j] = cumsum_zero_to_plus_index[k]
-
-      self.slope_smoothing[peak_start_index[j]:i] = \
-        100*(self.altitude[i] - self.altitude[peak_start_index[j]])/ ((self.distance[i] - self.distance[peak_start_index[j]])*1000)
-      j += 1
+    if len(peak_end_index) > 0:
+      peak_slope = 100*(self.altitude[peak_end_index] - self.altitude[peak_start_index])\
+        / ((self.distance[peak_end_index] - self.distance[peak_start_index])*1000)
+      #later peak overwrites overlapped range ([peak_start_index, peak_end_index) of each peak)
+      j = np.searchsorted(peak_start_index, np.arange(course_n), side='right') - 1
+      cond = (j >= 0) & (np.arange(course_n) < peak_end_index[np.maximum(j, 0)])
+      self.slope_smoothing[cond] = peak_slope[j[cond]]
     
     print("\tlogger_core : load_course : slope_smoothing: ", (datetime.datetime.utcnow()-t).total_seconds(), "sec")
     
@@ -362,17 +647,10 @@ class LoaderTcx():
         
     t = datetime.datetime.utcnow()
 
-    self.colored_altitude = np.full((len(self.altitude), 3),self.config.G_SLOPE_COLOR[0])
-    for i in range(len(self.config.G_SLOPE_CUTOFF)):
-      cond = None
-      if i == 0:
-        x2 = self.config.G_SLOPE_CUTOFF[i]
-        cond = np.where(self.slope_smoothing <= x2, True, False)
-      else:
-        x1 = self.config.G_SLOPE_CUTOFF[i-1]
-        x2 = self.config.G_SLOPE_CUTOFF[i]
-        cond = np.where((x1 < self.slope_smoothing) & (self.slope_smoothing <= x2), True, False)
-      self.colored_altitude[cond] = self.config.G_SLOPE_COLOR[i]
+    #band i: G_SLOPE_CUTOFF[i-1] < slope <= G_SLOPE_CUTOFF[i] (nan is base color)
+    band = np.digitize(self.slope_smoothing, self.config.G_SLOPE_CUTOFF, right=True)
+    band[(band >= len(self.config.G_SLOPE_CUTOFF)) | np.isnan(self.slope_smoothing)] = 0
+    self.colored_altitude = np.array(self.config.G_SLOPE_COLOR)[band]
       
     print("\tlogger_core : load_course : fill slope: ", (datetime.datetime.utcnow()-t).total_seconds(), "sec")
     #t = datetime.datetime.utcnow()
@@ -389,44 +667,11 @@ class LoaderTcx():
     len_pnt_type = len(self.point_type)
 
     #calculate course point distance
+    self.point_index = self.project_points(self.point_latitude, self.point_longitude)
     if len_pnt_dist == 0 and len(self.distance) > 0:
-      self.point_distance = np.empty(len(self.point_latitude))
+      self.point_distance = self.distance[self.point_index]
     if len_pnt_alt == 0 and len(self.altitude) > 0:
-      self.point_altitude = np.zeros(len(self.point_latitude))
-    
-    min_index = 0
-    for i in range(len(self.point_latitude)):
-      b_a_x = self.points_diff[0][min_index:]
-      b_a_y = self.points_diff[1][min_index:]
-      lon_diff = self.point_longitude[i] - self.longitude[min_index:]
-      lat_diff = self.point_latitude[i] - self.latitude[min_index:]
-      p_a_x = lon_diff[:-1]
-      p_a_y = lat_diff[:-1]
-      p_b_x = lon_diff[1:]
-      p_b_y = lat_diff[1:]
-      inner_p = (b_a_x*p_a_x + b_a_y*p_a_y)/self.points_diff_sum_of_squares[min_index:]
-      inner_p_check = np.where((0.0 <= inner_p) & (inner_p <= 1.0), True, False)
-
-      for j in np.where(inner_p_check == True)[0]:
-        h_lon = self.longitude[min_index+j] + \
-          (self.longitude[min_index+j+1]-self.longitude[min_index+j]) * inner_p[j]
-        h_lat = self.latitude[min_index+j] + \
-          (self.latitude[min_index+j+1]-self.latitude[min_index+j]) * inner_p[j]
-        dist_diff_h = self.config.get_dist_on_earth(
-          h_lon, 
-          h_lat,
-          self.point_longitude[i], 
-          self.point_latitude[i]
-          )
-
-        if dist_diff_h < self.config.G_GPS_ON_ROUTE_CUTOFF:
-          min_index = min_index+j
-          break
-      
-      if len_pnt_dist == 0 and len(self.distance) > 0:
-        self.point_distance[i] = self.distance[min_index]
-      if len_pnt_alt == 0 and len(self.altitude) > 0:
-        self.point_altitude[i] = self.altitude[min_index]
+      self.point_altitude = self.altitude[self.point_index]
 
     #print(len(self.point_distance), len(self.point_altitude))
 
@@ -446,6 +691,7 @@ class LoaderTcx():
         self.point_distance = np.insert(self.point_distance, 0, 0.0)
       if len_pnt_alt > 0 and len_alt > 0:
         self.point_altitude = np.insert(self.point_altitude, 0, self.altitude[0])
+      self.point_index = np.insert(self.point_index, 0, 0)
     #add end course point
     #print(self.point_latitude, self.latitude, self.point_longitude, self.longitude)
     end_distance = None
@@ -465,116 +711,233 @@ class LoaderTcx():
         self.point_distance = np.append(self.point_distance, self.distance[-1])
       if len_pnt_alt > 0 and len_alt > 0:
         self.point_altitude = np.append(self.point_altitude, self.altitude[-1])
+      self.point_index = np.append(self.point_index, len(self.latitude)-1)
     
     self.point_name = np.array(self.point_name)
     self.point_type = np.array(self.point_type)
     self.point_name = np.array(self.point_name)
 
     print("\tlogger_core : load_course : modify course points: ", (datetime.datetime.utcnow()-t).total_seconds(), "sec")
-   
-  def read_from_xml(self):
-    if not os.path.exists(self.config.G_COURSE_FILE):
-      return
-    
-    t = datetime.datetime.utcnow()
-    
-    self.reset()
-    tree = ET.parse(self.config.G_COURSE_FILE)
-    tcx_root = tree.getroot()
-    
-    print("\tlogger_core : load_course: (read_from_xml) ET parse", (datetime.datetime.utcnow()-t).total_seconds(), "sec")
-    t = datetime.datetime.utcnow()
-    
-    # namespace 
-    NS = {'TCDv2': 'http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2'}
-    courses = tcx_root.find('TCDv2:Courses', NS)
-    course = courses.find('TCDv2:Course', NS)
-    #summary
-    self.info['Name'] = course.find('TCDv2:Name', NS).text
-    Lap = course.find('TCDv2:Lap', NS)
-    self.info['DistanceMeters'] = float(Lap.find('TCDv2:DistanceMeters', NS).text)
-    #track
-    track = course.find('TCDv2:Track', NS)
-    track_points = track.findall('TCDv2:Trackpoint', NS)
-    #coursepoint
-    course_points = course.findall('TCDv2:CoursePoint', NS)
-    
-    print("\tlogger_core : load_course : (read_from_xml) initialize", (datetime.datetime.utcnow()-t).total_seconds(), "sec")
-    t = datetime.datetime.utcnow()
 
-    TCDv2_prefix = "{"+NS['TCDv2']+"}"
+  #index of course on which each point is (the same index as the previous point if off route)
+  def project_points(self, p_lat, p_lon):
+    #project points onto the course in chunks of points and windows of segments
+    #  the first segment on route from min_index (monotonic) is the position of the point
+    point_n = len(p_lat)
+    segment_n = len(self.latitude) - 1
+    index = np.zeros(point_n, dtype=int)
+    min_index = 0
+    i = 0
+    while i < point_n:
+      base_index = min_index
+      end_index = min(base_index + self.projection_window, segment_n)
+      chunk = max(1, self.projection_chunk_size // max(1, end_index - base_index))
+      j = min(i+chunk, point_n)
+      on_route = self.get_on_route_segments(p_lon[i:j], p_lat[i:j], base_index, end_index)
+      for row in on_route:
+        out_of_window = False
+        hit = np.flatnonzero(row[min_index-base_index:])
+        if len(hit) > 0:
+          min_index = min_index + hit[0]
+        else:
+          #search the rest of the course, then restart chunk from new min_index
+          k = self.search_on_route_segment(p_lon[i:i+1], p_lat[i:i+1], end_index, segment_n)
+          if k >= 0:
+            min_index = k
+            out_of_window = True
+        index[i] = min_index
+        i += 1
+        if out_of_window:
+          break
+    return index
+
+  #first segment on route of a point in [seg_start:seg_end] with growing windows (-1: not found)
+  def search_on_route_segment(self, p_lon, p_lat, seg_start, seg_end):
+    window = self.projection_window
+    while seg_start < seg_end:
+      end = min(seg_start + window, seg_end)
+      hit = np.flatnonzero(self.get_on_route_segments(p_lon, p_lat, seg_start, end)[0])
+      if len(hit) > 0:
+        return seg_start + hit[0]
+      seg_start = end
+      window *= 2
+    return -1
+
+  #on route flags of points and segments [seg_start:seg_end]
+  def get_on_route_segments(self, p_lon, p_lat, seg_start, seg_end):
+    b_a_x = self.points_diff[0][seg_start:seg_end]
+    b_a_y = self.points_diff[1][seg_start:seg_end]
+    lon = self.longitude[seg_start:seg_end+1]
+    lat = self.latitude[seg_start:seg_end+1]
+    p_lon = np.asarray(p_lon)[:, np.newaxis]
+    p_lat = np.asarray(p_lat)[:, np.newaxis]
+    p_a_x = p_lon - lon[:-1]
+    p_a_y = p_lat - lat[:-1]
+    inner_p = (b_a_x*p_a_x + b_a_y*p_a_y)/self.points_diff_sum_of_squares[seg_start:seg_end]
+    #distance from the foot of perpendicular only in segments
+    on_route = (0.0 <= inner_p) & (inner_p <= 1.0)
+    r, c = np.nonzero(on_route)
+    h_lon = lon[c] + (lon[c+1]-lon[c]) * inner_p[r, c]
+    h_lat = lat[c] + (lat[c+1]-lat[c]) * inner_p[r, c]
+    with np.errstate(invalid='ignore'):
+      dist_diff_h = self.config.get_dist_on_earth_array(h_lon, h_lat, p_lon[r, 0], p_lat[r, 0])
+    #nan is 0 like get_dist_on_earth (the same points)
+    on_route[r, c] = ~(dist_diff_h >= self.config.G_GPS_ON_ROUTE_CUTOFF)
+    return on_route
+
+  def calc_cumulative_values(self):
+    #prefix sums for O(1) queries of remaining ascent/descent
+    if len(self.altitude) == 0 or len(self.altitude) != len(self.distance):
+      return
+    alt_diff = np.diff(self.altitude)
+    self.cum_ascent = np.insert(np.cumsum(np.where(alt_diff > 0, alt_diff, 0)), 0, 0)
+    self.cum_descent = np.insert(np.cumsum(np.where(alt_diff < 0, -alt_diff, 0)), 0, 0)
+
+  def calc_climbs(self):
+    #make the table of climbs once at loading
+    #  a climb runs from a valley to a summit, ignoring descents less than G_CLIMB_MERGE_DESCENT
+    if len(self.cum_ascent) == 0:
+      return
 
-    #course data
-    track_points_n = len(track_points)
-    self.distance = np.empty(track_points_n)
-    self.altitude = np.empty(track_points_n)
-    self.latitude = np.empty(track_points_n)
-    self.longitude = np.empty(track_points_n)
-    tmp_i = 0
-    
-    for tp in track_points:
-      latitude = longitude = distance = altitude = None
-      values = {}
-      for child in tp.iter():
-        values[child.tag] = child.text
-      try:
-        latitude = float(values[TCDv2_prefix+"LatitudeDegrees"])
-        longitude = float(values[TCDv2_prefix+"LongitudeDegrees"])
-        distance = float(values[TCDv2_prefix+"DistanceMeters"])
-        altitude = float(values[TCDv2_prefix+"AltitudeMeters"])
-      except:
+    t = datetime.datetime.utcnow()
+    alt = self.altitude
+    course_n = len(alt)
+    candidates = []
+    start = top = 0
+    for i in range(1, course_n):
+      if alt[i] >= alt[top]:
+        top = i
+      elif alt[top] - alt[i] >= self.config.G_CLIMB_MERGE_DESCENT:
+        if top > start:
+          candidates.append((start, top))
+        start = top = i
+      elif alt[i] < alt[start]:
+        start = top = i
+    if top > start:
+      candidates.append((start, top))
+
+    climbs = []
+    for s, e in candidates:
+      dist = (self.distance[e] - self.distance[s])*1000
+      if dist < self.config.G_CLIMB_MIN_DISTANCE:
         continue
-      
-      self.latitude[tmp_i] = latitude
-      self.longitude[tmp_i] = longitude
-      self.distance[tmp_i] = distance
-      self.altitude[tmp_i] = altitude
-      tmp_i += 1
-    
-    self.latitude = self.latitude[0:tmp_i]
-    self.longitude = self.longitude[0:tmp_i]
-    self.distance = self.distance[0:tmp_i]
-    self.altitude = self.altitude[0:tmp_i]
+      grade = 100*(alt[e] - alt[s])/dist
+      if grade < self.config.G_CLIMB_MIN_GRADE:
+        continue
+      #max grade over G_CLIMB_GRADE_WINDOW
+      d = self.distance[s:e+1]*1000
+      a = alt[s:e+1]
+      k = np.searchsorted(d, d + self.config.G_CLIMB_GRADE_WINDOW)
+      valid = k < len(d)
+      max_grade = grade
+      if np.any(valid):
+        max_grade = max(grade, np.max(100*(a[k[valid]] - a[valid])/(d[k[valid]] - d[valid])))
+      category = int(np.searchsorted(self.config.G_CLIMB_CATEGORY_SCORE, dist*grade, side='right'))
+      climbs.append((s, e, dist, self.cum_ascent[e] - self.cum_ascent[s], grade, max_grade, category))
+    self.climbs = np.array(climbs, dtype=self.climb_dtype)
+
+    #first climb which ends after each index
+    self.climb_index = np.searchsorted(self.climbs['end'], np.arange(course_n), side='right')
+    self.climb_index[self.climb_index >= len(self.climbs)] = -1
+
+    print("\tlogger_core : load_course : climbs: ", len(self.climbs), ", ", (datetime.datetime.utcnow()-t).total_seconds(), "sec")
+
+  #current or next climb (-1: no climb)
+  def get_climb(self, course_index):
+    if len(self.climb_index) == 0:
+      return -1
+    return self.climb_index[min(course_index, len(self.climb_index)-1)]
+
+  def get_climb_value(self, course_index, course_distance, key):
+    c = self.get_climb(course_index)
+    if c < 0:
+      return np.nan
+    climb = self.climbs[c]
+    if key in ['distance', 'ascent', 'grade', 'max_grade']:
+      return climb[key]
+    elif key == 'category':
+      return self.config.G_CLIMB_CATEGORY_NAME[climb['category']]
     
-    #course points
-    point_name = []
-    point_latitude = []
-    point_longitude = []
-    point_type = []
-    point_notes = []
-
-    for cp in course_points:
-      name = latitude = longitude = p_type = notes = None
-      #search
-      for child in cp:
-        if child.tag == TCDv2_prefix+"Name":
-          name = child.text
-        elif child.tag == TCDv2_prefix+"Position":
-          for position_child in child:
-            if position_child.tag == TCDv2_prefix+"LatitudeDegrees":
-              latitude = float(position_child.text)
-            elif position_child.tag == TCDv2_prefix+"LongitudeDegrees":
-              longitude = float(position_child.text)
-        elif child.tag == TCDv2_prefix+"PointType":
-          p_type = child.text
-        elif child.tag == TCDv2_prefix+"Notes":
-          notes = child.text
-
-      if name != None and latitude != None and longitude != None and p_type != None and notes != None:
-        point_name.append(name)
-        point_latitude.append(latitude)
-        point_longitude.append(longitude)
-        point_type.append(p_type)
-        point_notes.append(notes)
-
-    self.point_name = point_name
-    self.point_latitude = np.array(point_latitude)
-    self.point_longitude = np.array(point_longitude)
-    self.point_type = point_type
-    self.point_notes = point_notes
-
-    print("\tlogger_core : load_course : (read_from_xml) read values: ", (datetime.datetime.utcnow()-t).total_seconds(), "sec")
-
+    s = climb['start']
+    e = climb['end']
+    #before the climb
+    if course_index < s:
+      if key == 'to_start':
+        return max(self.distance[s]*1000 - course_distance, 0)
+      elif key == 'remaining_distance':
+        return climb['distance']
+      elif key == 'remaining_ascent':
+        return climb['ascent']
+      elif key == 'remaining_grade':
+        return climb['grade']
+    #in the climb
+    remaining_distance = max(self.distance[e]*1000 - course_distance, 0)
+    if key == 'to_start':
+      return 0
+    elif key == 'remaining_distance':
+      return remaining_distance
+    elif key == 'remaining_ascent':
+      return max(self.cum_ascent[e] - self.get_cumulative_value(self.cum_ascent, course_index, course_distance), 0)
+    elif key == 'remaining_grade':
+      if remaining_distance == 0:
+        return np.nan
+      i = min(course_index, len(self.altitude)-1)
+      return 100*(self.altitude[e] - self.altitude[i])/remaining_distance
+    return np.nan
+
+  #cumulative ascent/descent at course_distance [m] in the segment of course_index
+  def get_cumulative_value(self, cum, course_index, course_distance):
+    i = min(course_index, len(cum)-1)
+    if i == len(cum)-1:
+      return cum[i]
+    d = self.distance[i+1] - self.distance[i]
+    r = 0
+    if d > 0:
+      r = min(max((course_distance/1000 - self.distance[i]) / d, 0), 1)
+    return cum[i] + (cum[i+1] - cum[i]) * r
+
+  #[m]
+  def get_remaining_distance(self, course_distance):
+    if len(self.distance) == 0:
+      return np.nan
+    return max(self.distance[-1]*1000 - course_distance, 0)
+
+  #[m]
+  def get_remaining_ascent(self, course_index, course_distance, descent=False):
+    cum = self.cum_descent if descent else self.cum_ascent
+    if len(cum) == 0:
+      return np.nan
+    return cum[-1] - self.get_cumulative_value(cum, course_index, course_distance)
+
+  #next course point (course_point_index of sensor_gps)
+  #[m]
+  def get_point_distance(self, course_point_index, course_distance):
+    if len(self.point_distance) == 0 or course_point_index >= len(self.point_distance):
+      return np.nan
+    return max(self.point_distance[course_point_index]*1000 - course_distance, 0)
+
+  #[m]
+  def get_point_ascent(self, course_point_index, course_index, course_distance):
+    if len(self.cum_ascent) == 0 or course_point_index >= len(self.point_index):
+      return np.nan
+    p_i = self.point_index[course_point_index]
+    return max(
+      self.cum_ascent[p_i] - self.get_cumulative_value(self.cum_ascent, course_index, course_distance), 0
+      )
+
+  #[s]
+  def get_time(self, distance, speed):
+    if np.isnan(distance) or np.isnan(speed) or speed <= 0:
+      return np.nan
+    return distance / speed
+
+  #estimated time of arrival ("HH:MM")
+  def get_eta(self, course_distance, speed):
+    sec = self.get_time(self.get_remaining_distance(course_distance), speed)
+    if np.isnan(sec):
+      return None
+    return (datetime.datetime.now() + datetime.timedelta(seconds=sec)).strftime('%H:%M')
+   
   def savitzky_golay(self, y, window_size, order, deriv=0, rate=1):
     try:
         window_size = np.abs(np.int(window_size))
@@ -1,12 +1,55 @@
+import time
+import types
 import datetime
 
 
 class Logger():
   
   config = None
+
+  #version of BIKECOMPUTER_LOG (PRAGMA user_version)
+  #  0: timestamp is ISO text of utc (datetime)
+  #  1: timestamp is utc epoch [s] (integer)
+  db_version = 1
+  #timestamp as utc epoch [s] in SQL for rides of both versions (log.db-*)
+  timestamp_epoch_sql = \
+    "(CASE typeof(timestamp) WHEN 'text' THEN CAST(strftime('%s',timestamp) AS INTEGER) ELSE timestamp END)"
+  #view of BIKECOMPUTER_LOG with the timestamp text of version 0 (for csv and external tools)
+  compat_view = "BIKECOMPUTER_LOG_COMPAT"
+
+  #write_log can run in a worker process (False: in a thread of this process)
+  in_process = True
+  #config values which write_log sets (returned from a worker process)
+  result_keys = ["G_LOG_START_DATE", "G_STRAVA_UPLOAD_FILE"]
   
   def __init__(self, config):
     self.config = config
- 
- 
 
+  def get_config_values(self):
+    #plain values of the config to be sent to a worker process
+    values = {}
+    for k in dir(self.config):
+      if not k.startswith("G_"):
+        continue
+      v = getattr(self.config, k)
+      if isinstance(v, (str, int, float, bool)) or v == None:
+        values[k] = v
+    return values
+
+  def set_config_values(self, values):
+    for k, v in values.items():
+      setattr(self.config, k, v)
+
+
+def write_log_process(logger_class, config_values):
+  #write_log in a worker process with a copy of the config values
+  #  returns (result, elapsed time [s], config values which write_log changed)
+  t = time.time()
+  logger = logger_class(types.SimpleNamespace(**config_values))
+  result = logger.write_log()
+  values = {}
+  for k in logger.result_keys:
+    v = getattr(logger.config, k, None)
+    if v != config_values.get(k):
+      values[k] = v
+  return result, time.time()-t, values
@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import glob
+import datetime
+
+from .logger import Logger
+
+
+class LoggerCatalog(Logger):
+  #catalog of rides: one summary row per ride db (log.db-<start date>)
+  #  rides are listed and totaled without opening each ride db
+
+  columns = [
+    "start_date", #local time of start, same as the suffix of log.db-<start date>
+    "start_time", #utc
+    "end_time", #utc
+    "elapsed_time", #[s]
+    "total_timer_time", #[s]
+    "distance", #[m]
+    "total_ascent", #[m]
+    "total_descent", #[m]
+    "avg_speed", #[m/s]
+    "max_speed", #[m/s]
+    "avg_heart_rate",
+    "max_heart_rate",
+    "avg_power",
+    "max_power",
+    "min_lat",
+    "max_lat",
+    "min_long",
+    "max_long",
+    "filename",
+  ]
+  #year to date totals
+  values = {}
+  #average of a column weighted by seconds (NULL is skipped)
+  weighted_avg_sql = "(TOTAL(%s*seconds)/TOTAL(CASE WHEN %s IS NOT NULL THEN seconds END))"
+
+  def __init__(self, config):
+    super().__init__(config)
+    self.values = {
+      'year': None,
+      'rides': 0,
+      'total_timer_time': 0,
+      'distance': 0,
+      'total_ascent': 0,
+    }
+    self.init_db()
+    self.update_totals()
+
+  def connect(self):
+    return sqlite3.connect(self.config.G_LOG_CATALOG_DB)
+
+  def init_db(self):
+    con = self.connect()
+    con.execute("""CREATE TABLE IF NOT EXISTS RIDE_CATALOG(
+      start_date TEXT PRIMARY KEY,
+      start_time DATETIME,
+      end_time DATETIME,
+      elapsed_time INTEGER,
+      total_timer_time INTEGER,
+      distance FLOAT,
+      total_ascent FLOAT,
+      total_descent FLOAT,
+      avg_speed FLOAT,
+      max_speed FLOAT,
+      avg_heart_rate FLOAT,
+      max_heart_rate INTEGER,
+      avg_power FLOAT,
+      max_power INTEGER,
+      min_lat FLOAT,
+      max_lat FLOAT,
+      min_long FLOAT,
+      max_long FLOAT,
+      filename TEXT
+    )""")
+    con.commit()
+    con.close()
+
+  def get_start_date(self, filename):
+    #log.db-20200101123456 -> 20200101123456
+    return os.path.basename(filename).split("-", 1)[-1]
+
+  def get_summary(self, filename):
+    #one aggregate query over the whole ride (NaN is stored as NULL and skipped)
+    #  timestamp is utc epoch [s], or text in rides of db version 0
+    #  averages are weighted by the seconds until the next row (rows skipped by smart recording)
+    con = sqlite3.connect(filename)
+    cur = con.cursor()
+    try:
+      cur.execute("""\
+        SELECT \
+          MIN(%s), MAX(%s), \
+          MAX(total_timer_time), MAX(distance), MAX(total_ascent), MAX(total_descent), \
+          MAX(speed), %s, MAX(heart_rate), %s, MAX(power), \
+          MIN(position_lat), MAX(position_lat), MIN(position_long), MAX(position_long) \
+        FROM (SELECT *, \
+          MAX(COALESCE(LEAD(total_timer_time) OVER (ORDER BY rowid) - total_timer_time, 1), 1) AS seconds \
+          FROM BIKECOMPUTER_LOG)""" % (
+        self.timestamp_epoch_sql, self.timestamp_epoch_sql,
+        self.weighted_avg_sql % ("heart_rate", "heart_rate"), self.weighted_avg_sql % ("power", "power"),
+        ))
+      row = cur.fetchone()
+    except sqlite3.Error as e:
+      print("ERROR catalog:", filename, e)
+      row = None
+    finally:
+      cur.close()
+      con.close()
+    if row == None or row[0] == None:
+      return None
+
+    (start_epoch, end_epoch, total_timer_time, distance, total_ascent, total_descent,
+      max_speed, avg_heart_rate, max_heart_rate, avg_power, max_power,
+      min_lat, max_lat, min_long, max_long) = row
+    elapsed_time = end_epoch - start_epoch
+    start_time = str(datetime.datetime.utcfromtimestamp(start_epoch))
+    end_time = str(datetime.datetime.utcfromtimestamp(end_epoch))
+    avg_speed = None
+    if distance != None and total_timer_time:
+      avg_speed = distance / total_timer_time
+    return (
+      self.get_start_date(filename), start_time, end_time, elapsed_time, total_timer_time,
+      distance, total_ascent, total_descent, avg_speed, max_speed,
+      avg_heart_rate, max_heart_rate, avg_power, max_power,
+      min_lat, max_lat, min_long, max_long, os.path.basename(filename),
+      )
+
+  def add_ride(self, filename, update_totals=True):
+    summary = self.get_summary(filename)
+    if summary == None:
+      return False
+    con = self.connect()
+    con.execute(
+      "INSERT OR REPLACE INTO RIDE_CATALOG VALUES(%s)" % ",".join(["?"]*len(self.columns)),
+      summary
+      )
+    con.commit()
+    con.close()
+    if update_totals:
+      self.update_totals()
+    return True
+
+  def backfill(self, force=False):
+    #add log.db-<start date> files which are not in the catalog
+    con = self.connect()
+    cataloged = set(r[0] for r in con.execute("SELECT start_date FROM RIDE_CATALOG"))
+    con.close()
+    added = 0
+    for f in sorted(glob.glob(self.config.G_LOG_DB+"-*")):
+      if not force and self.get_start_date(f) in cataloged:
+        continue
+      if self.add_ride(f, update_totals=False):
+        added += 1
+    self.update_totals()
+    return added
+
+  def list_rides(self, limit=None, offset=0):
+    #newest first
+    sql = "SELECT %s FROM RIDE_CATALOG ORDER BY start_date DESC" % ",".join(self.columns)
+    if limit != None:
+      sql += " LIMIT %d OFFSET %d" % (limit, offset)
+    con = self.connect()
+    rows = [dict(zip(self.columns, r)) for r in con.execute(sql)]
+    con.close()
+    return rows
+
+  def get_totals(self, year=None):
+    if year == None:
+      year = datetime.datetime.now().year
+    con = self.connect()
+    cur = con.execute("""\
+      SELECT COUNT(*), TOTAL(total_timer_time), TOTAL(distance), TOTAL(total_ascent) \
+      FROM RIDE_CATALOG WHERE start_date LIKE ?""", (str(year)+"%",))
+    row = cur.fetchone()
+    con.close()
+    return {
+      'year': year,
+      'rides': row[0],
+      'total_timer_time': row[1],
+      'distance': row[2],
+      'total_ascent': row[3],
+    }
+
+  def update_totals(self):
+    self.values.update(self.get_totals())
+
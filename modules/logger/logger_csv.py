@@ -1,7 +1,7 @@
 import sqlite3
 import time
 import datetime
-import shutil
+import csv
 
 from .logger import Logger
 
@@ -17,25 +17,31 @@ class config_local():
 
 class LoggerCsv(Logger):
 
+  #rows per fetch and write
+  fetch_size = 4096
+  #buffer of the csv file [byte]
+  buffer_size = 1024*1024
+  #ratio of written rows (0.0-1.0), printed every progress_interval
+  #  write_log runs in a worker process of LoggerCore.write_logs on multi-core,
+  #  then only the printed progress is available (progress of this object is not updated)
+  progress = 0.0
+  progress_interval = 0.25
+
   def write_log(self):
     
-    #get start date
-    start_date = None
-    start_date_str = "errordate"
+    #get start date (utc epoch [s])
     ## SQLite
-    #con = sqlite3.connect(self.config.G_LOG_DB)
-    con = sqlite3.connect(self.config.G_LOG_DB, detect_types=sqlite3.PARSE_DECLTYPES|sqlite3.PARSE_COLNAMES)
-    sqlite3.dbapi2.converters['DATETIME'] = sqlite3.dbapi2.converters['TIMESTAMP']
+    con = sqlite3.connect(self.config.G_LOG_DB)
     cur = con.cursor()
-    cur.execute("SELECT timestamp, MIN(timestamp) FROM BIKECOMPUTER_LOG")
-    first_row = cur.fetchone()
-    if first_row != None:
-      start_date = first_row[0]
-    else:
+    cur.execute("SELECT MIN(timestamp) FROM BIKECOMPUTER_LOG")
+    start_date = cur.fetchone()[0]
+    if start_date == None:
+      cur.close()
+      con.close()
       return False
     
     offset = time.localtime().tm_gmtoff
-    startdate_local = start_date + datetime.timedelta(seconds=offset)
+    startdate_local = datetime.datetime.utcfromtimestamp(start_date + offset)
     self.config.G_LOG_START_DATE = startdate_local.strftime("%Y%m%d%H%M%S")
     filename = self.config.G_LOG_DIR + self.config.G_LOG_START_DATE + ".csv"
 
@@ -45,25 +51,31 @@ position_lat,position_long,altitude,gps_altitude,gps_distance,gps_mode,gps_used_
 total_ascent,total_descent,pressure,temperature,heading,gps_track,motion,acc_x,acc_y,acc_z"
 #voltage_battery,current_battery,voltage_out,current_out,battery_percentage\
 #"
-    #if sqlite3 command exists, use this command (much faster)
-    if(shutil.which("sh") != None and shutil.which("sqlite3")):
-      cur.close()
-      con.close()
-      sql_cmd = "sqlite3 -header -csv " + self.config.G_LOG_DB + " \'SELECT " + r + " FROM BIKECOMPUTER_LOG;\' > " + filename
-      sqlite3_cmd = ["sh", "-c", sql_cmd]
-      self.config.exec_cmd(sqlite3_cmd)
-    else:
-      #file open
-      f = open(filename, "w", encoding="UTF-8")
-
-      # get Lap Records
+    #timestamp is written as text from the compatibility view
+    #  rows are read and written in chunks (NULL is an empty field)
+    cur.execute("SELECT COUNT(*) FROM BIKECOMPUTER_LOG")
+    total = cur.fetchone()[0]
+    self.progress = 0.0
+    progress_print = self.progress_interval
+    count = 0
+    with open(filename, "w", encoding="UTF-8", newline="", buffering=self.buffer_size) as f:
+      writer = csv.writer(f, lineterminator="\n")
       f.write(r+"\n")
-      for row in cur.execute("SELECT %s FROM BIKECOMPUTER_LOG" % r):
-        f.write(','.join(map(str, row))+"\n")
-      f.close()
+      cur.execute("SELECT %s FROM %s" % (r, self.compat_view))
+      while True:
+        rows = cur.fetchmany(self.fetch_size)
+        if len(rows) == 0:
+          break
+        writer.writerows(rows)
+        count += len(rows)
+        self.progress = count/total
+        if self.progress >= progress_print:
+          print("Write csv : {:.0f}%".format(self.progress*100))
+          progress_print += self.progress_interval
 
-      cur.close()
-      con.close()
+    cur.close()
+    con.close()
+    self.progress = 1.0
 
     #success
     return True
@@ -6,14 +6,13 @@ import traceback
 
 from .logger import Logger
 
-#cython
+#cython (built ahead of time by cython/setup.py, the python writer if not built)
+from .cython.crc16_p import crc16
 MODE = ""
 try:
-  import pyximport; pyximport.install()
   from .cython.logger_fit import write_log_cython, set_config, get_upload_file_name, get_start_date_str
   MODE = "Cython"
-except:
-  from .cython.crc16_p import crc16
+except ImportError:
   MODE = "Python"
 
 
@@ -27,6 +26,10 @@ class config_local():
 class LoggerFit(Logger):
 
   epoch_datetime = datetime.datetime(1989,12,31,0,0,0,0)
+  #epoch of FIT in utc epoch [s]
+  epoch_offset = int((epoch_datetime - datetime.datetime(1970,1,1)).total_seconds())
+  #the C++ writer releases the GIL, so it runs in a thread
+  in_process = (MODE != "Cython")
   profile = {
     0:{
       "name":"file_id",
@@ -62,6 +65,10 @@ class LoggerFit(Logger):
         23:("total_descent","uint16"),
         26:("num_laps","uint16"),
         48:("total_work","uint32"),
+        34:("normalized_power","uint16"),
+        35:("training_stress_score","uint16",10), #with scale
+        36:("intensity_factor","uint16",1000), #with scale
+        45:("threshold_power","uint16"),
         }
       },
     19:{
@@ -148,7 +155,11 @@ class LoggerFit(Logger):
       22:("MAX(total_ascent)"),
       23:("MAX(total_descent)"),
       26:("MAX(lap)"),
-      48:("MAX(accumulated_power)")
+      48:("MAX(accumulated_power)"),
+      34:("normalized_power"),
+      35:("training_stress_score"),
+      36:("intensity_factor"),
+      45:("threshold_power"),
       },
     #lap
     19:{
@@ -228,27 +239,15 @@ class LoggerFit(Logger):
   
   def write_log_python(self):
     ## SQLite
-    #con = sqlite3.connect(self.config.G_LOG_DB)
-    con = sqlite3.connect(self.config.G_LOG_DB, detect_types=sqlite3.PARSE_DECLTYPES|sqlite3.PARSE_COLNAMES)
-    sqlite3.dbapi2.converters['DATETIME'] = sqlite3.dbapi2.converters['TIMESTAMP']
+    con = sqlite3.connect(self.config.G_LOG_DB)
     cur = con.cursor()
    
-    #get start_date 
-    start_date = None
-    #get datetime object (timestamp)
-    cur.execute("SELECT timestamp, MIN(timestamp) FROM BIKECOMPUTER_LOG")
-    first_row = cur.fetchone()
-    if first_row != None:
-      start_date = first_row[0]
-    else:
-      return False
-    #get end_date
-    end_date = None
-    cur.execute("SELECT timestamp, MAX(timestamp) FROM BIKECOMPUTER_LOG")
-    first_row = cur.fetchone()
-    if first_row != None:
-      end_date = first_row[0]
-    else:
+    #get start_date and end_date (utc epoch [s])
+    cur.execute("SELECT MIN(timestamp), MAX(timestamp) FROM BIKECOMPUTER_LOG")
+    (start_date, end_date) = cur.fetchone()
+    if start_date == None:
+      cur.close()
+      con.close()
       return False
     
     local_message_num = 0
@@ -271,13 +270,14 @@ class LoggerFit(Logger):
     struct_def = self.get_struct_def(local_message_num)
     self.write(struct.pack('<1H1B',100,1))
 
+    #lap and session summaries
+    lap_summary = self.get_summary(19, cur)
+    session_summary = self.get_summary(18, cur)
+
     #record
     if self.config.G_IS_DEBUG: print("record")
-    #get Max Lap
-    cur.execute("SELECT MAX(lap) FROM BIKECOMPUTER_LOG")
-    max_lap = (cur.fetchone())[0]
 
-    #get log by laps
+    #get log in one pass ordered by laps
     message_num = 20
     record_row = []
     record_index = []
@@ -286,61 +286,69 @@ class LoggerFit(Logger):
       record_index.append(k)
     record_row = ",".join(record_row)
     
-    for lap_num in range(max_lap+1):
-      for row in cur.execute("SELECT %s FROM BIKECOMPUTER_LOG WHERE lap = %s" % (record_row,lap_num)):
-
-        #search definition in localNum
-        available_fields = []
-        available_data = []
-        if None in row:
-          for i, v in enumerate(row):
-            if v == None: continue
-            available_fields.append(record_index[i])
-            available_data.append(self.convertValue((v,),message_num,record_index[i]))
-          
-          #available_fields = [j for i, j in zip(row, record_index) if i != None]
-          #available_data = list(map(self.convertValue, [(i,) for i in row if i != None], [message_num]*len(available_fields), available_fields))
-          
-          #available_data_gen = [(self.convertValue((i,),message_num,j), j) for i, j in zip(row, record_index) if i != None]
-          #available_fields = [row[1] for row in available_data_gen]
-          #available_data = [row[0] for row in available_data_gen]
-        else:
-          available_fields = record_index
-          available_data = list(map(self.convertValue, [(i,) for i in row], [message_num]*len(available_fields), available_fields))
+    lap_num = None
+    for lap_row in cur.execute("SELECT lap,%s FROM BIKECOMPUTER_LOG WHERE lap >= 0 ORDER BY lap,rowid" % (record_row)):
+      if lap_row[0] != lap_num:
+        if lap_num != None:
+          #lap: 19
+          if self.config.G_IS_DEBUG: print("lap")
+          local_message_num = self.write_summary(19, local_message_num, lap_summary.get(lap_num, {}))
+        lap_num = lap_row[0]
+      row = lap_row[1:]
+
+      #search definition in localNum
+      available_fields = []
+      available_data = []
+      if None in row:
+        for i, v in enumerate(row):
+          if v == None: continue
+          available_fields.append(record_index[i])
+          available_data.append(self.convertValue((v,),message_num,record_index[i]))
+        
+        #available_fields = [j for i, j in zip(row, record_index) if i != None]
+        #available_data = list(map(self.convertValue, [(i,) for i in row if i != None], [message_num]*len(available_fields), available_fields))
         
-        #if self.config.G_IS_DEBUG: print(available_fields, available_data)
-        l_num = self.get_local_message_num(message_num, available_fields)
-        l_num_used = True
-        if l_num == -1:
-          l_num_used = False
-          #write header if need
-          local_message_num = (local_message_num + 1)%16
-          self.local_num[local_message_num] = {"message_num":message_num,"field":available_fields}
-          self.write_definition(local_message_num)
-          l_num = local_message_num
-        #write data
-        struct_def = self.get_struct_def(l_num, l_num_used)
-
-        try:
-          self.write(struct.pack(struct_def,*available_data))
-        except:
-          traceback.print_exc()
-          print("ERROR")
-          print("l_num =", l_num, " message_num =", message_num)
-          print(available_fields)
-          print(struct_def)
-          print(available_data)
-          cur.close()
-          con.close()
-          return False
+        #available_data_gen = [(self.convertValue((i,),message_num,j), j) for i, j in zip(row, record_index) if i != None]
+        #available_fields = [row[1] for row in available_data_gen]
+        #available_data = [row[0] for row in available_data_gen]
+      else:
+        available_fields = record_index
+        available_data = list(map(self.convertValue, [(i,) for i in row], [message_num]*len(available_fields), available_fields))
       
-      #lap: 19
+      #if self.config.G_IS_DEBUG: print(available_fields, available_data)
+      l_num = self.get_local_message_num(message_num, available_fields)
+      l_num_used = True
+      if l_num == -1:
+        l_num_used = False
+        #write header if need
+        local_message_num = (local_message_num + 1)%16
+        self.local_num[local_message_num] = {"message_num":message_num,"field":available_fields}
+        self.write_definition(local_message_num)
+        l_num = local_message_num
+      #write data
+      struct_def = self.get_struct_def(l_num, l_num_used)
+
+      try:
+        self.write(struct.pack(struct_def,*available_data))
+      except:
+        traceback.print_exc()
+        print("ERROR")
+        print("l_num =", l_num, " message_num =", message_num)
+        print(available_fields)
+        print(struct_def)
+        print(available_data)
+        cur.close()
+        con.close()
+        return False
+    
+    #lap: 19
+    if lap_num != None:
       if self.config.G_IS_DEBUG: print("lap")
-      local_message_num = self.get_summary(19, local_message_num, lap_num, cur)
+      local_message_num = self.write_summary(19, local_message_num, lap_summary.get(lap_num, {}))
 
     #session: 18
     if self.config.G_IS_DEBUG: print("session")
-    local_message_num = self.get_summary(18, local_message_num, 0, cur)
+    local_message_num = self.write_summary(18, local_message_num, session_summary.get(0, {}))
 
     #activity: 34
     if self.config.G_IS_DEBUG: print("activity")
@@ -352,7 +360,7 @@ class LoggerFit(Logger):
     end_date_epochtime = self.get_epoch_time(end_date)
     self.write(struct.pack(struct_def,
       end_date_epochtime,
-      int((end_date-start_date).total_seconds())*1000, 
+      (end_date-start_date)*1000, 
       1,  #num of sessions: 1(fix)
       0,  #activity_type: general
       26, #event: activity 
@@ -366,7 +374,7 @@ class LoggerFit(Logger):
     #write fit file 
     ################
 
-    startdate_local = start_date + datetime.timedelta(seconds=offset)
+    startdate_local = datetime.datetime.utcfromtimestamp(start_date + offset)
     self.config.G_LOG_START_DATE = startdate_local.strftime("%Y%m%d%H%M%S")
     filename = self.config.G_LOG_DIR + self.config.G_LOG_START_DATE + ".fit"
     #filename = "test.fit"
@@ -440,45 +448,53 @@ class LoggerFit(Logger):
     value = v[0]
     if field[0] in ["position_lat", "position_long"]:
       value = v[0] / 180 * (2**31)
-    elif message_num in [18, 19] and field[0] in ["timestamp", "local_timestamp", "start_time"]:
-      #sqlite converter return not datetime but str when SQL includes MAX, MIN, etc
-      value = self.get_epoch_time_str(v[0])
     elif field[0] in ["timestamp", "local_timestamp", "start_time"]:
       value = self.get_epoch_time(v[0])
     elif field[0] == "total_elapsed_time": #message_num in [18, 19]
-      value = field[2]*int((self.config.datetime_myparser(v[0])-self.config.datetime_myparser(v[1])).total_seconds())
+      value = field[2]*(v[0]-v[1])
     elif len(field) == 4: # with scale and offset (altitude)
       value = field[2] * (v[0] + field[3])
     elif len(field) == 3: # with scale
       value = field[2] * v[0]
     return int(value)
  
-  def get_summary(self, message_num, local_message_num, lap_num, cur):
-    #get statistics
+  def get_summary(self, message_num, cur):
+    #get statistics of all laps (or the session) in 2 queries: {lap: {field: values}}
+    #  MAX/MIN grouped by lap, and the other items from the row with the max timer
+    #  (SQLite takes bare columns from the row of the only MAX() in the query)
+    lap_sql = self.sql[message_num]
+    agg_keys = [k for k in lap_sql.keys() if "MAX" in lap_sql[k] or "MIN" in lap_sql[k] or "AVG" in lap_sql[k]]
+    row_keys = [k for k in lap_sql.keys() if k not in agg_keys]
+    if message_num == 19: #lap
+      lap_column, max_timer, group_by = "lap", "MAX(timer)", " GROUP BY lap"
+    elif message_num == 18: #session
+      lap_column, max_timer, group_by = "0", "MAX(total_timer_time)", ""
+
+    summary = {}
+    cur.execute("SELECT %s,%s FROM BIKECOMPUTER_LOG%s" \
+      % (lap_column, ",".join([lap_sql[k] for k in agg_keys]), group_by))
+    for row in cur.fetchall():
+      lap_summary = summary.setdefault(row[0], {})
+      i = 1
+      for k in agg_keys:
+        n = lap_sql[k].count(",") + 1
+        lap_summary[k] = row[i:i+n]
+        i += n
+    cur.execute("SELECT %s,%s,%s FROM BIKECOMPUTER_LOG%s" \
+      % (lap_column, max_timer, ",".join([lap_sql[k] for k in row_keys]), group_by))
+    for row in cur.fetchall():
+      if row[1] == None: continue
+      lap_summary = summary.setdefault(row[0], {})
+      for k, v in zip(row_keys, row[2:]):
+        lap_summary[k] = (v,)
+    return summary
+
+  def write_summary(self, message_num, local_message_num, lap_summary):
     lap_fields = [] 
     lap_data =   []
-    lap_sql = self.sql[message_num]
-    for k in lap_sql.keys():
-      if message_num == 19: #lap
-        if "MAX" not in lap_sql[k] and "MIN" not in lap_sql[k] and "AVG" not in lap_sql[k]:
-          cur.execute("\
-            SELECT %s FROM BIKECOMPUTER_LOG\
-            WHERE LAP = %s AND TIMER = (\
-              SELECT MAX(TIMER) FROM BIKECOMPUTER_LOG WHERE LAP = %s)" \
-          % (lap_sql[k],lap_num,lap_num))
-        else:
-          cur.execute("SELECT %s FROM BIKECOMPUTER_LOG WHERE LAP = %s" % (lap_sql[k],lap_num))
-      elif message_num == 18: #session
-        if "avg_" in lap_sql[k]:
-          cur.execute("\
-            SELECT %s FROM BIKECOMPUTER_LOG\
-            WHERE total_timer_time = (\
-              SELECT MAX(total_timer_time) FROM BIKECOMPUTER_LOG)" \
-          % (lap_sql[k]))
-        else:
-          cur.execute("SELECT %s FROM BIKECOMPUTER_LOG" % (lap_sql[k]))
-      v = list((cur.fetchone()))
-      if len(v) == 0 or v[0] == None: continue
+    for k in self.sql[message_num].keys():
+      v = lap_summary.get(k)
+      if v == None or v[0] == None: continue
       lap_fields.append(k)
       lap_data.append(self.convertValue(v,message_num,k))
     #add sport = 2(cycling)
@@ -508,12 +524,9 @@ class LoggerFit(Logger):
       return -1
     return local_message_num
 
-  def get_epoch_time(self, nowdate):
-    seconds = int((nowdate - self.epoch_datetime).total_seconds())
-    return seconds
-  
-  def get_epoch_time_str(self, strtime):
-    return self.get_epoch_time(self.config.datetime_myparser(strtime))
+  def get_epoch_time(self, timestamp):
+    #utc epoch [s] -> seconds from the epoch of FIT
+    return timestamp - self.epoch_offset
 
 
 if __name__=="__main__":
@@ -0,0 +1,80 @@
+import sqlite3
+import time
+import datetime
+
+import numpy as np
+
+from .logger import Logger
+
+
+class config_local():
+  G_LOG_DB = "./log.db~"
+  G_LOG_DIR = "./"
+
+
+class LoggerNpz(Logger):
+  #columnar export of a ride: one typed array per column of BIKECOMPUTER_LOG
+  #  in a numpy .npz (each column is compressed separately), loaded by LoaderNpz
+
+  #rows per fetchmany
+  fetch_size = 4096
+
+  def write_log(self, db_file=None, filename=None):
+    if db_file == None:
+      db_file = self.config.G_LOG_DB
+    con = sqlite3.connect(db_file)
+    cur = con.cursor()
+
+    #get start date (utc epoch [s])
+    cur.execute("SELECT MIN(%s) FROM BIKECOMPUTER_LOG" % self.timestamp_epoch_sql)
+    start_date = cur.fetchone()[0]
+    if start_date == None:
+      cur.close()
+      con.close()
+      return False
+
+    cur.execute("PRAGMA table_info(BIKECOMPUTER_LOG)")
+    table_info = cur.fetchall()
+    columns = [row[1] for row in table_info]
+    types = [row[2] for row in table_info]
+
+    #bulk fetch into float arrays (NULL is nan)
+    cur.execute("SELECT %s FROM BIKECOMPUTER_LOG ORDER BY rowid" % ",".join(
+      [self.timestamp_epoch_sql if c == "timestamp" else c for c in columns]
+      ))
+    blocks = []
+    while True:
+      rows = cur.fetchmany(self.fetch_size)
+      if len(rows) == 0:
+        break
+      blocks.append(np.array(rows, dtype=np.float64))
+    cur.close()
+    con.close()
+    data = np.concatenate(blocks)
+
+    #integer columns without NULL are stored as integers
+    arrays = {}
+    for i, c in enumerate(columns):
+      v = data[:,i]
+      if (types[i] == "INTEGER" or c == "timestamp") and not np.isnan(v).any():
+        v = v.astype(np.int64)
+      arrays[c] = v
+
+    if filename == None:
+      offset = time.localtime().tm_gmtoff
+      startdate_local = datetime.datetime.utcfromtimestamp(start_date + offset)
+      self.config.G_LOG_START_DATE = startdate_local.strftime("%Y%m%d%H%M%S")
+      filename = self.config.G_LOG_DIR + self.config.G_LOG_START_DATE + ".npz"
+    np.savez_compressed(filename, **arrays)
+
+    #success
+    return True
+
+
+if __name__=="__main__":
+  import sys
+  c = config_local()
+  if len(sys.argv) > 1:
+    c.G_LOG_DB = sys.argv[1]
+  d = LoggerNpz(c)
+  d.write_log()
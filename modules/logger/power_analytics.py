@@ -0,0 +1,175 @@
+import math
+
+import numpy as np
+
+
+class RollingAverage():
+  #moving average of the last "size" samples with a ring buffer (O(1) per sample)
+
+  def __init__(self, size):
+    self.size = max(1, size)
+    self.reset()
+
+  def reset(self):
+    self.buf = [0.0] * self.size
+    self.index = 0
+    self.count = 0
+    self.sum = 0.0
+
+  def add(self, v):
+    self.sum += v - self.buf[self.index]
+    self.buf[self.index] = v
+    self.index = (self.index + 1) % self.size
+    if self.count < self.size:
+      self.count += 1
+
+  def is_full(self):
+    return self.count == self.size
+
+  def mean(self):
+    if self.count == 0:
+      return math.nan
+    return self.sum / self.count
+
+
+class MeanMaxPower():
+  #best average power of each duration (power-duration curve)
+  #  prefix sums of the last max(durations) samples are kept in a ring buffer,
+  #  so the cost per sample is O(number of durations)
+
+  durations = [5, 60, 300, 1200, 3600] #[s]
+
+  def __init__(self, interval):
+    self.sizes = [max(1, int(round(d / interval))) for d in self.durations]
+    self.buf_size = max(self.sizes) + 1
+    self.reset()
+
+  def reset(self):
+    #prefix[i % buf_size]: sum of the first i samples
+    self.prefix = [0.0] * self.buf_size
+    self.count = 0
+    self.values = {}
+    for d in self.durations:
+      self.values[d] = math.nan
+
+  def update(self, power):
+    n = self.count + 1
+    s = self.prefix[self.count % self.buf_size] + power
+    self.prefix[n % self.buf_size] = s
+    self.count = n
+    for d, size in zip(self.durations, self.sizes):
+      if n < size:
+        break
+      p = (s - self.prefix[(n - size) % self.buf_size]) / size
+      #nan at first
+      if not p <= self.values[d]:
+        self.values[d] = p
+
+  #power: recorded power (excluding null value) of the ride
+  def resume(self, power):
+    self.reset()
+    n = len(power)
+    if n == 0:
+      return
+    cs = np.concatenate(([0.0], np.cumsum(power, dtype=np.float64)))
+    for d, size in zip(self.durations, self.sizes):
+      if n < size:
+        break
+      self.values[d] = float(np.max(cs[size:] - cs[:-size]) / size)
+    for i in range(max(0, n - self.buf_size + 1), n + 1):
+      self.prefix[i % self.buf_size] = float(cs[i])
+    self.count = n
+
+
+class PowerAnalytics():
+
+  config = None
+  #rolling power [s]
+  windows = {
+    'power_3s': 3,
+    'power_10s': 10,
+    'power_30s': 30,
+    }
+  #for normalized power
+  np_window = 30 #[s]
+  values = {}
+
+  def __init__(self, config):
+    self.config = config
+    self.interval = self.config.G_LOGGING_INTERVAL
+    self.rolling = {}
+    for k, sec in self.windows.items():
+      self.rolling[k] = RollingAverage(int(round(sec / self.interval)))
+    self.rolling_np = RollingAverage(int(round(self.np_window / self.interval)))
+    self.mmp = MeanMaxPower(self.interval)
+    self.values = {}
+    self.reset()
+
+  def reset(self):
+    for r in self.rolling.values():
+      r.reset()
+    self.rolling_np.reset()
+    self.mmp.reset()
+    #state (stored in log db for resume)
+    self.power_count = 0
+    self.np_count = 0
+    self.np_sum = 0.0
+    for k in self.windows:
+      self.values[k] = math.nan
+    self.values['normalized_power'] = math.nan
+    self.values['intensity_factor'] = math.nan
+    self.values['training_stress_score'] = math.nan
+    self.values['w_prime_balance'] = self.config.G_POWER_W_PRIME
+
+  def resume(self, power_count, np_count, np_sum, w_prime_balance):
+    #rolling windows start again from empty
+    if power_count != None:
+      self.power_count = power_count
+    if np_count != None and np_sum != None:
+      self.np_count = np_count
+      self.np_sum = np_sum
+    if w_prime_balance != None:
+      self.values['w_prime_balance'] = w_prime_balance
+    self.update_np()
+
+  #called every G_LOGGING_INTERVAL in recording
+  def update(self, power):
+    #skip when null value(np.nan)
+    if power != power:
+      return
+    self.power_count += 1
+    for k, r in self.rolling.items():
+      r.add(power)
+      self.values[k] = r.mean()
+    self.mmp.update(power)
+
+    #normalized power: 4th root of the mean of (30s rolling power)^4
+    self.rolling_np.add(power)
+    if self.rolling_np.is_full():
+      self.np_sum += self.rolling_np.mean()**4
+      self.np_count += 1
+    self.update_np()
+
+    #W' balance (Skiba, differential form)
+    cp = self.config.G_POWER_CP
+    w_prime = self.config.G_POWER_W_PRIME
+    w_bal = self.values['w_prime_balance']
+    if power > cp:
+      w_bal -= (power - cp) * self.interval
+    elif w_prime > 0:
+      w_bal += (cp - power) * self.interval * (w_prime - w_bal) / w_prime
+    self.values['w_prime_balance'] = w_bal
+
+  def update_np(self):
+    if self.np_count == 0:
+      return
+    norm_power = (self.np_sum / self.np_count)**0.25
+    self.values['normalized_power'] = norm_power
+    ftp = self.config.G_POWER_FTP
+    if ftp <= 0:
+      return
+    intensity = norm_power / ftp
+    self.values['intensity_factor'] = intensity
+    #TSS = (sec * NP * IF) / (FTP * 3600) * 100
+    self.values['training_stress_score'] = \
+      self.power_count * self.interval * norm_power * intensity / (ftp * 3600) * 100
@@ -0,0 +1,84 @@
+import bisect
+
+import numpy as np
+
+
+class ZoneTime():
+  #time [s] in heart rate and power zones
+  #  pre_lap / lap / entire like record_stats in logger_core
+
+  config = None
+  keys = ['heart_rate', 'power']
+  zones = {}
+  #current zone (1, 2, ...)
+  zone = {}
+  values = {}
+
+  def __init__(self, config):
+    self.config = config
+    self.interval = self.config.G_LOGGING_INTERVAL
+    #lower limits of zones
+    self.zones = {
+      'heart_rate': list(self.config.G_ZONE_HR),
+      'power': list(self.config.G_ZONE_POWER),
+      }
+    if len(self.zones['power']) == 0:
+      self.zones['power'] = [int(r * self.config.G_POWER_FTP) for r in self.config.G_ZONE_POWER_RATIO]
+    self.zone = {}
+    self.values = {'pre_lap':{}, 'lap':{}, 'entire':{}}
+    self.reset()
+
+  def reset(self):
+    for k in self.keys:
+      self.zone[k] = np.nan
+      for l_e in self.values:
+        self.values[l_e][k] = self.new_zone_dict(k)
+
+  def new_zone_dict(self, key):
+    return {z: 0 for z in range(1, len(self.zones[key]) + 1)}
+
+  def get_zone(self, key, v):
+    return max(1, bisect.bisect_right(self.zones[key], v))
+
+  #called every G_LOGGING_INTERVAL in recording
+  def update(self, heart_rate, power):
+    for k, v in zip(self.keys, [heart_rate, power]):
+      #skip when null value(np.nan)
+      if v != v:
+        self.zone[k] = np.nan
+        continue
+      z = self.get_zone(k, v)
+      self.zone[k] = z
+      self.values['lap'][k][z] += self.interval
+      self.values['entire'][k][z] += self.interval
+
+  def count_laps(self):
+    for k in self.keys:
+      self.values['pre_lap'][k] = self.values['lap'][k]
+      self.values['lap'][k] = self.new_zone_dict(k)
+
+  #rows: [lap, heart_rate, power] of recorded values (null is np.nan)
+  #seconds: weights of rows (None: 1 for each row)
+  def resume(self, rows, max_lap, seconds=None):
+    self.reset()
+    if len(rows) == 0:
+      return
+    lap = rows[:,0]
+    if seconds is None:
+      seconds = np.ones(len(rows))
+    for i, k in enumerate(self.keys):
+      v = rows[:,i+1]
+      valid = ~np.isnan(v)
+      n = len(self.zones[k])
+      z = np.clip(np.searchsorted(self.zones[k], v[valid], side='right'), 1, n)
+      w = seconds[valid]
+      for l_e, cond in [
+        ['entire', None],
+        ['lap', lap[valid] == max_lap],
+        ['pre_lap', lap[valid] == max_lap - 1],
+        ]:
+        zz = z if cond is None else z[cond]
+        ww = w if cond is None else w[cond]
+        count = np.bincount(zz, weights=ww, minlength=n + 1)
+        for j in range(1, n + 1):
+          self.values[l_e][k][j] = int(count[j]) * self.interval
@@ -1,18 +1,27 @@
 import os
 import sqlite3
 import signal
+import threading
 import datetime
 import shutil
 import re
 import time
 import traceback
+import concurrent.futures
+import multiprocessing
 
 import numpy as np
 
 from . import sensor_core
 from .logger import loader_tcx
+from .logger import loader_ghost
 from .logger import logger_csv
 from .logger import logger_fit
+from .logger import logger_npz
+from .logger import logger_catalog
+from .logger import power_analytics
+from .logger import zone_time
+from .logger.logger import Logger, write_log_process
 
 #ambient
 # online uploading service in Japan
@@ -74,6 +83,18 @@ class LoggerCore():
       "power":{"count":0,"sum":0}}
   }
 
+  #columns added after the first version of BIKECOMPUTER_LOG (for power analytics)
+  power_analytics_columns = [
+    ("power_count", "INTEGER"),
+    ("np_count", "INTEGER"),
+    ("np_sum", "FLOAT"),
+    ("normalized_power", "INTEGER"),
+    ("intensity_factor", "FLOAT"),
+    ("training_stress_score", "FLOAT"),
+    ("threshold_power", "INTEGER"),
+    ("w_prime_balance", "FLOAT"),
+  ]
+
   #for update_track
   pre_lat = None
   pre_lon = None
@@ -87,6 +108,33 @@ class LoggerCore():
   short_log_available = True
   short_log_lock = False
 
+  insert_sql = """\
+    INSERT INTO BIKECOMPUTER_LOG VALUES(\
+      ?,?,?,?,\
+      ?,?,?,?,?,?,?,?,\
+      ?,?,?,?,?,?,\
+      ?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,\
+      ?,?,?,?,?,?,?,?,\
+      ?,?,?,?,\
+      ?,?,?,?,?,?,?,?,\
+      ?,?,?,?,?,?,?,?\
+    )"""
+
+  #smart recording: values of the last written row and the last skipped row (row, values)
+  #  the skipped row is written at a lap or a pause, so the last row of each lap is in the db
+  smart_recording_last = None
+  smart_recording_pending = None
+  #rowid and timestamp of the skipped row written as a placeholder for a crash
+  #  (replaced by newer skipped rows, deleted when the next row of the lap is written)
+  smart_recording_rowid = None
+  smart_recording_rowid_timestamp = None
+
+  #reset_count is running (exports of the log in reset_thread)
+  resetting = False
+  reset_thread = None
+  #wait for reset_thread in quit [s]
+  reset_timeout = 60
+
   #send online
   send_time = None
   send_online_interval_sec = 30
@@ -101,8 +149,13 @@ class LoggerCore():
     self.config = config
     self.sensor = sensor_core.SensorCore(self.config)
     self.course = loader_tcx.LoaderTcx(self.config, self.sensor)
+    self.ghost = loader_ghost.LoaderGhost(self.config)
     self.logger_csv = logger_csv.LoggerCsv(self.config)
     self.logger_fit = logger_fit.LoggerFit(self.config)
+    self.logger_npz = logger_npz.LoggerNpz(self.config)
+    self.logger_catalog = logger_catalog.LoggerCatalog(self.config)
+    self.power_analytics = power_analytics.PowerAnalytics(self.config)
+    self.zone_time = zone_time.ZoneTime(self.config)
 
     if _IMPORT_AMBIENT:
       t = datetime.datetime.utcnow()
@@ -110,10 +163,13 @@ class LoggerCore():
       self.send_time = datetime.datetime.now()
       print("\tlogger_core : setup ambient...: done", (datetime.datetime.utcnow()-t).total_seconds(), "sec")
     
-    t = datetime.datetime.utcnow()
-    print("\tlogger_core : loading course...")
-    self.course.load()
-    print("\tlogger_core : loading course...: done", (datetime.datetime.utcnow()-t).total_seconds(), "sec")
+    #course is loaded in background and published when ready
+    #  until then, self.course is an empty course
+    self.course.reset()
+    self.course_ready = threading.Event()
+    self.course_thread = threading.Thread(target=self.load_course, name="load_course", args=())
+    self.course_thread.setDaemon(True)
+    self.course_thread.start()
     
     for k in self.lap_keys:
       self.record_stats['pre_lap_avg'][k] = 0
@@ -151,15 +207,38 @@ class LoggerCore():
       traceback.print_exc()
       #pass
 
+  def load_course(self):
+    t = datetime.datetime.utcnow()
+    print("\tlogger_core : loading course...")
+    course = loader_tcx.LoaderTcx(self.config, self.sensor)
+    course.load()
+    #ghost is resampled onto the loaded course
+    ghost = loader_ghost.LoaderGhost(self.config)
+    ghost.load(course)
+    #publish at once (readers see either the empty course or the loaded one)
+    self.ghost = ghost
+    self.course = course
+    self.course_ready.set()
+    print("\tlogger_core : loading course...: done", (datetime.datetime.utcnow()-t).total_seconds(), "sec")
+
   def quit(self):
+    #wait for the exports of reset_count (the daemon thread is killed at exit)
+    if self.reset_thread != None:
+      self.reset_thread.join(timeout=self.reset_timeout)
+    if self.resetting:
+      #db and config pickle are still used by reset_thread
+      print("quit : reset_count is still running")
+      return False
+    self.flush_smart_recording()
     self.cur.close()
     self.con.close()
+    return True
 
   def init_db(self):
     self.cur.execute("SELECT * FROM sqlite_master WHERE type='table' and name='BIKECOMPUTER_LOG'")
     if self.cur.fetchone() == None:
       self.con.execute("""CREATE TABLE BIKECOMPUTER_LOG(
-        timestamp DATETIME,
+        timestamp INTEGER,
         lap INTEGER, 
         timer INTEGER,
         total_timer_time INTEGER,
@@ -211,22 +290,59 @@ class LoggerCore():
         lap_power_count INTEGER,
         lap_power_sum INTEGER,
         avg_power_count INTEGER,
-        avg_power_sum INTEGER
+        avg_power_sum INTEGER,
+        power_count INTEGER,
+        np_count INTEGER,
+        np_sum FLOAT,
+        normalized_power INTEGER,
+        intensity_factor FLOAT,
+        training_stress_score FLOAT,
+        threshold_power INTEGER,
+        w_prime_balance FLOAT
       )""")
       self.cur.execute("CREATE INDEX lap_index ON BIKECOMPUTER_LOG(lap)")
       self.cur.execute("CREATE INDEX total_timer_time_index ON BIKECOMPUTER_LOG(total_timer_time)")
       self.cur.execute("CREATE INDEX timestamp_index ON BIKECOMPUTER_LOG(timestamp)")
       self.con.commit()
+    else:
+      #add columns to db of older version (resume)
+      self.cur.execute("PRAGMA table_info(BIKECOMPUTER_LOG)")
+      columns = [row[1] for row in self.cur.fetchall()]
+      for c, t in self.power_analytics_columns:
+        if c not in columns:
+          self.cur.execute("ALTER TABLE BIKECOMPUTER_LOG ADD COLUMN %s %s" % (c, t))
+      #timestamp text (version 0) to utc epoch [s]
+      self.cur.execute("PRAGMA user_version")
+      if self.cur.fetchone()[0] < 1:
+        self.cur.execute("\
+          UPDATE BIKECOMPUTER_LOG SET timestamp = CAST(strftime('%s', timestamp) AS INTEGER)\
+          WHERE typeof(timestamp) = 'text'")
+      self.con.commit()
+    self.cur.execute("PRAGMA user_version = %d" % Logger.db_version)
+
+    #compatibility view (timestamp as text)
+    self.cur.execute("PRAGMA table_info(BIKECOMPUTER_LOG)")
+    columns = [row[1] for row in self.cur.fetchall()]
+    self.cur.execute("DROP VIEW IF EXISTS %s" % Logger.compat_view)
+    self.cur.execute("CREATE VIEW %s AS SELECT %s FROM BIKECOMPUTER_LOG" % (
+      Logger.compat_view,
+      ",".join(["datetime(timestamp, 'unixepoch') AS timestamp" if c == "timestamp" else c for c in columns]),
+      ))
+    self.con.commit()
       
   def do_countup(self, arg1, arg2):
     self.calc_gross()
     if self.config.G_STOPWATCH_STATUS != "START":
+      if not self.resetting:
+        self.flush_smart_recording()
       return
     self.values['count'] += 1
     self.values['count_lap'] += 1
     self.record_log()
 
   def start_and_stop_manual(self):
+    if self.resetting:
+      return
     self.sensor.sensor_spi.screen_flash_short()
     if self.config.G_MANUAL_STATUS != "START":
       print("->M START\t", datetime.datetime.now())
@@ -235,7 +351,7 @@ class LoggerCore():
       if self.config.gui != None:
         self.config.gui.change_start_stop_button(self.config.G_MANUAL_STATUS)
       if self.values['start_time'] == None:
-        self.values['start_time'] = int(datetime.datetime.utcnow().timestamp())
+        self.values['start_time'] = int(time.time())
     elif self.config.G_MANUAL_STATUS == "START":
       print("->M STOP\t", datetime.datetime.now())
       self.start_and_stop("START")
@@ -255,7 +371,7 @@ class LoggerCore():
       print("->STOP\t", datetime.datetime.now())
   
   def count_laps(self):
-    if self.values['count'] == 0: return
+    if self.values['count'] == 0 or self.resetting: return
     self.sensor.sensor_spi.screen_flash_short()
     self.values['lap'] += 1
     self.values['count_lap'] = 0
@@ -267,35 +383,51 @@ class LoggerCore():
     for k2 in ["cadence","power"]:
       self.average["lap"][k2]["count"] = 0
       self.average["lap"][k2]["sum"] = 0
+    self.zone_time.count_laps()
     self.record_log()
     print("->LAP:", self.values['lap'], "\t", datetime.datetime.now())
 
-  def reset_count(self):
-    if self.config.G_MANUAL_STATUS == "START" or self.values['count'] == 0:
+  def reset_count(self, callback=None):
+    #callback is called in reset_thread after the reset
+    if self.config.G_MANUAL_STATUS == "START" or self.values['count'] == 0 or self.resetting:
       return
       
     #reset
     self.sensor.sensor_spi.screen_flash_long()
 
+    #export logs and reset db off the GUI thread
+    self.resetting = True
+    self.reset_thread = threading.Thread(target=self.reset_count_process, name="reset_count", args=(callback,))
+    self.reset_thread.setDaemon(True)
+    self.reset_thread.start()
+
+  def reset_count_process(self, callback):
+    try:
+      if self.write_logs_and_reset_db() and callback != None:
+        callback()
+    finally:
+      self.resetting = False
+
+  def write_logs_and_reset_db(self):
+    self.flush_smart_recording()
+
     #close db connect
     self.cur.close()
     self.con.close()
 
-    if self.config.G_LOG_WRITE_CSV:
-      t = datetime.datetime.now()
-      if not self.logger_csv.write_log():
-        return
-      print("Write csv :", (datetime.datetime.now()-t).total_seconds(),"sec")
-    if self.config.G_LOG_WRITE_FIT:
-      t = datetime.datetime.now()
-      if not self.logger_fit.write_log():
-        return
-      print("Write Fit({}) : {} sec".format(logger_fit.MODE,(datetime.datetime.now()-t).total_seconds()))
+    #exports read the closed db only, so they run concurrently
+    t = datetime.datetime.now()
+    if not self.write_logs():
+      return False
+    print("Write logs :", (datetime.datetime.now()-t).total_seconds(),"sec")
     
     # backup and reset database
     t = datetime.datetime.now()
     shutil.move(self.config.G_LOG_DB, self.config.G_LOG_DB+"-"+self.config.G_LOG_START_DATE)
     
+    #add the ride to the catalog
+    self.logger_catalog.add_ride(self.config.G_LOG_DB+"-"+self.config.G_LOG_START_DATE)
+    
     self.reset()
 
     #restart db connect
@@ -310,6 +442,54 @@ class LoggerCore():
     
     #reset accumulated values
     self.sensor.reset()
+    return True
+
+  def write_logs(self):
+    exports = []
+    if self.config.G_LOG_WRITE_CSV:
+      exports.append(("csv", self.logger_csv))
+    if self.config.G_LOG_WRITE_NPZ:
+      exports.append(("npz", self.logger_npz))
+    if self.config.G_LOG_WRITE_FIT:
+      exports.append(("Fit({})".format(logger_fit.MODE), self.logger_fit))
+    workers = min(len(exports), os.cpu_count() or 1)
+
+    #single core: one by one
+    if workers <= 1:
+      for name, l in exports:
+        t = datetime.datetime.now()
+        if not l.write_log():
+          return False
+        print("Write {} : {} sec".format(name, (datetime.datetime.now()-t).total_seconds()))
+      return True
+
+    #python writers in worker processes, the others in threads
+    #  workers are started by forkserver, a fork of this multithreaded process can copy held locks
+    futures = []
+    mp_context = multiprocessing.get_context("forkserver")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as process_pool, \
+      concurrent.futures.ThreadPoolExecutor(max_workers=workers) as thread_pool:
+      for name, l in exports:
+        if l.in_process:
+          f = process_pool.submit(write_log_process, type(l), l.get_config_values())
+        else:
+          f = thread_pool.submit(self.write_log_thread, l)
+        futures.append((name, l, f))
+      results = [(name, l, f.result()) for name, l, f in futures]
+
+    success = True
+    for name, l, (result, sec, values) in results:
+      if not result:
+        success = False
+        continue
+      l.set_config_values(values)
+      print("Write {} : {} sec".format(name, sec))
+    return success
+
+  def write_log_thread(self, l):
+    t = datetime.datetime.now()
+    result = l.write_log()
+    return result, (datetime.datetime.now()-t).total_seconds(), {}
 
   def reset(self):
     #clear lap
@@ -332,23 +512,32 @@ class LoggerCore():
       for k2 in ["cadence","power"]:
         self.average[k1][k2]["count"] = 0
         self.average[k1][k2]["sum"] = 0
+    self.power_analytics.reset()
+    self.zone_time.reset()
+    self.smart_recording_last = None
+    self.smart_recording_pending = None
+    self.smart_recording_rowid = None
+    self.smart_recording_rowid_timestamp = None
 
   def record_log(self):
-    #need to detect location delta for smart recording
-    
-    #get present value
+    #get present value from one snapshot (values of other threads are not mixed up)
+    snapshot = self.sensor.snapshot
+    integrated = snapshot['integrated']
+    gps = snapshot['GPS']
+    i2c = snapshot['I2C']
     value = {
-      "heart_rate":self.sensor.values['integrated']['hr'],
-      "cadence":self.sensor.values['integrated']['cadence'],
-      "distance":self.sensor.values['integrated']['distance'],
-      "speed":self.sensor.values['integrated']['speed'],
-      "power":self.sensor.values['integrated']['power'],
-      "accumulated_power":self.sensor.values['integrated']['accumulated_power'],
-      "total_ascent":self.sensor.values['I2C']['total_ascent'],
-      "total_descent":self.sensor.values['I2C']['total_descent']
+      "heart_rate":integrated['hr'],
+      "cadence":integrated['cadence'],
+      "distance":integrated['distance'],
+      "speed":integrated['speed'],
+      "power":integrated['power'],
+      "accumulated_power":integrated['accumulated_power'],
+      "total_ascent":i2c['total_ascent'],
+      "total_descent":i2c['total_descent']
     }
      
     #update lap stats if value is not Null
+    new_max = False
     for k,v in value.items():
       #skip when null value(np.nan)
       if v in [self.config.G_GPS_NULLVALUE, self.config.G_ANT_NULLVALUE]:
@@ -399,36 +588,39 @@ class LoggerCore():
       if k in ['heart_rate', 'cadence', 'speed', 'power']:
         if self.record_stats['lap_max'][k] < v:
           self.record_stats['lap_max'][k] = v
+          new_max = True
         if self.record_stats['entire_max'][k] < v:
           self.record_stats['entire_max'][k] = v
       elif k in ['distance', 'accumulated_power', 'total_ascent', 'total_descent']:
         self.record_stats['lap_max'][k] = v
+
+    #rolling power, NP, IF, TSS and W'bal
+    pa = self.power_analytics
+    pa.update(value['power'])
+    threshold_power = None
+    if not np.isnan(pa.values['normalized_power']):
+      threshold_power = self.config.G_POWER_FTP
+
+    #time in zones
+    self.zone_time.update(value['heart_rate'], value['power'])
    
     ## SQLite
     now_time = datetime.datetime.utcnow()
-    self.cur.execute("""\
-      INSERT INTO BIKECOMPUTER_LOG VALUES(\
-        ?,?,?,?,\
-        ?,?,?,?,?,?,?,?,\
-        ?,?,?,?,?,?,\
-        ?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,\
-        ?,?,?,?,?,?,?,?,\
-        ?,?,?,?,\
-        ?,?,?,?,?,?,?,?\
-      )""",
-      (now_time,
+    timestamp = int(time.time())
+    row = \
+      (timestamp,
        self.values['lap'],
        self.values['count_lap'],
        self.values['count'],
        ###
-       self.sensor.values['GPS']['lat'],
-       self.sensor.values['GPS']['lon'],
-       self.sensor.values['GPS']['alt'],
-       self.sensor.values['GPS']['distance'],
-       self.sensor.values['GPS']['mode'],
-       self.sensor.values['GPS']['used_sats'],
-       self.sensor.values['GPS']['total_sats'],
-       self.sensor.values['GPS']['track'],
+       gps['lat'],
+       gps['lon'],
+       gps['alt'],
+       gps['distance'],
+       gps['mode'],
+       gps['used_sats'],
+       gps['total_sats'],
+       gps['track'],
        ###
        value['heart_rate'],
        value['cadence'],
@@ -437,22 +629,22 @@ class LoggerCore():
        value['power'],
        value['accumulated_power'],
        ###
-       self.sensor.values['I2C']['temperature'],
-       self.sensor.values['I2C']['pressure'],
-       self.sensor.values['I2C']['altitude'],
-       self.sensor.values['I2C']['heading'],
-       self.sensor.values['I2C']['m_stat'],
-       #self.sensor.values['I2C']['acc'][0],
-       #self.sensor.values['I2C']['acc'][1],
-       #self.sensor.values['I2C']['acc'][2],
-       self.sensor.values['I2C']['acc_variance'][0],
-       self.sensor.values['I2C']['acc_variance'][1],
-       self.sensor.values['I2C']['acc_variance'][2],
-       self.sensor.values['I2C']['voltage_battery'],
-       self.sensor.values['I2C']['current_battery'],
-       self.sensor.values['I2C']['voltage_out'],
-       self.sensor.values['I2C']['current_out'],
-       self.sensor.values['I2C']['battery_percentage'],
+       i2c['temperature'],
+       i2c['pressure'],
+       i2c['altitude'],
+       i2c['heading'],
+       i2c['m_stat'],
+       #i2c['acc'][0],
+       #i2c['acc'][1],
+       #i2c['acc'][2],
+       i2c['acc_variance'][0],
+       i2c['acc_variance'][1],
+       i2c['acc_variance'][2],
+       i2c['voltage_battery'],
+       i2c['current_battery'],
+       i2c['voltage_out'],
+       i2c['current_out'],
+       i2c['battery_percentage'],
        value['total_ascent'],
        value['total_descent'],
        ###
@@ -477,17 +669,43 @@ class LoggerCore():
        self.average['lap']['power']['count'],
        self.average['lap']['power']['sum'],
        self.average['entire']['power']['count'],
-       self.average['entire']['power']['sum']
+       self.average['entire']['power']['sum'],
+       ###
+       pa.power_count,
+       pa.np_count,
+       pa.np_sum,
+       pa.values['normalized_power'],
+       pa.values['intensity_factor'],
+       pa.values['training_stress_score'],
+       threshold_power,
+       pa.values['w_prime_balance'],
        )
-    )
-    self.con.commit()
+    if self.config.G_LOG_SMART_RECORDING:
+      record = {
+        'timestamp':timestamp,
+        'lap':self.values['lap'],
+        'lat':gps['lat'],
+        'lon':gps['lon'],
+        'track':gps['track'],
+        'heart_rate':value['heart_rate'],
+        'cadence':value['cadence'],
+        'power':value['power'],
+        'speed':value['speed'],
+        }
+      if self.is_smart_recording_needed(record, new_max):
+        self.insert_log(row, record)
+      else:
+        self.smart_recording_pending = (row, record)
+        self.write_smart_recording_placeholder()
+    else:
+      self.insert_log(row)
 
     t2 = (datetime.datetime.utcnow() - now_time).total_seconds()
     self.store_short_log_for_update_track(
       value['distance'],
-      self.sensor.values['GPS']['lat'],
-      self.sensor.values['GPS']['lon'],
-      now_time,
+      gps['lat'],
+      gps['lon'],
+      timestamp,
       )
 
     if self.values['count'] % 1800 == 10:
@@ -496,12 +714,86 @@ class LoggerCore():
     #send online
     #self.send_ambient()
 
+  def insert_log(self, row, record=None):
+    #the skipped row is the last row of the previous lap
+    pending = self.smart_recording_pending
+    self.smart_recording_pending = None
+    if pending != None and pending[1]['lap'] != self.values['lap']:
+      self.replace_smart_recording_placeholder(pending[0])
+    else:
+      self.replace_smart_recording_placeholder(None)
+    self.smart_recording_rowid = None
+    self.cur.execute(self.insert_sql, row)
+    self.con.commit()
+    self.smart_recording_last = record
+
+  def flush_smart_recording(self):
+    #write the skipped row at a pause, reset or quit
+    pending = self.smart_recording_pending
+    if pending == None:
+      return
+    self.smart_recording_pending = None
+    self.replace_smart_recording_placeholder(pending[0])
+    self.smart_recording_rowid = None
+    self.con.commit()
+    self.smart_recording_last = pending[1]
+
+  def write_smart_recording_placeholder(self):
+    #bound the rows lost by a crash or a power loss to G_LOG_SMART_RECORDING_PLACEHOLDER_INTERVAL
+    row, record = self.smart_recording_pending
+    written = self.smart_recording_last['timestamp']
+    if self.smart_recording_rowid != None:
+      written = self.smart_recording_rowid_timestamp
+    if record['timestamp'] - written < self.config.G_LOG_SMART_RECORDING_PLACEHOLDER_INTERVAL:
+      return
+    self.replace_smart_recording_placeholder(row)
+    self.smart_recording_rowid_timestamp = record['timestamp']
+    self.con.commit()
+
+  def replace_smart_recording_placeholder(self, row):
+    #delete the placeholder, then insert row (None: delete only)
+    if self.smart_recording_rowid != None:
+      self.cur.execute("DELETE FROM BIKECOMPUTER_LOG WHERE rowid = ?", (self.smart_recording_rowid,))
+      self.smart_recording_rowid = None
+    if row != None:
+      self.cur.execute(self.insert_sql, row)
+      self.smart_recording_rowid = self.cur.lastrowid
+
+  def is_smart_recording_needed(self, record, new_max):
+    last = self.smart_recording_last
+    #the first row of a lap and new max values (for lap and session statistics)
+    if last == None or record['lap'] != last['lap'] or new_max:
+      return True
+    if record['timestamp'] - last['timestamp'] >= self.config.G_LOG_SMART_RECORDING_INTERVAL:
+      return True
+    #position and heading (a lost or a new gps fix is a change)
+    if self.is_changed(record['lat'], last['lat'], np.inf) or self.is_changed(record['track'], last['track'], np.inf):
+      return True
+    if record['lat'] == record['lat'] and last['lat'] == last['lat']:
+      dist = self.config.get_dist_on_earth(last['lon'], last['lat'], record['lon'], record['lat'])
+      if dist >= self.config.G_LOG_SMART_RECORDING_DISTANCE:
+        return True
+    if record['track'] == record['track'] and last['track'] == last['track']:
+      if abs((record['track'] - last['track'] + 180) % 360 - 180) >= self.config.G_LOG_SMART_RECORDING_HEADING:
+        return True
+    #sensor values
+    for k, threshold in self.config.G_LOG_SMART_RECORDING_THRESHOLD.items():
+      if self.is_changed(record[k], last[k], threshold):
+        return True
+    return False
+
+  def is_changed(self, v, pre_v, threshold):
+    #null value(np.nan) and a valid value are changed
+    if v != v or pre_v != pre_v:
+      return (v != v) != (pre_v != pre_v)
+    return abs(v - pre_v) >= threshold
+
   def calc_gross(self):
     #elapsed_time
     if self.values['start_time'] == None:
       return
     #[s]
-    self.values['elapsed_time'] = int(datetime.datetime.utcnow().timestamp() - self.values['start_time'])
+    self.values['elapsed_time'] = int(time.time() - self.values['start_time'])
 
     #gross_ave_spd
     if self.values['elapsed_time'] == 0:
@@ -542,7 +834,8 @@ class LoggerCore():
       lap_accumulated_power,lap_total_ascent,lap_total_descent,\
       avg_heart_rate,avg_cadence,avg_speed,avg_power,\
       lap_cad_count,lap_cad_sum,lap_power_count,lap_power_sum,\
-      avg_cad_count,avg_cad_sum,avg_power_count,avg_power_sum"
+      avg_cad_count,avg_cad_sum,avg_power_count,avg_power_sum,\
+      power_count,np_count,np_sum,w_prime_balance"
     self.cur.execute("\
       SELECT %s FROM BIKECOMPUTER_LOG\
       WHERE total_timer_time = (SELECT MAX(total_timer_time) FROM BIKECOMPUTER_LOG) \
@@ -574,10 +867,23 @@ class LoggerCore():
           self.average[k1][k2][k3] = value[index]
           index += 1
     #print(self.average)
+    self.power_analytics.resume(*value[index:index+4])
+
+    #recorded values are weighted by the seconds until the next row (rows skipped by smart recording)
+    self.cur.execute("SELECT total_timer_time, lap, heart_rate, power FROM BIKECOMPUTER_LOG ORDER BY rowid")
+    rows = np.array(self.cur.fetchall(), dtype=np.float64).reshape(-1, 4)
+    seconds = np.maximum(np.diff(rows[:,0], append=rows[-1:,0]+1), 1).astype(np.int64)
+
+    #mean max power from recorded power
+    valid = ~np.isnan(rows[:,3])
+    self.power_analytics.mmp.resume(np.repeat(rows[valid,3], seconds[valid]))
     
     #get lap
     self.cur.execute("SELECT MAX(LAP) FROM BIKECOMPUTER_LOG")
     max_lap = (self.cur.fetchone())[0]
+
+    #time in zones from recorded heart rate and power
+    self.zone_time.resume(rows[:,1:], max_lap, seconds)
     
     #get max
     max_row = "MAX(heart_rate), MAX(cadence), MAX(speed), MAX(power)"
@@ -627,7 +933,7 @@ class LoggerCore():
     self.cur.execute("SELECT MIN(timestamp) FROM BIKECOMPUTER_LOG")
     first_row = self.cur.fetchone()
     if first_row[0] != None:
-      self.values['start_time'] = int(self.config.datetime_myparser(first_row[0]).timestamp()-1)
+      self.values['start_time'] = first_row[0] - 1
 
     #if not self.config.G_IS_RASPI and self.config.G_DUMMY_OUTPUT:
     if self.config.G_DUMMY_OUTPUT:
@@ -675,13 +981,16 @@ class LoggerCore():
     
     timestamp_delta = None
     if timestamp != None:
-      timestamp_delta = \
-        (datetime.datetime.utcnow() - timestamp).total_seconds()
+      timestamp_delta = time.time() - timestamp
     
     #make_tmp_db = False
     lat_raw = np.array([])
     lon_raw = np.array([])
     dist_raw = np.array([])
+
+    #db is moved in reset_count
+    if self.resetting:
+      return timestamp, lon, lat
     
     #get values from short_log to db in logging
     if timestamp_delta != None and self.short_log_available:
@@ -704,7 +1013,7 @@ class LoggerCore():
         "SELECT distance,position_lat,position_long FROM BIKECOMPUTER_LOG " + \
         "WHERE position_lat is not null AND position_long is not null "
       if timestamp != None:
-        query = query + "AND timestamp > '%s'" % timestamp
+        query = query + "AND timestamp > %d" % timestamp
 
       con = sqlite3.connect(db_file)
       cur = con.cursor()
@@ -719,7 +1028,7 @@ class LoggerCore():
       cur.execute("SELECT MAX(timestamp) FROM BIKECOMPUTER_LOG")
       first_row = cur.fetchone()
       if first_row[0] != None:
-        timestamp_new = self.config.datetime_myparser(first_row[0])
+        timestamp_new = first_row[0]
       
       cur.close()
       con.close()
@@ -753,7 +1062,7 @@ class LoggerCore():
         lon = lon_raw[cond]
 
     if timestamp is None:
-      timestamp_new = datetime.datetime.utcnow()
+      timestamp_new = int(time.time())
     
     #print("\tlogger_core : update_track(new) ", (datetime.datetime.utcnow()-t).total_seconds(), "sec")
 
@@ -766,18 +1075,19 @@ class LoggerCore():
     if (t - self.send_time).total_seconds() < self.send_online_interval_sec:
       return
     self.send_time = t
+    snapshot = self.sensor.snapshot
     try:
       d = {
-        'd1': self.sensor.values['integrated']['speed'] * 3.6,
-        'd2': self.sensor.values['integrated']['hr'], 
-        'd3': self.sensor.values['integrated']['cadence'],
-        'd4': self.sensor.values['integrated']['power'],
-        'd5': self.sensor.values['I2C']['altitude'],
-        'd6': self.sensor.values['integrated']['distance']/1000,
-        'd7': self.sensor.values['integrated']['accumulated_power']/1000,
-        'd8': self.sensor.values['I2C']['temperature'],
-        'lat':self.sensor.values['GPS']['lat'], 
-        'lng':self.sensor.values['GPS']['lon']
+        'd1': snapshot['integrated']['speed'] * 3.6,
+        'd2': snapshot['integrated']['hr'], 
+        'd3': snapshot['integrated']['cadence'],
+        'd4': snapshot['integrated']['power'],
+        'd5': snapshot['I2C']['altitude'],
+        'd6': snapshot['integrated']['distance']/1000,
+        'd7': snapshot['integrated']['accumulated_power']/1000,
+        'd8': snapshot['I2C']['temperature'],
+        'lat':snapshot['GPS']['lat'], 
+        'lng':snapshot['GPS']['lon']
         }
       d_send = {}
       for k,v in d.items():
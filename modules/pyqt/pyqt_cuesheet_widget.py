@@ -83,7 +83,7 @@ class CueSheetItem(QtWidgets.QVBoxLayout):
 class CueSheetWidget(ScreenWidget):
 
   def init_extra(self):
-    self.gps_values = self.config.logger.sensor.values['GPS']
+    self.gps_values = self.sensor.snapshot['GPS']
 
   def setup_ui(self):
     
@@ -128,6 +128,7 @@ class CueSheetWidget(ScreenWidget):
     if len(self.config.logger.course.point_distance) == 0 or self.config.G_CUESHEET_DISPLAY_NUM == 0:
       return
     
+    self.gps_values = self.sensor.snapshot['GPS']
     cp_i = self.gps_values['course_point_index']
     
     #cuesheet
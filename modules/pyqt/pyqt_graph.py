@@ -74,9 +74,10 @@ class PerformanceGraphWidget(ScreenWidget):
     self.set_minimum_size()
 
   def update_extra(self):
+    v = self.snapshot['integrated']
     all_nan = {'hr_graph': True, 'power_graph': True}
     for key in all_nan.keys():
-      chk = np.isnan(self.config.logger.sensor.values['integrated'][key])
+      chk = np.isnan(v[key])
       if False in chk:
         all_nan[key] = False
    
@@ -85,7 +86,7 @@ class PerformanceGraphWidget(ScreenWidget):
       #for HR
       self.p1.addItem(
         pg.PlotCurveItem(
-          self.config.logger.sensor.values['integrated']['hr_graph'], 
+          v['hr_graph'], 
           pen=self.pen1
         )
       )
@@ -98,13 +99,208 @@ class PerformanceGraphWidget(ScreenWidget):
       bg = pg.BarGraphItem(
         x0 = self.plot_data_x1[:-1],
         x1 = self.plot_data_x1[1:],
-        height = self.config.logger.sensor.values['integrated']['power_graph'],
+        height = v['power_graph'],
         brush = self.brush,
         pen = self.pen2
       )
       self.p2.addItem(bg)
 
 
+class PowerDurationGraphWidget(ScreenWidget):
+
+  #for redraw only when mean max power is updated
+  pre_count = -1
+
+  def init_extra(self):
+    self.mmp = self.logger.power_analytics.mmp
+    #log scale of duration
+    self.plot_data_x = np.log10(self.mmp.durations)
+    self.x_ticks = []
+    for x, d in zip(self.plot_data_x, self.mmp.durations):
+      label = "{}s".format(d)
+      if d >= 60:
+        label = "{}m".format(int(d/60))
+      self.x_ticks.append((x, label))
+
+  def setup_ui_extra(self):
+    self.plot = pg.PlotWidget()
+    self.plot.setBackground(None)
+    self.p1 = self.plot.plotItem
+    self.p1.getAxis('bottom').setTicks([self.x_ticks])
+    self.plot.setXRange(self.plot_data_x[0], self.plot_data_x[-1])
+    self.plot.setMouseEnabled(x=False, y=False)
+    self.pen1 = pg.mkPen(color=(0,0,255), width=3)
+    self.brush = pg.mkBrush(color=(0,0,255))
+
+  def make_item_layout(self):
+    self.item_layout = {"MMP 5s":(0, 0), "MMP 1m":(0, 1), "MMP 5m":(0, 2), "MMP 20m":(0, 3)}
+
+  def add_extra(self):
+    self.layout.addWidget(self.plot, 1, 0, 2, 4)
+
+  def set_border(self):
+    self.max_height = 1
+    self.max_width = 3
+
+  def set_font_size(self, length):
+    self.font_size = int(length / 7)
+    self.set_minimum_size()
+
+  def update_extra(self):
+    if self.pre_count == self.mmp.count:
+      return
+    self.pre_count = self.mmp.count
+    y = np.array([self.mmp.values[d] for d in self.mmp.durations])
+    valid = ~np.isnan(y)
+    self.p1.clear()
+    #no curve after reset
+    if not np.any(valid):
+      return
+    self.p1.addItem(
+      pg.PlotDataItem(
+        self.plot_data_x[valid],
+        y[valid],
+        pen=self.pen1,
+        symbolBrush=self.brush,
+        symbolPen=None,
+        symbolSize=8,
+      )
+    )
+    self.plot.setYRange(0, max(self.config.G_GUI_MAX_POWER, np.max(y[valid])))
+
+
+class ZoneBarWidget(ScreenWidget):
+
+  #time in zones of entire ride
+  l_e = 'entire'
+  pre_timer = -1
+
+  def init_extra(self):
+    self.zone_time = self.logger.zone_time
+    #zone colors from slope colors (gray -> red)
+    self.brush = {}
+    c = self.config.G_SLOPE_COLOR
+    for k in self.zone_time.keys:
+      n = len(self.zone_time.zones[k])
+      self.brush[k] = [
+        pg.mkBrush(color=c[int(round(i*(len(c)-1)/max(1, n-1)))]) for i in range(n)
+        ]
+
+  def setup_ui_extra(self):
+    self.plot = {}
+    for k in self.zone_time.keys:
+      self.plot[k] = pg.PlotWidget()
+      self.plot[k].setBackground(None)
+      self.plot[k].hideAxis('bottom')
+      self.plot[k].hideAxis('left')
+      self.plot[k].setMouseEnabled(x=False, y=False)
+      self.plot[k].setYRange(0.5, len(self.zone_time.zones[k]) + 0.5)
+    self.pen = pg.mkPen(color=(255,255,255), width=0.01)
+
+  def make_item_layout(self):
+    self.item_layout = {"HR Zone":(0, 0), "HR":(0, 1), "PWR Zone":(0, 2), "Power":(0, 3)}
+
+  def add_extra(self):
+    self.layout.addWidget(self.plot['heart_rate'], 1, 0, 2, 2)
+    self.layout.addWidget(self.plot['power'], 1, 2, 2, 2)
+
+  def set_border(self):
+    self.max_height = 1
+    self.max_width = 3
+
+  def set_font_size(self, length):
+    self.font_size = int(length / 7)
+    self.set_minimum_size()
+
+  def update_extra(self):
+    #update bars every second of recording
+    if self.pre_timer == self.logger.values['count']:
+      return
+    self.pre_timer = self.logger.values['count']
+    for k in self.zone_time.keys:
+      v = self.zone_time.values[self.l_e][k]
+      z = list(v.keys())
+      w = [v[i] for i in z]
+      self.plot[k].clear()
+      #horizontal bars (zone 1 is bottom)
+      self.plot[k].addItem(
+        pg.BarGraphItem(
+          x0=0, y=z, height=0.8, width=w,
+          brushes=self.brush[k], pen=self.pen,
+        )
+      )
+      self.plot[k].setXRange(0, max(1, max(w)))
+
+
+class ClimbProfileWidget(ScreenWidget):
+
+  #profile of current or next climb
+  #  redraw only when the climb changes, moving only the current point every update
+  pre_climb = -2
+
+  def setup_ui_extra(self):
+    self.plot = pg.PlotWidget()
+    self.plot.setBackground(None)
+    self.plot.setMouseEnabled(x=False, y=False)
+    self.current_point = pg.ScatterPlotItem(
+      pen=pg.mkPen(color=(0,0,0), width=2),
+      brush=pg.mkBrush(color=(0,0,160)),
+      symbol='o', size=12,
+      )
+
+  def make_item_layout(self):
+    self.item_layout = {"Climb Dist.":(0, 0), "Climb Asc.":(0, 1), "Climb Slope":(0, 2), "Climb Cat.":(0, 3)}
+
+  def add_extra(self):
+    self.layout.addWidget(self.plot, 1, 0, 2, 4)
+
+  def set_border(self):
+    self.max_height = 1
+    self.max_width = 3
+
+  def set_font_size(self, length):
+    self.font_size = int(length / 7)
+    self.set_minimum_size()
+
+  def update_extra(self):
+    gps_values = self.snapshot['GPS']
+    course_index = gps_values['course_index']
+    #read the course each time (it is replaced when background loading is done)
+    self.course = self.logger.course
+    c = self.course.get_climb(course_index)
+    if c != self.pre_climb:
+      self.pre_climb = c
+      self.draw_climb(c)
+    if c < 0:
+      return
+
+    s = self.course.climbs[c]['start']
+    e = self.course.climbs[c]['end']
+    if s <= course_index <= e:
+      x = gps_values['course_distance']/1000
+      self.current_point.setData([x], [self.course.altitude[course_index]])
+      self.plot.setXRange(min(x, self.course.distance[e]), self.course.distance[e], padding=0)
+    else:
+      self.current_point.setData([], [])
+
+  def draw_climb(self, c):
+    self.plot.clear()
+    if c < 0:
+      return
+    s = self.course.climbs[c]['start']
+    e = self.course.climbs[c]['end']
+    self.plot.addItem(
+      pg.CourseProfileGraphItem(
+        x=self.course.distance[s:e+1],
+        y=self.course.altitude[s:e+1],
+        brushes=self.course.colored_altitude[s:e+1],
+        pen=pg.mkPen(color=(255,255,255,0), width=0.01)) #transparent(alpha=0) and thin line
+      )
+    self.plot.addItem(self.current_point)
+    self.plot.setXRange(self.course.distance[s], self.course.distance[e], padding=0)
+    self.plot.setYRange(self.course.altitude[s], self.course.altitude[e], padding=0.05)
+
+
 class BaseMapWidget(ScreenWidget):
 
   #map button
@@ -122,6 +318,10 @@ class BaseMapWidget(ScreenWidget):
   location = []
   point_color = {'fix':None, 'lost':None}
 
+  #ghost point
+  ghost_point = None
+  ghost_plotted = False
+
   #show range from zoom
   zoom = 2000 #[m] #for CourseProfileGraphWidget
   zoomlevel = 13 #for SimpleMapWidget
@@ -146,7 +346,7 @@ class BaseMapWidget(ScreenWidget):
   move_factor = 1.0
 
   def init_extra(self):
-    self.gps_values = self.config.logger.sensor.values['GPS']
+    self.gps_values = self.sensor.snapshot['GPS']
     self.gps_sensor = self.config.logger.sensor.sensor_gps
     
     self.signal_move_x_plus.connect(self.move_x_plus)
@@ -178,6 +378,10 @@ class BaseMapWidget(ScreenWidget):
       'pen': {'color': 'w', 'width': 3},
       'brush':self.point_color['lost']
       }
+
+    #ghost point (previous ride)
+    self.ghost_point = pg.ScatterPlotItem(pxMode=True)
+    self.ghost_point.setZValue(1)
     
     #self.plot.setMouseEnabled(x=False, y=False)
     #pg.setConfigOptions(antialias=True)
@@ -218,6 +422,20 @@ class BaseMapWidget(ScreenWidget):
   def add_extra(self):
     pass
 
+  def draw_ghost(self, x, y):
+    if np.isnan(x) or np.isnan(y):
+      self.ghost_point.setData([])
+      return
+    self.ghost_point.setData([{
+      'pos': [x, y],
+      'size': 15,
+      'pen': {'color': 'w', 'width': 2},
+      'brush': pg.mkBrush(color=(255,64,0,160)),
+      }])
+    if not self.ghost_plotted:
+      self.plot.addItem(self.ghost_point)
+      self.ghost_plotted = True
+
   #override disable
   def set_minimum_size(self):
     pass
@@ -373,6 +591,8 @@ class CourseProfileGraphWidget(BaseMapWidget):
     if len(self.config.logger.course.distance) == 0 or len(self.config.logger.course.altitude) == 0:
       return
 
+    self.gps_values = self.sensor.snapshot['GPS']
+
     if not self.course_loaded:
       self.load_course()
       self.course_loaded = True
@@ -450,6 +670,13 @@ class CourseProfileGraphWidget(BaseMapWidget):
       self.current_point.setData(self.location)
       self.plot.addItem(self.current_point)
 
+    #ghost
+    ghost_x = self.gps_values['ghost_distance']/1000
+    self.draw_ghost(
+      ghost_x,
+      np.interp(ghost_x, self.config.logger.course.distance, self.config.logger.course.altitude),
+      )
+
     #positioning
     self.plot.setXRange(min=self.map_pos['x'], max=x_end, padding=0)
     y_min = float('inf')
@@ -673,6 +900,7 @@ class SimpleMapWidget(BaseMapWidget):
   def update_extra(self):
 
     #t = datetime.datetime.utcnow()
+    self.gps_values = self.sensor.snapshot['GPS']
 
     #display current position
     if len(self.location) > 0 :
@@ -769,6 +997,9 @@ class SimpleMapWidget(BaseMapWidget):
     self.location.append(self.point)
     self.current_point.setData(self.location)
     self.plot.addItem(self.current_point)
+
+    #ghost
+    self.draw_ghost(self.gps_values['ghost_lon'], self.get_mod_lat(self.gps_values['ghost_lat']))
     
     #center point
     if not self.lock_status:
@@ -802,7 +1033,11 @@ class SimpleMapWidget(BaseMapWidget):
     #print("\tpyqt_graph : update_extra map : ", (datetime.datetime.utcnow()-t).total_seconds(), "sec")
     #t = datetime.datetime.utcnow()
 
-    if not self.course_loaded:
+    #course is published by the background loader of logger_core
+    if not self.course_loaded and self.config.logger.course_ready.is_set():
+      if self.cuesheet_widget == None:
+        self.init_cuesheet()
+        self.resizeEvent(None)
       self.load_course()
       self.course_loaded = True
     
@@ -161,7 +161,7 @@ class AltitudeGraphWidget(ScreenWidget):
 
   def update_extra(self):
    
-    v = self.config.logger.sensor.values['integrated']
+    v = self.snapshot['integrated']
     all_nan = {'altitude_graph': True, 'altitude_kf_graph': True}
     for key in all_nan.keys():
       chk = np.isnan(v[key])
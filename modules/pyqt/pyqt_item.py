@@ -77,6 +77,7 @@ class Item(QtWidgets.QVBoxLayout):
     elif "DIST" in self.name: self.value.setText(self.itemformat.format(value/1000)) #m to km
     elif "Work" in self.name: self.value.setText(self.itemformat.format(value/1000)) #j to kj
     elif "WRK" in self.name: self.value.setText(self.itemformat.format(value/1000)) #j to kj
+    elif "W'bal" in self.name: self.value.setText(self.itemformat.format(value/1000)) #j to kj
     elif ("Grade" in self.name or "Glide" in self.name) and self.config.G_STOPWATCH_STATUS != "START":
         self.value.setText("-")
     elif self.itemformat == "timer":
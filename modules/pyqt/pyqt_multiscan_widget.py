@@ -50,6 +50,7 @@ class MultiScanWidget(ScreenWidget):
     self.timer.stop()
 
   def update_display(self):
+    self.snapshot = self.sensor.snapshot
     #update multi device value
     now_time = datetime.datetime.now()
     self.reset_values()
@@ -20,6 +20,7 @@ class ScreenWidget(QtWidgets.QWidget):
   config = None
   logger = None
   sensor = None
+  snapshot = None
   onoff = True
   items = None
   item_layout = None
@@ -151,7 +152,9 @@ class ScreenWidget(QtWidgets.QWidget):
   def update_display(self):
     if self.items is None:
       return
-      
+    
+    #items and update_extra use the same snapshot of sensor values
+    self.snapshot = self.sensor.snapshot
     for item in self.items:
       #item.update_value(eval(self.config.gui.gui_config.[item.name][1]))
       try:
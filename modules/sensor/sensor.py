@@ -1,5 +1,20 @@
 import time
 import datetime
+import threading
+
+
+class SensorRecord():
+  #copy of values published by a producer thread. never modified after publishing
+  __slots__ = ('seq', 'values')
+
+  def __init__(self, seq, values):
+    self.seq = seq
+    #copy containers (numpy arrays, lists, dicts) which are modified in place by producers
+    self.values = {k: (v.copy() if hasattr(v, 'copy') else v) for k, v in values.items()}
+
+  def __getitem__(self, key):
+    return self.values[key]
+
 
 class Sensor():
   config = None
@@ -10,10 +25,20 @@ class Sensor():
   wait_time = 1.0
   actual_loop_interval = None
 
+  #shared by all sensors. integrate thread of sensor_core waits for new values with this
+  update_condition = threading.Condition()
+  update_count = 0
+
+  #latest SensorRecord. readers get a consistent copy with one reference read
+  snapshot = None
+  snapshot_seq = 0
+
   def __init__(self, config, values):
     self.config = config
     self.values = values
     self.sensor_init()
+    if self.values is not None:
+      self.publish()
 
   def sensor_init(self):
     pass
@@ -27,6 +52,25 @@ class Sensor():
   def reset(self):
     pass
 
+  def publish(self):
+    #call from the producer thread after all values are updated
+    self.snapshot_seq += 1
+    self.snapshot = SensorRecord(self.snapshot_seq, self.values)
+    self.notify_update()
+
+  @staticmethod
+  def notify_update():
+    with Sensor.update_condition:
+      Sensor.update_count += 1
+      Sensor.update_condition.notify_all()
+
+  @staticmethod
+  def wait_update(count, timeout):
+    #return as soon as update_count differs from count (includes updates while not waiting)
+    with Sensor.update_condition:
+      Sensor.update_condition.wait_for(lambda: Sensor.update_count != count, timeout)
+      return Sensor.update_count
+
   def sleep(self):
     time.sleep(self.wait_time)
     self.start_time = datetime.datetime.now()
@@ -43,6 +43,9 @@ class SensorANT(Sensor):
   DEVICE_ALL = 0
   scanner = None
   device = {}
+  #incremented when ANT+ sensors are paired or unpaired (G_ANT['USE'], G_ANT['ID_TYPE']).
+  #sensor_core selects value dicts again with this
+  pairing_count = 0
 
   def sensor_init(self):
    
@@ -95,6 +98,7 @@ class SensorANT(Sensor):
         'CDC': 0x79, #same as SPD
         'PWR': 0x0B,
       }
+      SensorANT.pairing_count += 1
       ac = self.config.G_ANT['ID_TYPE']
       self.values[ac['HR']] = {}
       self.values[ac['SPD']] = {'distance':0}
@@ -174,12 +178,14 @@ class SensorANT(Sensor):
 
     #existing connection 
     if connectStatus:
+      SensorANT.pairing_count += 1
       return
 
     #recconect
     if antIDType in self.device:
       self.device[antIDType].connect(isCheck=False, isChange=False) #USE: True -> True)
       self.device[antIDType].ant_state = 'connectAntSensor'
+      SensorANT.pairing_count += 1
       return
    
     #newly connect
@@ -206,6 +212,7 @@ class SensorANT(Sensor):
       self.device[antIDType] \
         = ANT_Device_CTRL(self.node, self.config, self.values[antIDType], antName)
     self.device[antIDType].ant_state = 'connectAntSensor'
+    SensorANT.pairing_count += 1
 
   def disconnectAntSensor(self, antName):
     antIDType = self.config.G_ANT['ID_TYPE'][antName]
@@ -222,6 +229,7 @@ class SensorANT(Sensor):
       self.config.G_ANT['ID'][k] = 0
       self.config.G_ANT['TYPE'][k] = 0
       self.config.G_ANT['USE'][k] = False
+    SensorANT.pairing_count += 1
 
   def continuousScan(self):
     if not _SENSOR_ANT:
@@ -292,6 +300,8 @@ class ANT_Device():
     'cadence': 255, #rpm
   }
   ant_idle_interval = {'NORMAL':0.20, 'QUICK':0.01, 'SCAN': 0.20}
+  #wake integrate thread of sensor_core on new data
+  notify_integrate = False
 
   def __init__(self, node=None, config=None, values={}, name=''):
     self.node = node
@@ -340,9 +350,16 @@ class ANT_Device():
     if _SENSOR_ANT and self.channel == None:
       self.channel = self.node.new_channel(c_type, ext_assign=ext_assign)
       print(self.name, ': channel_num: ', self.channel.id)
-      self.channel.on_broadcast_data = self.on_data
-      self.channel.on_burst_data = self.on_data
-      self.channel.on_acknowledge_data = self.on_data
+      on_data = self.on_data
+      if self.notify_integrate:
+        on_data = self.on_data_and_notify
+      self.channel.on_broadcast_data = on_data
+      self.channel.on_burst_data = on_data
+      self.channel.on_acknowledge_data = on_data
+
+  def on_data_and_notify(self, data):
+    self.on_data(data)
+    Sensor.notify_update()
 
   def channel_set_id(self): #for slave
     self.channel.set_id(self.config.G_ANT['ID'][self.name], self.ant_config['type'], self.ant_config['transmission_type'])
@@ -371,11 +388,11 @@ class ANT_Device():
     if isCheck:
       if not self.config.G_ANT['USE'][self.name]: return
     if self.stateCheck('OPEN'):
-      if isChange: self.config.G_ANT['USE'][self.name] = True
+      if isChange: self.set_use(True)
       return
     try:
       self.channel.open()
-      if isChange: self.config.G_ANT['USE'][self.name] = True
+      if isChange: self.set_use(True)
     except:
       pass
 
@@ -384,15 +401,19 @@ class ANT_Device():
     if isCheck:
       if not self.config.G_ANT['USE'][self.name]: return
     if self.stateCheck('CLOSE'):
-      if isChange: self.config.G_ANT['USE'][self.name] = False
+      if isChange: self.set_use(False)
       return
     try:
       self.close_extra()
       self.channel.close()
       time.sleep(wait)
-      if isChange: self.config.G_ANT['USE'][self.name] = False
+      if isChange: self.set_use(False)
     except:
       pass
+
+  def set_use(self, use):
+    self.config.G_ANT['USE'][self.name] = use
+    SensorANT.pairing_count += 1
   
   def delete(self):
     self.node.delete_channel()
@@ -466,6 +487,7 @@ class ANT_Device_HeartRate(ANT_Device):
     'transmission_type':0x00,
     'channel_type':0x00, #Channel.Type.BIDIRECTIONAL_RECEIVE,
     }
+  notify_integrate = True
   elements = ('hr',)
   pickle_key = "ant+_hr_values"
 
@@ -493,6 +515,7 @@ class ANT_Device_Speed_Cadence(ANT_Device):
     'transmission_type':0x00,
     'channel_type':0x00, #Channel.Type.BIDIRECTIONAL_RECEIVE,
     }
+  notify_integrate = True
   sc_values  = [] #cad_time, cad, speed_time, speed
   pre_values = [] #cad_time, cad, speed_time, speed
   delta      = [] #cad_time, cad, speed_time, speed
@@ -584,6 +607,7 @@ class ANT_Device_Cadence(ANT_Device):
     'transmission_type':0x00,
     'channel_type':0x00, #Channel.Type.BIDIRECTIONAL_RECEIVE,
     }
+  notify_integrate = True
   sc_values  = [] #time, value
   pre_values = []
   delta      = []
@@ -708,6 +732,7 @@ class ANT_Device_Power(ANT_Device):
     'transmission_type':0x00,
     'channel_type':0x00, #Channel.Type.BIDIRECTIONAL_RECEIVE,
     }
+  notify_integrate = True
   pre_values = {0x10:[], 0x11:[], 0x12:[], 0x13:[]}
   power_values = {0x10:[], 0x11:[], 0x12:[], 0x13:[]}
   elements = {
@@ -107,6 +107,10 @@ class SensorGPS(Sensor):
     self.values['course_distance'] = 0
     self.values['on_course_status'] = False
     self.course_index_check = [True]*self.course_index_check_window_size
+    self.values['ghost_time_diff'] = np.nan
+    self.values['ghost_distance'] = np.nan
+    self.values['ghost_lat'] = np.nan
+    self.values['ghost_lon'] = np.nan
 
   def quit(self):
     if _SENSOR_GPS_GPSD:
@@ -182,9 +186,11 @@ class SensorGPS(Sensor):
       #calculate course_index separately
       #t2 = datetime.datetime.utcnow()
       self.get_course_index()
+      self.get_ghost()
       #print("get_course_index: ", (datetime.datetime.utcnow()-t2).total_seconds(), "sec")
 
       self.values['timestamp'] = datetime.datetime.now()
+      self.publish()
       self.get_sleep_time(self.config.G_GPS_INTERVAL)
 
   def update(self):
@@ -207,6 +213,7 @@ class SensorGPS(Sensor):
           )
         self.get_satellites(self.gps_datastream.SKY['satellites'])
         self.get_utc_time(g['time'])
+        self.publish()
       self.get_sleep_time(self.config.G_GPS_INTERVAL)
 
   #experimental code
@@ -243,6 +250,7 @@ class SensorGPS(Sensor):
         )
         self.get_satellites_adafruit(g.sats)
         self.get_utc_time(time.strftime("%Y/%m/%d %H:%M:%S +0000", g.timestamp_utc))
+        self.publish()
       self.get_sleep_time(self.config.G_GPS_INTERVAL)
 
   def update_i2c(self):
@@ -278,6 +286,7 @@ class SensorGPS(Sensor):
           self.values['used_sats_str'] = str(g.data['num_sats'])
           self.values['used_sats'] = g.data['num_sats']
         self.get_utc_time(timestamp)
+        self.publish()
       self.get_sleep_time(self.config.G_GPS_INTERVAL)
 
   def init_GPS_values(self):
@@ -362,6 +371,7 @@ class SensorGPS(Sensor):
     #course_index
     #t2 = datetime.datetime.utcnow()
     self.get_course_index()
+    self.get_ghost()
     #print("get_course_index: ", (datetime.datetime.utcnow()-t2).total_seconds(), "sec")
 
     #modify altitude with course
@@ -468,27 +478,29 @@ class SensorGPS(Sensor):
     if self.config.G_IS_RASPI and self.config.G_STOPWATCH_STATUS != "START":
       return
     
-    course_n = len(self.config.logger.course.longitude)
+    #course may be replaced by background loading, so use the same course in this search
+    course = self.config.logger.course
+    course_n = len(course.longitude)
     if course_n == 0:
       return
     
     #search with numpy
-    forward_search_index = self.get_index_with_distance_cutoff(start, self.config.G_GPS_SEARCH_RANGE)
-    backword_serach_index = self.get_index_with_distance_cutoff(start, -self.config.G_GPS_SEARCH_RANGE)
+    forward_search_index = self.get_index_with_distance_cutoff(start, self.config.G_GPS_SEARCH_RANGE, course)
+    backword_serach_index = self.get_index_with_distance_cutoff(start, -self.config.G_GPS_SEARCH_RANGE, course)
     
-    b_a_x = self.config.logger.course.points_diff[0]
-    b_a_y = self.config.logger.course.points_diff[1]
-    lon_diff = self.values['lon'] - self.config.logger.course.longitude
-    lat_diff = self.values['lat'] - self.config.logger.course.latitude
+    b_a_x = course.points_diff[0]
+    b_a_y = course.points_diff[1]
+    lon_diff = self.values['lon'] - course.longitude
+    lat_diff = self.values['lat'] - course.latitude
     p_a_x = lon_diff[0:-1]
     p_a_y = lat_diff[0:-1]
     p_b_x = lon_diff[1:]
     p_b_y = lat_diff[1:]
-    inner_p = (b_a_x*p_a_x + b_a_y*p_a_y)/self.config.logger.course.points_diff_sum_of_squares
+    inner_p = (b_a_x*p_a_x + b_a_y*p_a_y)/course.points_diff_sum_of_squares
 
-    azimuth_diff = np.full(len(self.config.logger.course.azimuth), np.nan)
+    azimuth_diff = np.full(len(course.azimuth), np.nan)
     if not np.isnan(self.values['track']):
-      azimuth_diff = (self.values['track'] - self.config.logger.course.azimuth) % 360
+      azimuth_diff = (self.values['track'] - course.azimuth) % 360
 
     dist_diff = np.where(
       inner_p <= 0.0,
@@ -498,7 +510,7 @@ class SensorGPS(Sensor):
         np.sqrt(p_b_x**2 + p_b_y**2),
         np.abs(
           b_a_x*p_a_y - b_a_y*p_a_x
-          )/self.config.logger.course.points_diff_dist
+          )/course.points_diff_dist
         )
       )
 
@@ -543,24 +555,24 @@ class SensorGPS(Sensor):
       
       if m == 0 and inner_p[0] <= 0.0:
         print("before start of course:", start, "->", m)
-        print("\t", self.values['lon'],self.values['lat'],"/", self.config.logger.course.longitude[m], self.config.logger.course.longitude[m])
+        print("\t", self.values['lon'],self.values['lat'],"/", course.longitude[m], course.longitude[m])
         self.values['on_course_status'] = False
         self.values['course_distance'] = 0
         self.values['course_index'] =  m
         return
       elif m == len(dist_diff)-1 and inner_p[-1] >= 1.0:
         print("after end of course", start, "->", m)
-        print("\t", self.values['lon'],self.values['lat'],"/", self.config.logger.course.longitude[m], self.config.logger.course.longitude[m])
+        print("\t", self.values['lon'],self.values['lat'],"/", course.longitude[m], course.longitude[m])
         self.values['on_course_status'] = False
         m = course_n-1
-        self.values['course_distance'] = self.config.logger.course.distance[-1]*1000
+        self.values['course_distance'] = course.distance[-1]*1000
         self.values['course_index'] =  m
         return
       
-      h_lon = self.config.logger.course.longitude[m] + \
-        (self.config.logger.course.longitude[m+1]-self.config.logger.course.longitude[m]) * inner_p[m]
-      h_lat = self.config.logger.course.latitude[m] + \
-        (self.config.logger.course.latitude[m+1]-self.config.logger.course.latitude[m]) * inner_p[m]
+      h_lon = course.longitude[m] + \
+        (course.longitude[m+1]-course.longitude[m]) * inner_p[m]
+      h_lat = course.latitude[m] + \
+        (course.latitude[m+1]-course.latitude[m]) * inner_p[m]
       dist_diff_h = self.config.get_dist_on_earth(
         h_lon, 
         h_lat,
@@ -583,58 +595,78 @@ class SensorGPS(Sensor):
 
         self.values['on_course_status'] = True
         dist_diff_course = self.config.get_dist_on_earth(
-          self.config.logger.course.longitude[m],
-          self.config.logger.course.latitude[m],
+          course.longitude[m],
+          course.latitude[m],
           self.values['lon'], 
           self.values['lat']
           )
         self.values['course_distance'] = \
-          self.config.logger.course.distance[m]*1000 + dist_diff_course
+          course.distance[m]*1000 + dist_diff_course
           
         #print("search: ", (datetime.datetime.utcnow()-t).total_seconds(), "sec, index:", m)
         
         self.values['course_index'] =  m
 
-        if len(self.config.logger.course.point_distance) > 0:
-          cp_m = np.abs(self.config.logger.course.point_distance - self.values['course_distance']/1000).argmin()
-          if (self.config.logger.course.point_distance[cp_m] < self.values['course_distance']/1000):
+        if len(course.point_distance) > 0:
+          cp_m = np.abs(course.point_distance - self.values['course_distance']/1000).argmin()
+          if (course.point_distance[cp_m] < self.values['course_distance']/1000):
             cp_m += 1
-          if cp_m >= len(self.config.logger.course.point_distance):
-            cp_m = len(self.config.logger.course.point_distance)-1
+          if cp_m >= len(course.point_distance):
+            cp_m = len(course.point_distance)-1
           self.values['course_point_index'] =  cp_m
           #print(self.values['course_distance']/1000, cp_m)
           #print("course_point_index:", self.values['course_point_index'])
         
         if i > 0:
           print(s_state[i], start, "->", m)
-          print("\t", self.values['lon'],self.values['lat'],"/", self.config.logger.course.longitude[m], self.config.logger.course.longitude[m])
+          print("\t", self.values['lon'],self.values['lat'],"/", course.longitude[m], course.longitude[m])
           print("\t", "azimuth_diff:", azimuth_diff[m])
         
         return
 
     #print("no result:", start)
     self.values['on_course_status'] = False
-    #self.values['course_distance'] = self.config.logger.course.distance[start]*1000
+    #self.values['course_distance'] = course.distance[start]*1000
 
-  def get_index_with_distance_cutoff(self, start, search_range):
-    if self.config.logger == None or len(self.config.logger.course.distance) == 0:
+  def get_ghost(self):
+    #time gap and position of the ghost from course_index and timer
+    if self.config.logger == None:
+      return
+    ghost = self.config.logger.ghost
+    if not ghost.is_loaded(self.config.logger.course):
+      return
+    timer = self.config.logger.values['count']
+    self.values['ghost_time_diff'] = np.nan
+    if self.values['on_course_status']:
+      self.values['ghost_time_diff'] = ghost.get_time_diff(
+        self.values['course_index'], self.values['course_distance'], timer
+        )
+    self.values['ghost_distance'], self.values['ghost_lat'], self.values['ghost_lon'] = \
+      ghost.get_position(timer)
+
+  def get_index_with_distance_cutoff(self, start, search_range, course=None):
+    if course == None:
+      if self.config.logger == None:
+        return 0
+      course = self.config.logger.course
+    if len(course.distance) == 0:
       return 0
 
-    dist_to = self.config.logger.course.distance[start] + search_range
+    dist_to = course.distance[start] + search_range
     #print("----get_index_with_distance_cutoff------")  
-    #print("start:", start, "course_distance[start]:", self.config.logger.course.distance[start], "search_range:", search_range)
-    #print("dist_to:", dist_to, "dist[-1]:", self.config.logger.course.distance[-1])
+    #print("start:", start, "course_distance[start]:", course.distance[start], "search_range:", search_range)
+    #print("dist_to:", dist_to, "dist[-1]:", course.distance[-1])
     #print("----------------------------------------")  
-    if dist_to >= self.config.logger.course.distance[-1]:
-      return len(self.config.logger.course.distance) - 1
+    if dist_to >= course.distance[-1]:
+      return len(course.distance) - 1
     elif dist_to <= 0:
       return 0
 
     min_index = 0
     if search_range > 0:
-      min_index = start + np.abs((self.config.logger.course.distance[start:] - dist_to)).argmin()
+      min_index = start + np.abs((course.distance[start:] - dist_to)).argmin()
     elif search_range < 0:
-      min_index = np.abs((self.config.logger.course.distance[0:start] - dist_to)).argmin()
+      min_index = np.abs((course.distance[0:start] - dist_to)).argmin()
 
     return min_index
 
@@ -318,6 +318,7 @@ class SensorI2C(Sensor):
     while(not self.config.G_QUIT):
       self.sleep()
       self.update()
+      self.publish()
       self.get_sleep_time(self.config.G_I2C_INTERVAL)
   
   def update(self):
@@ -13,6 +13,7 @@ try:
 except:
   pass
 
+from .sensor.sensor import Sensor, SensorRecord
 from .sensor.sensor_gps import SensorGPS
 from .sensor.sensor_ant import SensorANT
 from .sensor.sensor_gpio import SensorGPIO
@@ -22,6 +23,34 @@ from .sensor.sensor_spi import SensorSPI
 #Todo: BLE
 
 
+def nansum(l):
+  s = 0.0
+  for x in l:
+    if x == x:
+      s += x
+  return s
+
+
+class SensorSnapshot():
+  #integrated values and the GPS/I2C records used for them
+  __slots__ = ('seq', 'integrated', 'GPS', 'I2C')
+
+  def __init__(self, seq, integrated, gps, i2c):
+    self.seq = seq
+    self.integrated = integrated
+    self.GPS = gps
+    self.I2C = i2c
+
+  def __getitem__(self, key):
+    if key == 'integrated':
+      return self.integrated.values
+    elif key == 'GPS':
+      return self.GPS.values
+    elif key == 'I2C':
+      return self.I2C.values
+    raise KeyError(key)
+
+
 class SensorCore():
 
   config = None
@@ -55,6 +84,9 @@ class SensorCore():
     'dst_diff_spd',
     ]
   lp = 4
+  #latest SensorSnapshot (published by integrate thread)
+  snapshot = None
+  snapshot_seq = 0
 
   def __init__(self, config):
     self.config = config
@@ -90,6 +122,7 @@ class SensorCore():
     self.sensor_gpio = SensorGPIO(config, None)
     time_profile.append(datetime.datetime.now()) #for time profile
     
+    self.publish()
     self.thread_integrate = threading.Thread(target=self.integrate, name="thread_integrate", args=())
     time_profile.append(datetime.datetime.now()) #for time profile
     self.start()
@@ -108,243 +141,279 @@ class SensorCore():
     self.thread_i2c.start()
     self.thread_integrate.start()
 
+  def set_ant_dispatch(self):
+    #select ANT+ value dicts when sensors are paired (SensorANT.pairing_count), not at every tick of integrate
+    self.ant_pairing_count = self.sensor_ant.pairing_count
+    ant = self.config.G_ANT
+    use = {}
+    src = {'HR':None, 'SPD':None, 'CDC':(), 'PWR':()}
+    for key in src:
+      use[key] = ant['USE'][key]
+      if not use[key] or ant['ID_TYPE'][key] not in self.values['ANT+']:
+        continue
+      v = self.values['ANT+'][ant['ID_TYPE'][key]]
+      if key == 'HR':
+        src[key] = v
+      #speed from speed or speed&cadence sensor, or powermeter(wheel)
+      elif key == 'SPD':
+        if ant['TYPE'][key] in [0x79, 0x7B]:
+          src[key] = v
+        elif ant['TYPE'][key] == 0x0B:
+          src[key] = v.get(0x11)
+      #cadence from cadence or speed&cadence sensor, or powermeter
+      elif key == 'CDC':
+        if ant['TYPE'][key] in [0x79, 0x7A]:
+          src[key] = (v,)
+        elif ant['TYPE'][key] == 0x0B:
+          src[key] = tuple(v[page] for page in [0x12, 0x10] if page in v)
+      #power: page18 > 17 > 16, 16simple is not used
+      elif key == 'PWR':
+        src[key] = tuple(v[page] for page in [0x12, 0x11, 0x10] if page in v)
+    self.ant_use = use
+    self.ant_src = src
+
   def integrate(self):
-    pre_dst = {'ANT+':0, 'GPS': 0} 
-    pre_ttlwork = {'ANT+':0}
-    pre_alt = {'ANT+':np.nan, 'GPS': np.nan}
-    pre_alt_spd = {'ANT+':np.nan}
-    pre_grade = pre_grade_spd = pre_glide = self.config.G_ANT_NULLVALUE
-    diff_sum = {'alt_diff':0, 'dst_diff':0, 'alt_diff_spd':0, 'dst_diff_spd':0}
-    #alias for self.values
-    v = {'GPS':self.values['GPS'], 'I2C':self.values['I2C']}
+    null = self.config.G_ANT_NULLVALUE
+    threshold = {}
+    for key in self.threshold:
+      threshold[key] = datetime.timedelta(seconds=self.threshold[key])
+    gws = self.grade_window_size
+    never = datetime.datetime.min
+    pre_dst_ant = pre_dst_gps = 0
+    pre_ttlwork = 0
+    pre_alt_ant = pre_alt_gps = pre_alt_spd = np.nan
+    pre_grade = pre_grade_spd = pre_glide = null
+    #alias for self.values (gps and i2c are the records of each tick)
+    integrated = self.values['integrated']
+    self.set_ant_dispatch()
     #loop control
-    self.wait_time = self.config.G_SENSOR_INTERVAL
-    self.actual_loop_interval = self.config.G_SENSOR_INTERVAL
-    time_profile = [None,]
+    #  values are integrated as soon as GPS/ANT+/I2C publish new ones (at most every G_SENSOR_MIN_INTERVAL),
+    #  grade and graphs are updated at every G_SENSOR_INTERVAL (periodic tick)
+    interval = self.config.G_SENSOR_INTERVAL
+    update_count = 0
+    pre_time = time.monotonic()
+    next_time = pre_time + interval
+    self.actual_loop_interval = interval
+    #distance diffs accumulated until the next periodic tick
+    dst_grade_ant = dst_grade_gps = dst_grade_use = dst_spd = 0
+    grade_use_ant = grade_use_gps = False
     
     #if True:
     while(not self.config.G_QUIT):
-      time.sleep(self.wait_time)
-      start_time = datetime.datetime.now()
-      #print(start_time)
+      update_count = Sensor.wait_update(update_count, max(0, next_time - time.monotonic()))
+      #merge a burst of updates
+      t = time.monotonic()
+      if t - pre_time < self.config.G_SENSOR_MIN_INTERVAL and t < next_time:
+        time.sleep(min(self.config.G_SENSOR_MIN_INTERVAL - (t - pre_time), next_time - t))
+        t = time.monotonic()
+      self.actual_loop_interval = t - pre_time
+      pre_time = t
+      periodic = (t >= next_time - 0.001)
+      if periodic:
+        next_time += interval
+        #too long loop
+        if next_time <= t:
+          next_time = t + interval
 
-      time_profile = [start_time,]
-      hr = spd = cdc = pwr = self.config.G_ANT_NULLVALUE
-      grade = grade_spd = glide = self.config.G_ANT_NULLVALUE
+      #GPS/I2C records of this tick (integrated values and the snapshot use the same ones)
+      gps_record = self.sensor_gps.snapshot
+      i2c_record = self.sensor_i2c.snapshot
+      gps = gps_record.values
+      i2c = i2c_record.values
+
+      hr = spd = cdc = pwr = null
+      grade = grade_spd = glide = null
       ttlwork_diff = 0
-      dst_diff = {'ANT+':0, 'GPS': 0, 'USE': 0}
-      alt_diff = {'ANT+':0, 'GPS': 0, 'USE': 0}
-      dst_diff_spd = {'ANT+':0}
-      alt_diff_spd = {'ANT+':0}
-      grade_use = {'ANT+': False, 'GPS': False}
-      time_profile.append(datetime.datetime.now())
+      dst_ant = dst_gps = dst_use = 0
       #self.sensor_i2c.update()
       #self.sensor_gps.update()
-      self.sensor_ant.update() #for dummy
+      if periodic:
+        self.sensor_ant.update() #for dummy
+
+      #ANT+ ID update
+      if self.ant_pairing_count != self.sensor_ant.pairing_count:
+        self.set_ant_dispatch()
+      use = self.ant_use
+      src = self.ant_src
 
       now_time = datetime.datetime.now()
-      time_profile.append(now_time)
-
-      ant_id_type = self.config.G_ANT['ID_TYPE']
-      delta = {'PWR':{0x10:float("inf"), 0x11:float("inf"), 0x12:float("inf")}}
-      for key in ['HR','SPD','CDC','GPS']:
-        delta[key] = float("inf")
-      #need for ANT+ ID update
-      for key in ['HR','SPD','CDC','PWR']:
-        if self.config.G_ANT['USE'][key] and ant_id_type[key] in self.values['ANT+']:
-          v[key] = self.values['ANT+'][ant_id_type[key]]
-
-      #make intervals from timestamp
-      for key in ['HR','SPD','CDC']:
-        if not self.config.G_ANT['USE'][key]: continue
-        if 'timestamp' in v[key]:
-          delta[key] = (now_time - v[key]['timestamp']).total_seconds()
-        #override:
-        #cadence from power
-        if self.config.G_ANT['TYPE'][key] == 0x0B and key == 'CDC':
-          for page in [0x12,0x10]:
-            if not 'timestamp' in v[key][page]: continue
-            delta[key] = (now_time - v[key][page]['timestamp']).total_seconds()
-            break
-        #speed from power
-        elif self.config.G_ANT['TYPE'][key] == 0x0B and key == 'SPD':
-          if not 'timestamp' in v[key][0x11]: continue
-          delta[key] = (now_time - v[key][0x11]['timestamp']).total_seconds()
-      #timestamp(power)
-      if self.config.G_ANT['USE']['PWR']:
-        for page in [0x12,0x11,0x10]:
-          if not 'timestamp' in v['PWR'][page]: continue
-          delta['PWR'][page] = (now_time - v['PWR'][page]['timestamp']).total_seconds()
-      if 'timestamp' in v['GPS']:
-        delta['GPS'] = (now_time - v['GPS']['timestamp']).total_seconds()
+      gps_timestamp = gps.get('timestamp')
       
       #HeartRate : ANT+
-      if self.config.G_ANT['USE']['HR']:
-        if delta['HR'] < self.threshold['HR']:
-          hr = v['HR']['hr']
+      if use['HR']:
+        v = src['HR']
+        if v is not None and v.get('timestamp', never) > now_time - threshold['HR']:
+          hr = v['hr']
         
       #Cadence : ANT+
-      if self.config.G_ANT['USE']['CDC']:
+      if use['CDC']:
         cdc = 0
-        #get from cadence or speed&cadence sensor
-        if self.config.G_ANT['TYPE']['CDC'] in [0x79, 0x7A]:
-          if delta['CDC'] < self.threshold['CDC']:
-            cdc = v['CDC']['cadence']
-        #get from powermeter
-        elif self.config.G_ANT['TYPE']['CDC'] == 0x0B:
-          for page in [0x12,0x10]:
-            if not 'timestamp' in v[key][page]: continue
-            if delta['CDC'] < self.threshold['CDC']:
-              cdc = v['CDC'][page]['cadence']
-              break
+        #get from cadence or speed&cadence sensor, or powermeter(page 18 > 16)
+        for v in src['CDC']:
+          if not 'timestamp' in v: continue
+          if v['timestamp'] > now_time - threshold['CDC']:
+            cdc = v['cadence']
+          break
 
       #Power : ANT+(assumed crank type > wheel type)
-      if self.config.G_ANT['USE']['PWR']:
+      if use['PWR']:
         pwr = 0
-        #page18 > 17 > 16, 16simple is not used
-        for page in [0x12,0x11,0x10]:
-          if delta['PWR'][page] < self.threshold['PWR']:
-            pwr = v['PWR'][page]['power']
+        for v in src['PWR']:
+          if v.get('timestamp', never) > now_time - threshold['PWR']:
+            pwr = v['power']
             break
      
       #Speed : ANT+(SPD&CDC, (PWR)) > GPS
-      if self.config.G_ANT['USE']['SPD']:
+      if use['SPD']:
         spd = 0
-        if self.config.G_ANT['TYPE']['SPD'] in [0x79, 0x7B]:
-          if delta['SPD'] < self.threshold['SPD']:
-            spd = v['SPD']['speed']
-        elif self.config.G_ANT['TYPE']['SPD'] == 0x0B:
-          if delta['SPD'] < self.threshold['SPD']:
-            spd = v['SPD'][0x11]['speed']
-      elif 'timestamp' in v['GPS']:
+        v = src['SPD']
+        if v is not None and v.get('timestamp', never) > now_time - threshold['SPD']:
+          spd = v['speed']
+      elif gps_timestamp is not None:
         spd = 0
-        if not np.isnan(v['GPS']['speed']) and delta['GPS'] < self.threshold['SPD']:
-          spd = v['GPS']['speed']
+        if not math.isnan(gps['speed']) and gps_timestamp > now_time - threshold['SPD']:
+          spd = gps['speed']
  
       #Distance: ANT+(SPD, (PWR)) > GPS
-      if self.config.G_ANT['USE']['SPD']:
-        #normal speed meter
-        if self.config.G_ANT['TYPE']['SPD'] in [0x79, 0x7B]:
-          if pre_dst['ANT+'] < v['SPD']['distance']:
-            dst_diff['ANT+'] = v['SPD']['distance'] - pre_dst['ANT+']
-          pre_dst['ANT+'] = v['SPD']['distance']
-        elif self.config.G_ANT['TYPE']['SPD'] == 0x0B:
-          if pre_dst['ANT+'] < v['SPD'][0x11]['distance']:
-            dst_diff['ANT+'] = v['SPD'][0x11]['distance'] - pre_dst['ANT+']
-          pre_dst['ANT+'] = v['SPD'][0x11]['distance']
-        dst_diff['USE'] = dst_diff['ANT+']
-        grade_use['ANT+'] = True
-      if 'timestamp' in v['GPS']:
-        if pre_dst['GPS'] < v['GPS']['distance']:
-          dst_diff['GPS'] = v['GPS']['distance'] - pre_dst['GPS']
-        pre_dst['GPS'] = v['GPS']['distance']
-        if not self.config.G_ANT['USE']['SPD'] and dst_diff['GPS'] > 0:
-          dst_diff['USE'] = dst_diff['GPS']
-          grade_use['GPS'] = True
+      if use['SPD']:
+        v = src['SPD']
+        if v is not None:
+          if pre_dst_ant < v['distance']:
+            dst_ant = v['distance'] - pre_dst_ant
+          pre_dst_ant = v['distance']
+        dst_use = dst_ant
+        grade_use_ant = True
+      if gps_timestamp is not None:
+        if pre_dst_gps < gps['distance']:
+          dst_gps = gps['distance'] - pre_dst_gps
+        pre_dst_gps = gps['distance']
+        if not use['SPD'] and dst_gps > 0:
+          dst_use = dst_gps
+          grade_use_gps = True
       
       #Total Power: ANT+
-      if self.config.G_ANT['USE']['PWR']:
+      if use['PWR']:
         #both type are not exist in same ID(0x12:crank, 0x11:wheel)
         # if 0x12 or 0x11 exists, never take 0x10
-        for page in [0x12,0x11,0x10]:
-          if 'timestamp' in v['PWR'][page]:
-            if pre_ttlwork['ANT+'] < v['PWR'][page]['accumulated_power']:
-              ttlwork_diff = v['PWR'][page]['accumulated_power'] - pre_ttlwork['ANT+']
-            pre_ttlwork['ANT+'] = v['PWR'][page]['accumulated_power']
+        for v in src['PWR']:
+          if 'timestamp' in v:
+            if pre_ttlwork < v['accumulated_power']:
+              ttlwork_diff = v['accumulated_power'] - pre_ttlwork
+            pre_ttlwork = v['accumulated_power']
             #never take other powermeter
             break
      
-      #altitude
-      #if not np.isnan(v['I2C']['altitude_kalman']):
-      if not np.isnan(v['I2C']['pre_altitude']):
-        #alt = v['I2C']['altitude_kalman']
-        #alt = round(v['I2C']['altitude_kalman'], 1)
-        alt = v['I2C']['altitude']
-        #for grade (distance base)
-        for key in ['ANT+', 'GPS']:
-          if dst_diff[key] > 0:
-            alt_diff[key] = alt - pre_alt[key]
-            pre_alt[key] = alt
-        if self.config.G_ANT['USE']['SPD']:
-          alt_diff['USE'] = alt_diff['ANT+']
-        elif not self.config.G_ANT['USE']['SPD'] and dst_diff['GPS'] > 0:
-          alt_diff['USE'] = alt_diff['GPS']
-        #for grade (speed base)
-        if self.config.G_ANT['USE']['SPD']:
-          alt_diff_spd['ANT+'] = alt - pre_alt_spd['ANT+']
-          pre_alt_spd['ANT+'] = alt
-      
-      #grade (distance base)
-      if dst_diff['USE'] > 0:
-        for key in ['alt_diff', 'dst_diff']:
-          self.values['integrated'][key][0:-1] = self.values['integrated'][key][1:]
-          self.values['integrated'][key][-1] = eval(key+"['USE']")
-          #diff_sum[key] = np.mean(self.values['integrated'][key][-self.grade_window_size:])
-          diff_sum[key] = np.nansum(self.values['integrated'][key][-self.grade_window_size:])
-        #set grade
-        gr = gl = self.config.G_ANT_NULLVALUE
-        gr = self.config.G_ANT_NULLVALUE
-        x = self.config.G_ANT_NULLVALUE
-        y = diff_sum['alt_diff']
-        if grade_use['ANT+']:
-          x = math.sqrt(abs(diff_sum['dst_diff']**2 - diff_sum['alt_diff']**2))
-        elif grade_use['GPS']:
-          x = diff_sum['dst_diff'] 
-        if x > 0:
-          #gr = int(round(100 * y / x))
-          gr = self.conv_grade(100 * y / x)
-        if y != 0.0:
-          gl = int(round(-1 * x / y))
-        grade = pre_grade = gr
-        glide = pre_glide = gl
-      #for sometimes ANT+ distance is 0 although status is running
-      elif dst_diff['USE'] == 0 and self.config.G_STOPWATCH_STATUS == "START":
+      dst_grade_ant += dst_ant
+      dst_grade_gps += dst_gps
+      dst_grade_use += dst_use
+      if use['SPD']:
+        dst_spd += spd * self.actual_loop_interval
+
+      #grade and graphs are updated with the values of the last interval
+      if not periodic:
         grade = pre_grade
+        grade_spd = pre_grade_spd
         glide = pre_glide
+      else:
+        alt_diff_ant = alt_diff_gps = alt_diff_use = alt_diff_spd = 0
+        #altitude
+        #if not np.isnan(i2c['altitude_kalman']):
+        if not math.isnan(i2c['pre_altitude']):
+          #alt = i2c['altitude_kalman']
+          #alt = round(i2c['altitude_kalman'], 1)
+          alt = i2c['altitude']
+          #for grade (distance base)
+          if dst_grade_ant > 0:
+            alt_diff_ant = alt - pre_alt_ant
+            pre_alt_ant = alt
+          if dst_grade_gps > 0:
+            alt_diff_gps = alt - pre_alt_gps
+            pre_alt_gps = alt
+          if use['SPD']:
+            alt_diff_use = alt_diff_ant
+          elif dst_grade_gps > 0:
+            alt_diff_use = alt_diff_gps
+          #for grade (speed base)
+          if use['SPD']:
+            alt_diff_spd = alt - pre_alt_spd
+            pre_alt_spd = alt
+      
+        #grade (distance base)
+        if dst_grade_use > 0:
+          w_alt = integrated['alt_diff']
+          w_dst = integrated['dst_diff']
+          w_alt[0:-1] = w_alt[1:]
+          w_alt[-1] = alt_diff_use
+          w_dst[0:-1] = w_dst[1:]
+          w_dst[-1] = dst_grade_use
+          #set grade
+          gr = gl = null
+          x = null
+          y = nansum(w_alt[-gws:])
+          if grade_use_ant:
+            x = math.sqrt(abs(nansum(w_dst[-gws:])**2 - y**2))
+          elif grade_use_gps:
+            x = nansum(w_dst[-gws:])
+          if x > 0:
+            #gr = int(round(100 * y / x))
+            gr = self.conv_grade(100 * y / x)
+          if y != 0.0:
+            gl = int(round(-1 * x / y))
+          grade = pre_grade = gr
+          glide = pre_glide = gl
+        #for sometimes ANT+ distance is 0 although status is running
+        elif self.config.G_STOPWATCH_STATUS == "START":
+          grade = pre_grade
+          glide = pre_glide
 
-      #grade (speed base)
-      if self.config.G_ANT['USE']['SPD']:
-        dst_diff_spd['ANT+'] = spd * self.actual_loop_interval
-        for key in ['alt_diff_spd', 'dst_diff_spd']:
-          self.values['integrated'][key][0:-1] = self.values['integrated'][key][1:]
-          self.values['integrated'][key][-1] = eval(key+"['ANT+']")
-          diff_sum[key] = np.mean(self.values['integrated'][key][-self.grade_window_size:])
-          #diff_sum[key] = np.nansum(self.values['integrated'][key][-self.grade_window_size:])
-        #set grade
-        x = diff_sum['dst_diff_spd']**2 - diff_sum['alt_diff_spd']**2
-        y = diff_sum['alt_diff_spd']
-        gr = self.config.G_ANT_NULLVALUE
-        if x > 0:
-          x = math.sqrt(x)
-          gr = self.conv_grade(100 * y / x)
-        grade_spd = pre_grade_spd = gr
-      #for sometimes speed sensor value is missing in running
-      elif dst_diff_spd['ANT+'] == 0 and self.config.G_STOPWATCH_STATUS == "START":
-        grade_spd = pre_grade_spd
+        #grade (speed base)
+        if use['SPD']:
+          w_alt = integrated['alt_diff_spd']
+          w_dst = integrated['dst_diff_spd']
+          w_alt[0:-1] = w_alt[1:]
+          w_alt[-1] = alt_diff_spd
+          w_dst[0:-1] = w_dst[1:]
+          w_dst[-1] = dst_spd
+          #mean (nan if it includes nan)
+          y = sum(w_alt[-gws:]) / gws
+          x = (sum(w_dst[-gws:]) / gws)**2 - y**2
+          #set grade
+          gr = null
+          if x > 0:
+            x = math.sqrt(x)
+            gr = self.conv_grade(100 * y / x)
+          grade_spd = pre_grade_spd = gr
+        #for sometimes speed sensor value is missing in running
+        elif self.config.G_STOPWATCH_STATUS == "START":
+          grade_spd = pre_grade_spd
       
-      self.values['integrated']['hr'] = hr
-      self.values['integrated']['speed'] = spd
-      self.values['integrated']['cadence'] = cdc
-      self.values['integrated']['power'] = pwr
-      self.values['integrated']['distance'] += dst_diff['USE']
-      self.values['integrated']['accumulated_power'] += ttlwork_diff
-      self.values['integrated']['grade'] = grade
-      self.values['integrated']['grade_spd'] = grade_spd
-      self.values['integrated']['glide_ratio'] = glide
+      integrated['hr'] = hr
+      integrated['speed'] = spd
+      integrated['cadence'] = cdc
+      integrated['power'] = pwr
+      integrated['distance'] += dst_use
+      integrated['accumulated_power'] += ttlwork_diff
+      integrated['grade'] = grade
+      integrated['grade_spd'] = grade_spd
+      integrated['glide_ratio'] = glide
       
-      for g in self.graph_keys:
-        self.values['integrated'][g][0:-1] = self.values['integrated'][g][1:]
-      self.values['integrated']['hr_graph'][-1] = hr
-      self.values['integrated']['power_graph'][-1] = pwr
-      #self.values['integrated']['altitude_kf_graph'][-1] = v['I2C']['altitude_kalman']
-      self.values['integrated']['altitude_kf_graph'][-1] = v['GPS']['alt']
-      self.values['integrated']['altitude_graph'][-1] = v['I2C']['altitude']
+      if periodic:
+        for g in self.graph_keys:
+          integrated[g][0:-1] = integrated[g][1:]
+        integrated['hr_graph'][-1] = hr
+        integrated['power_graph'][-1] = pwr
+        #integrated['altitude_kf_graph'][-1] = i2c['altitude_kalman']
+        integrated['altitude_kf_graph'][-1] = gps['alt']
+        integrated['altitude_graph'][-1] = i2c['altitude']
+        #start accumulating for the next interval
+        dst_grade_ant = dst_grade_gps = dst_grade_use = dst_spd = 0
+        grade_use_ant = grade_use_gps = False
 
-      time_profile.append(datetime.datetime.now())
+      self.publish(gps_record, i2c_record)
 
       #toggle auto stop
       #ANT+ or GPS speed is avaiable
-      if not np.isnan(spd) and self.config.G_MANUAL_STATUS == "START":
+      if not math.isnan(spd) and self.config.G_MANUAL_STATUS == "START":
         
         #speed from ANT+ or GPS
         flag_spd = False
@@ -353,13 +422,13 @@ class SensorCore():
         
         #use moving status of accelerometer because of excluding erroneous speed values when stopping
         flag_moving = False
-        if v['I2C']['m_stat'] == 1:
+        if i2c['m_stat'] == 1:
           flag_moving = True
         
         #flag_moving is not considered (set True) as follows,
         # accelerometer is not available (nan)
         # ANT+ speed sensor is available
-        if np.isnan(v['I2C']['m_stat']) or self.config.G_ANT['USE']['SPD']:
+        if np.isnan(i2c['m_stat']) or use['SPD']:
           flag_moving = True
   
         if self.config.G_STOPWATCH_STATUS == "STOP" \
@@ -372,9 +441,9 @@ class SensorCore():
           self.config.logger.start_and_stop()
           
       #ANT+ or GPS speed is not avaiable
-      elif np.isnan(spd) and self.config.G_MANUAL_STATUS == "START":
+      elif math.isnan(spd) and self.config.G_MANUAL_STATUS == "START":
         #stop recording if speed is broken
-        if (self.config.G_ANT['USE']['SPD'] or 'timestamp' in v['GPS']) \
+        if (use['SPD'] or gps_timestamp is not None) \
           and self.config.G_STOPWATCH_STATUS == "START"  \
           and self.config.logger != None:
           self.config.logger.start_and_stop()
@@ -383,8 +452,8 @@ class SensorCore():
       
       #auto backlight
       if self.config.G_USE_AUTO_BACKLIGHT:
-        if self.config.G_DISPLAY == 'MIP' and self.sensor_spi.send_display and not np.isnan(v['I2C']['light']):
-          if v['I2C']['light'] <= self.config.G_USE_AUTO_CUTOFF:
+        if self.config.G_DISPLAY == 'MIP' and self.sensor_spi.send_display and not np.isnan(i2c['light']):
+          if i2c['light'] <= self.config.G_USE_AUTO_CUTOFF:
             self.sensor_spi.display.set_brightness(10)
             self.sensor_ant.set_light_mode("FLASH_LOW", auto=True)
           else:
@@ -392,7 +461,7 @@ class SensorCore():
             self.sensor_ant.set_light_mode("OFF", auto=True)
 
       #cpu and memory
-      if _IMPORT_PSUTIL:
+      if periodic and _IMPORT_PSUTIL:
         self.values['CPU_MEM'] = "{0:^2.0f}% ({1}) / ALL {2:^2.0f}%,  {3:^2.0f}%".format(
           self.process.cpu_percent(interval=None),
           self.process.num_threads(),
@@ -400,35 +469,29 @@ class SensorCore():
           self.process.memory_percent(),
           )
        
-      #adjust loop time
-      time_profile.append(datetime.datetime.now())
-      sec_diff = []
-      time_progile_sec = 0
-      for i in range(len(time_profile)):
-        if i == 0: continue
-        sec_diff.append("{0:.6f}".format((time_profile[i]-time_profile[i-1]).total_seconds()))
-        time_progile_sec += (time_profile[i]-time_profile[i-1]).total_seconds()
-      if time_progile_sec > 1.5 * self.config.G_SENSOR_INTERVAL:
+      #check loop time
+      loop_time = time.monotonic() - t
+      if interval > 0 and loop_time > 1.5 * interval:
         print(
           "too long loop time: ",
           datetime.datetime.now().strftime("%Y%m%d %H:%M:%S"),
-          ", sec_diff:",
-          sec_diff
+          ", loop_time: {:.6f}".format(loop_time)
           )
-   
-      loop_time = (datetime.datetime.now() - start_time).total_seconds()
-      d1, d2 = divmod(loop_time, self.config.G_SENSOR_INTERVAL)
-      if d1 > self.config.G_SENSOR_INTERVAL * 10: #[s]
-        print(
-          "too long loop_time({}):{:.2f}, d1:{:.0f}, d2:{:.2f}".format(
-           self.__class__.__name__,
-           loop_time,
-           d1,
-           d2
-           ))
-        d1 = d2 = 0
-      self.wait_time = self.config.G_SENSOR_INTERVAL - d2
-      self.actual_loop_interval = (d1 + 1)*self.config.G_SENSOR_INTERVAL
+
+  def publish(self, gps_record=None, i2c_record=None):
+    #replace the reference only, so readers (logger in signal handler, GUI) need no lock
+    #  gps_record, i2c_record: the records which the integrated values are computed from
+    if gps_record == None:
+      gps_record = self.sensor_gps.snapshot
+    if i2c_record == None:
+      i2c_record = self.sensor_i2c.snapshot
+    self.snapshot_seq += 1
+    self.snapshot = SensorSnapshot(
+      self.snapshot_seq,
+      SensorRecord(self.snapshot_seq, self.values['integrated']),
+      gps_record,
+      i2c_record,
+      )
 
   def conv_grade(self, gr):
     g = gr
@@ -453,5 +516,8 @@ class SensorCore():
     self.sensor_i2c.reset()
     self.values['integrated']['distance'] = 0
     self.values['integrated']['accumulated_power'] = 0
+    self.sensor_gps.publish()
+    self.sensor_i2c.publish()
+    self.publish()
 
 
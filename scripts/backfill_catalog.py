@@ -0,0 +1,43 @@
+#!/usr/bin/python3
+
+#add existing rides (log/log.db-<start date>) to the ride catalog (log/catalog.db)
+#usage: python3 scripts/backfill_catalog.py [log_dir] [--force]
+#  --force: summarize rides again even if they are already in the catalog
+
+import sys
+import os
+import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from modules.logger.logger_catalog import LoggerCatalog
+
+
+class config_local():
+  G_LOG_DB = None
+  G_LOG_CATALOG_DB = None
+
+
+if __name__=="__main__":
+  args = [a for a in sys.argv[1:] if not a.startswith("--")]
+  log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "log")
+  if len(args) > 0:
+    log_dir = args[0]
+  c = config_local()
+  c.G_LOG_DB = os.path.join(log_dir, "log.db")
+  c.G_LOG_CATALOG_DB = os.path.join(log_dir, "catalog.db")
+
+  t = datetime.datetime.now()
+  catalog = LoggerCatalog(c)
+  added = catalog.backfill(force=("--force" in sys.argv))
+  print("added", added, "rides :", (datetime.datetime.now()-t).total_seconds(), "sec")
+
+  for r in catalog.list_rides():
+    print(
+      r['start_date'],
+      "{:7.1f}km".format((r['distance'] or 0)/1000),
+      "{:5.1f}h".format((r['total_timer_time'] or 0)/3600),
+      "{:6.0f}m".format(r['total_ascent'] or 0),
+      )
+  v = catalog.values
+  print("{}: {} rides, {:.1f}km, {:.1f}h, {:.0f}m".format(
+    v['year'], v['rides'], v['distance']/1000, v['total_timer_time']/3600, v['total_ascent']))
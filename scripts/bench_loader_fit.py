@@ -0,0 +1,132 @@
+#!/usr/bin/python3
+
+#benchmark of LoaderFit (gather of messages by definition) and FitCourseParser (with LoaderFit)
+#usage: python3 scripts/bench_loader_fit.py [hours] [fit file] [--baseline <git revision>]
+#  makes FIT activities of 1Hz records (hours, default: 10) if fit file is not given:
+#    records only, and records interleaved with hrv messages (a record and an hrv each second)
+#  --baseline: also run LoaderFit and FitCourseParser of the revision (before and after),
+#    e.g. "Add a bulk FIT activity reader" (runs of the same definition, FitCourseParser with unpack per message)
+
+import sys
+import os
+import time
+import struct
+import types
+import subprocess
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from modules.logger import loader_fit, loader_tcx
+
+
+def definition(local_num, global_num, fields):
+  b = struct.pack('<BBBHB', 0x40 | local_num, 0, 0, global_num, len(fields))
+  for num, size, base_type in fields:
+    b += struct.pack('<BBB', num, size, base_type)
+  return b
+
+
+def make_fit(filename, hours, hrv=False):
+  n = int(hours * 3600)
+  t0 = 1000000000
+  sc = 2**31 / 180
+  rng = np.random.default_rng(0)
+  lat = 35.68 + np.cumsum(rng.normal(0, 1e-5, n))
+  lon = 139.76 + np.cumsum(rng.normal(0, 1e-5, n))
+  body = bytearray()
+  body += definition(0, 0, [(0,1,0x00), (1,2,0x84), (4,4,0x86)])
+  body += struct.pack('<BBHI', 0, 4, 255, t0)
+  body += definition(1, 20, [
+    (253,4,0x86), (0,4,0x85), (1,4,0x85), (2,2,0x84), (3,1,0x02),
+    (4,1,0x02), (5,4,0x86), (6,2,0x84), (7,2,0x84), (13,1,0x01),
+    ])
+  body += definition(2, 19, [(253,4,0x86), (2,4,0x86), (7,4,0x86), (8,4,0x86), (9,4,0x86)])
+  #hrv: time (array of 5 uint16, not decoded)
+  body += definition(4, 78, [(0,10,0x84)])
+  rec = struct.Struct('<BIiiHBBIHHb')
+  hrv_msg = struct.Struct('<B5H')
+  for i in range(n):
+    body += rec.pack(
+      1, t0+i, int(lat[i]*sc), int(lon[i]*sc), int((100+i%50+500)*5), 120+i%40,
+      85+i%10, i*700, 7000, 200+i%100, 25,
+      )
+    if hrv:
+      body += hrv_msg.pack(4, 500, 0xFFFF, 0xFFFF, 0xFFFF, 0xFFFF)
+    #lap every hour
+    if (i+1) % 3600 == 0:
+      body += struct.pack('<BIIIII', 2, t0+i, t0+i-3599, 3600000, 3600000, (i+1)*700)
+  body += definition(3, 18, [(253,4,0x86), (2,4,0x86), (8,4,0x86), (9,4,0x86)])
+  body += struct.pack('<BIIII', 3, t0+n-1, t0, n*1000, n*700)
+  header = struct.pack('<BBHI4sH', 14, 0x10, 2100, len(body), b'.FIT', 0)
+  with open(filename, 'wb') as f:
+    f.write(header + bytes(body) + b'\0\0')
+  return n
+
+
+def load_module(rev, name):
+  #module of modules/logger at a git revision in the same package (its relative imports use the current tree)
+  root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+  src = subprocess.run(
+    ["git", "-C", root, "show", rev+":modules/logger/"+name+".py"],
+    capture_output=True, text=True, check=True,
+    ).stdout
+  module = types.ModuleType("modules.logger."+name+"_baseline")
+  module.__package__ = "modules.logger"
+  exec(compile(src, name+".py@"+rev, "exec"), module.__dict__)
+  return module
+
+
+def bench_loader_fit(name, module, filename):
+  t = time.perf_counter()
+  f = module.LoaderFit()
+  f.read(filename)
+  record = f.get_message('record')
+  lap = f.get_message('lap')
+  session = f.get_message('session')
+  sec = time.perf_counter() - t
+  print("  LoaderFit({})       : {:.3f} sec, record {}, lap {}, session {}".format(
+    name, sec, len(record['timestamp']), len(lap['timestamp']), len(session['timestamp'])))
+  return record
+
+
+def bench_course_parser(name, module, filename):
+  t = time.perf_counter()
+  p = module.FitCourseParser()
+  p.parse(filename)
+  track = p.get_track()
+  sec = time.perf_counter() - t
+  print("  FitCourseParser({}) : {:.3f} sec, record {}".format(name, sec, len(track[0])))
+
+
+if __name__=="__main__":
+  args = sys.argv[1:]
+  baseline = None
+  if "--baseline" in args:
+    i = args.index("--baseline")
+    baseline = args[i+1]
+    del args[i:i+2]
+  hours = float(args[0]) if len(args) > 0 else 10
+  files = []
+  if len(args) > 1:
+    files.append(args[1])
+  else:
+    for hrv in [False, True]:
+      filename = os.path.join(
+        tempfile.gettempdir(), "bench_loader_fit{}.fit".format("_hrv" if hrv else "")
+        )
+      make_fit(filename, hours, hrv)
+      files.append(filename)
+
+  for filename in files:
+    print("{} ({:.1f}MB)".format(os.path.basename(filename), os.path.getsize(filename)/1024/1024))
+    record = bench_loader_fit("current", loader_fit, filename)
+    bench_course_parser("current", loader_tcx, filename)
+    if baseline != None:
+      record_baseline = bench_loader_fit(baseline, load_module(baseline, "loader_fit"), filename)
+      bench_course_parser(baseline, load_module(baseline, "loader_tcx"), filename)
+      same = all(
+        np.array_equal(record[k], record_baseline[k], equal_nan=True) for k in record
+        )
+      print("  same records:", same)
@@ -0,0 +1,170 @@
+#!/usr/bin/python3
+
+#micro benchmark of SensorCore.integrate (cost per tick without waiting)
+#usage: python3 scripts/bench_sensor_integrate.py [ticks] [--baseline <git revision>]
+#  --baseline: also run integrate of modules/sensor_core.py at the revision (before and after),
+#    e.g. the parent of "Remove eval and per-tick dict rebuilding from integrate"
+
+import sys
+import os
+import time
+import datetime
+import struct
+import types
+import subprocess
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from modules import sensor_core
+from modules.sensor.sensor import Sensor
+
+
+class config_local():
+  G_QUIT = False
+  #no wait between ticks, every tick is periodic
+  G_SENSOR_INTERVAL = 0.0
+  G_SENSOR_MIN_INTERVAL = 0.0
+  G_ANT_NULLVALUE = np.nan
+  G_STOPWATCH_STATUS = "START"
+  G_MANUAL_STATUS = "STOP"
+  G_AUTOSTOP_CUTOFF = 4/3.6
+  G_USE_AUTO_BACKLIGHT = False
+  G_DISPLAY = 'None'
+  logger = None
+  G_ANT = {
+    'USE': {'HR': True, 'SPD': True, 'CDC': True, 'PWR': True},
+    'ID_TYPE': {
+      'HR': struct.pack('<HB', 0, 0x78),
+      'SPD': struct.pack('<HB', 0, 0x79),
+      'CDC': struct.pack('<HB', 0, 0x79),
+      'PWR': struct.pack('<HB', 0, 0x0B),
+    },
+    'TYPE': {'HR': 0x78, 'SPD': 0x79, 'CDC': 0x79, 'PWR': 0x0B},
+  }
+
+
+class sensor_local(Sensor):
+  #producer thread is not started, values are updated by sensor_ant_local.update
+  def sensor_init(self):
+    pass
+
+
+class sensor_ant_local():
+  pairing_count = 0
+
+  def __init__(self, config, values, ticks):
+    self.config = config
+    self.values = values
+    self.ticks = ticks
+    self.count = 0
+    self.gps = None
+    self.i2c = None
+    self.sensors = []
+
+  def update(self):
+    #called every periodic tick of integrate
+    self.count += 1
+    if self.count >= self.ticks:
+      self.config.G_QUIT = True
+    t = datetime.datetime.now()
+    ac = self.config.G_ANT['ID_TYPE']
+    self.values[ac['HR']]['hr'] = 120
+    self.values[ac['HR']]['timestamp'] = t
+    self.values[ac['SPD']]['speed'] = 8.0
+    self.values[ac['SPD']]['cadence'] = 85
+    self.values[ac['SPD']]['distance'] += 8.0
+    self.values[ac['SPD']]['timestamp'] = t
+    self.values[ac['PWR']][0x10]['power'] = 200
+    self.values[ac['PWR']][0x10]['accumulated_power'] += 200
+    self.values[ac['PWR']][0x10]['timestamp'] = t
+    self.gps['distance'] += 8.0
+    self.gps['timestamp'] = t
+    #5% slope
+    self.i2c['altitude'] += 0.4
+    #new records of GPS and I2C (used from the next tick)
+    for sensor in self.sensors:
+      sensor.publish()
+
+
+def load_sensor_core(rev):
+  #sensor_core of a git revision in the same package (its relative imports use the current tree)
+  root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+  src = subprocess.run(
+    ["git", "-C", root, "show", rev+":modules/sensor_core.py"],
+    capture_output=True, text=True, check=True,
+    ).stdout
+  module = types.ModuleType("modules.sensor_core_baseline")
+  module.__package__ = "modules"
+  exec(compile(src, "sensor_core.py@"+rev, "exec"), module.__dict__)
+  return module
+
+
+def make_sensor_core(ticks, module=sensor_core):
+  config = config_local()
+  config.G_QUIT = False
+  s = module.SensorCore.__new__(module.SensorCore)
+  s.config = config
+  s.values = {}
+  s.values['GPS'] = {'speed': 8.0, 'distance': 0.0, 'alt': 100.0}
+  s.values['I2C'] = {'pre_altitude': 100.0, 'altitude': 100.0, 'm_stat': 1, 'light': np.nan}
+  s.values['ANT+'] = {}
+  ac = config.G_ANT['ID_TYPE']
+  s.values['ANT+'][ac['HR']] = {}
+  s.values['ANT+'][ac['SPD']] = {'distance': 0.0}
+  s.values['ANT+'][ac['PWR']] = {}
+  for page in [0x10, 0x11, 0x12]:
+    s.values['ANT+'][ac['PWR']][page] = {'accumulated_power': 0.0}
+  s.values['integrated'] = {}
+  for key in s.integrated_value_keys:
+    s.values['integrated'][key] = np.nan
+  s.values['integrated']['distance'] = 0
+  s.values['integrated']['accumulated_power'] = 0
+  for g in s.graph_keys:
+    s.values['integrated'][g] = [np.nan] * 180
+  for d in s.diff_keys:
+    s.values['integrated'][d] = [np.nan] * s.grade_range
+  s.values['CPU_MEM'] = ""
+  s.sensor_gps = sensor_local(config, s.values['GPS'])
+  s.sensor_i2c = sensor_local(config, s.values['I2C'])
+  s.sensor_ant = sensor_ant_local(config, s.values['ANT+'], ticks)
+  s.sensor_ant.gps = s.values['GPS']
+  s.sensor_ant.i2c = s.values['I2C']
+  s.sensor_ant.sensors = [s.sensor_gps, s.sensor_i2c]
+  return s
+
+
+def bench(name, module, ticks):
+  #psutil is sampled once per second only
+  module._IMPORT_PSUTIL = False
+  s = make_sensor_core(ticks, module)
+  #suppress "too long loop time" (G_SENSOR_INTERVAL is 0)
+  stdout = sys.stdout
+  sys.stdout = open(os.devnull, 'w')
+  t = time.perf_counter()
+  s.integrate()
+  sec = time.perf_counter() - t
+  sys.stdout.close()
+  sys.stdout = stdout
+  print("integrate ({}): {} ticks, {:.1f} us/tick".format(name, ticks, sec/ticks*1e6))
+  print("  distance: {:.1f}, accumulated_power: {:.1f}, grade: {}".format(
+    s.values['integrated']['distance'],
+    s.values['integrated']['accumulated_power'],
+    s.values['integrated']['grade'],
+    ))
+
+
+if __name__ == "__main__":
+  args = sys.argv[1:]
+  baseline = None
+  if "--baseline" in args:
+    i = args.index("--baseline")
+    baseline = args[i+1]
+    del args[i:i+2]
+  ticks = 20000
+  if len(args) > 0:
+    ticks = int(args[0])
+
+  if baseline != None:
+    bench(baseline, load_sensor_core(baseline), ticks)
+  bench("current", sensor_core, ticks)
@@ -5,3 +5,5 @@ cd /home/pi/pizero_bikecomputer/
 /bin/rm ./log/log.db
 /usr/bin/git pull origin master > ./log/update.txt 2>&1
 
+#rebuild the cython FIT writer
+/usr/bin/python3 modules/logger/cython/setup.py build_ext --inplace >> ./log/update.txt 2>&1